@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Course, Seasion, Lesson, Category, Comment, MainPageCategoryAdd, MainPageCourseAdd, Team, Bookmark
+from django.utils import timezone
+from .models import Course, Seasion, Lesson, Category, Comment, MainPageCategoryAdd, MainPageCourseAdd, Team, Bookmark, MediaJob
 from django.utils.html import format_html
 
 @admin.register(Course)
@@ -32,7 +33,7 @@ class SeasionRegister(admin.ModelAdmin):
 
 @admin.register(Lesson)
 class LessonRegister(admin.ModelAdmin):
-    list_display = [field.name for field in Lesson._meta.fields]
+    list_display = [field.name for field in Lesson._meta.fields if field.name != 'media_info']
     list_select_related = ['teacher']
 
 
@@ -85,3 +86,16 @@ class TeamRegister(admin.ModelAdmin):
 class BookmarkRegister(admin.ModelAdmin):
     list_display = ['id', 'user', 'content_type', 'media_id']
     list_display_links = ['id', 'user']
+
+
+@admin.register(MediaJob)
+class MediaJobRegister(admin.ModelAdmin):
+    list_display = ['lesson', 'kind', 'status', 'attempts', 'run_after', 'finished_at']
+    list_filter = ['status', 'kind']
+    list_select_related = ['lesson']
+    readonly_fields = ['source', 'attempts', 'error', 'started_at', 'finished_at']
+    actions = ['retry']
+
+    @admin.action(description='اجرای دوباره')
+    def retry(self, request, queryset):
+        queryset.exclude(status = MediaJob.Statuses.running).update(status = MediaJob.Statuses.queued, attempts = 0, run_after = timezone.now())
@@ -0,0 +1,204 @@
+"""
+Query count and latency benchmarks of every view, run by the bench_views command.
+"""
+import random
+import statistics
+import time
+from django.core.cache import cache
+from django.test import Client
+from django.urls import URLResolver, get_resolver, reverse
+from cart.models import Cart, CartItem
+from myacademy.profiling import profile_block
+from user.models import Profile, User
+from .models import Bookmark, Category, Comment, Course, Lesson, MainPageCategoryAdd, MainPageCourseAdd, Seasion, Team
+from .search import update_course_index
+from .stats import refresh_course_stats
+
+
+NAMESPACES = ('academy', 'cart', 'dashboard', 'user')
+ROLES = ('anonymous', 'student', 'teacher')
+
+
+def seed_dataset(scale=1, seed=0):
+    """
+    Create a deterministic dataset, `scale` multiplies the number of rows.
+    Returns the objects endpoints are built from.
+    """
+    rng = random.Random(seed)
+    users = User.objects.bulk_create([
+        User(username = f'user{i}', email = f'user{i}@example.com', phone_number = f'0912{i:07d}', is_active = True, is_mentor = i < 10 * scale)
+        for i in range(60 * scale)
+    ])
+    Profile.objects.bulk_create([Profile(user = user) for user in users])
+    teachers, students = users[:10 * scale], users[10 * scale:]
+
+    categories = Category.objects.bulk_create([Category(title = f'دسته {i}', slug = f'category-{i}') for i in range(10)])
+    courses = Course.objects.bulk_create([
+        Course(
+            name = f'دوره شماره {i}',
+            description = 'توضیحات دوره ' * 20,
+            teacher = rng.choice(teachers),
+            price = rng.randrange(0, 500_000, 1000),
+            thumbnail = 'courses/images/benchmark.png',
+            time = '10:00:00',
+            is_active = i % 10 != 0,
+        )
+        for i in range(100 * scale)
+    ])
+    Course.category.through.objects.bulk_create([
+        Course.category.through(course_id = course.pk, category_id = category.pk)
+        for course in courses for category in rng.sample(categories, 2)
+    ])
+
+    seasions = Seasion.objects.bulk_create([Seasion(title = f'فصل {i}') for i in range(2 * len(courses))])
+    Course.seasions.through.objects.bulk_create([
+        Course.seasions.through(course_id = course.pk, seasion_id = seasion.pk)
+        for course, seasion in zip([course for course in courses for _ in range(2)], seasions)
+    ])
+    lessons = Lesson.objects.bulk_create([
+        Lesson(title = f'درس {i}', description = 'd', file = 'courses/lessons/files/benchmark.mp4', teacher = teachers[0], time = '00:12:00')
+        for i in range(5 * len(seasions))
+    ])
+    Seasion.lessons.through.objects.bulk_create([
+        Seasion.lessons.through(seasion_id = seasions[i // 5].pk, lesson_id = lesson.pk)
+        for i, lesson in enumerate(lessons)
+    ])
+
+    roots = Comment.objects.bulk_create([
+        Comment(media_id = course.pk, message = 'نظر', user = rng.choice(students), active = True)
+        for course in courses for _ in range(10)
+    ])
+    Comment.objects.bulk_create([
+        Comment(media_id = root.media_id, parent = root, message = 'پاسخ', user = rng.choice(users), active = True)
+        for root in roots for _ in range(rng.randrange(3))
+    ])
+
+    student, teacher = students[0], teachers[0]
+    Bookmark.objects.bulk_create([Bookmark(user = student, content_type = 'course', media_id = course.pk) for course in courses[:5]])
+    cart = Cart.objects.create(user = student)
+    CartItem.objects.bulk_create([CartItem(cart = cart, media_id = course.pk, price = course.price) for course in courses[1:4]])
+
+    MainPageCategoryAdd.objects.bulk_create([
+        MainPageCategoryAdd(title = category.title, image = 'categorys/images/benchmark.png', category = category) for category in categories[:4]
+    ])
+    for i in range(4):
+        MainPageCourseAdd.objects.create(title = f'تب {i}').courses.set(rng.sample(courses, 6))
+    Team.objects.bulk_create([Team(user = user, position = 'مدرس') for user in teachers[:4]])
+
+    course_ids = [course.pk for course in courses]
+    refresh_course_stats(course_ids)
+    update_course_index(course_ids)
+
+    active = next(course for course in courses if course.is_active and course.teacher_id == teacher.pk)
+    return {'student': student, 'teacher': teacher, 'course': active, 'category': categories[0]}
+
+
+# url name -> (method, args builder, query string); names missing here are reported as unmeasured
+ENDPOINTS = {
+    'academy:home': ('get', lambda data: [], ''),
+    'academy:courseslist': ('get', lambda data: [], ''),
+    'academy:category': ('get', lambda data: [data['category'].slug], ''),
+    'academy:course-details': ('get', lambda data: [data['course'].pk], ''),
+    'cart:cart-checkout': ('get', lambda data: [], ''),
+    'cart:cart-add': ('post', lambda data: ['course', data['course'].pk], ''),
+    'dashboard:profile': ('get', lambda data: [], ''),
+    'dashboard:change-password': ('get', lambda data: [], ''),
+    'dashboard:course-add': ('get', lambda data: [], ''),
+    'dashboard:course-update': ('get', lambda data: [data['course'].pk], ''),
+    'dashboard:my-courses': ('get', lambda data: [], ''),
+    'dashboard:my-courses-not-published': ('get', lambda data: [], ''),
+    'dashboard:my-bookmark-list': ('get', lambda data: [], ''),
+    'user:register': ('get', lambda data: [], ''),
+    'user:login': ('get', lambda data: [], ''),
+    'user:forgot-password': ('get', lambda data: [], ''),
+    'user:confirm-forgot-password': ('get', lambda data: [], ''),
+    'user:active-account': ('get', lambda data: [], ''),
+}
+# endpoints that change state in a way repeated requests can not measure
+SKIPPED = {
+    'academy:bookmarker': 'toggles the bookmark on every request',
+    'cart:cart-remove': 'only the first request removes the item',
+    'cart:payment': 'places an order',
+    'dashboard:course-delete': 'deletes the course',
+    'dashboard:upload-start': 'creates an upload',
+    'dashboard:upload': 'needs an upload in progress',
+    'dashboard:upload-finalize': 'needs a fully sent upload',
+    'user:logout': 'ends the session',
+}
+# extra cases of an endpoint, measured under "<name>?<query>"
+VARIANTS = {
+    'academy:courseslist': ['name=دوره'],
+}
+
+
+def url_names(namespaces=NAMESPACES):
+    """Every named url of the given namespaces."""
+    names = []
+    for pattern in get_resolver().url_patterns:
+        if isinstance(pattern, URLResolver) and pattern.namespace in namespaces:
+            names += [f'{pattern.namespace}:{child.name}' for child in pattern.url_patterns if child.name]
+    return names
+
+
+def measure(client, method, url, repeat):
+    """Warm up once, then return the median timings and the worst query count of `repeat` requests."""
+    getattr(client, method)(url)
+    runs = []
+    for _ in range(repeat):
+        with profile_block() as profile:
+            start = time.perf_counter()
+            response = getattr(client, method)(url)
+            wall = time.perf_counter() - start
+        runs.append({
+            'status': response.status_code,
+            'queries': profile.query_count,
+            'sql_ms': profile.sql_time * 1000,
+            'template_ms': profile.template_time * 1000,
+            'wall_ms': wall * 1000,
+        })
+    return {
+        'status': runs[-1]['status'],
+        'queries': max(run['queries'] for run in runs),
+        **{key: round(statistics.median(run[key] for run in runs), 3) for key in ('sql_ms', 'template_ms', 'wall_ms')},
+    }
+
+
+def run_benchmarks(data, repeat=5, roles=ROLES, names=None):
+    """Measure every endpoint for every role, returns (results, unmeasured url names)."""
+    names = names or url_names()
+    results = {}
+    for role in roles:
+        cache.clear()
+        client = Client()
+        if role != 'anonymous':
+            client.force_login(data[role])
+        for name in names:
+            if name not in ENDPOINTS:
+                continue
+            method, args, query = ENDPOINTS[name]
+            url = reverse(name, args=args(data))
+            for variant in [query] + VARIANTS.get(name, []):
+                key = f'{name}?{variant}' if variant else name
+                results[f'{key}|{role}'] = measure(client, method, f'{url}?{variant}' if variant else url, repeat)
+    return results, [name for name in names if name not in ENDPOINTS and name not in SKIPPED]
+
+
+def compare(results, baseline, query_tolerance=0, time_tolerance=None, time_slack_ms=5):
+    """
+    Regressions against the baseline. Query counts are compared exactly (plus tolerance),
+    timings only when `time_tolerance` is given as an allowed relative increase.
+    """
+    regressions = []
+    for key, result in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            continue
+        if result['status'] != expected['status']:
+            regressions.append({'endpoint': key, 'metric': 'status', 'baseline': expected['status'], 'value': result['status']})
+        if result['queries'] > expected['queries'] + query_tolerance:
+            regressions.append({'endpoint': key, 'metric': 'queries', 'baseline': expected['queries'], 'value': result['queries']})
+        if time_tolerance is not None:
+            for metric in ('sql_ms', 'template_ms', 'wall_ms'):
+                if result[metric] > expected[metric] * (1 + time_tolerance) + time_slack_ms:
+                    regressions.append({'endpoint': key, 'metric': metric, 'baseline': expected[metric], 'value': result[metric]})
+    return regressions
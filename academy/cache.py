@@ -0,0 +1,29 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from myacademy.metrics import cache_get_or_set
+from .models import Course, MainPageCourseAdd
+
+
+HOME_VERSION_KEY = 'home:version'
+
+
+def get_home_version():
+    return cache.get_or_set(HOME_VERSION_KEY, time.time_ns, None)
+
+
+def bump_home_version():
+    """Invalidate every cached piece of the home page at once."""
+    try:
+        cache.incr(HOME_VERSION_KEY)
+    except ValueError:
+        # an evicted version must not restart from a value old fragments were stored with
+        cache.set(HOME_VERSION_KEY, time.time_ns(), None)
+
+
+def get_home_tabs(version):
+    def load():
+        courses = Course.objects.select_related('teacher__profile').prefetch_related('category')
+        return list(MainPageCourseAdd.objects.prefetch_related(Prefetch('courses', queryset=courses))[:4])
+    return cache_get_or_set('home', f'home:tabs:{version}', load, settings.HOME_CACHE_TIMEOUT)
@@ -0,0 +1,52 @@
+from django.core.paginator import Paginator
+from .models import Comment
+
+
+def build_comment_thread(media_type, media_id, page=1, per_page=10, max_depth=3, replies_per_page=5, expand=None):
+    """
+    Load every active comment of a media in one query and assemble the tree in memory.
+
+    Returns a page of root comments. Every comment gets `depth`, `replies` (the visible
+    replies) and `more_replies` (how many are hidden). Replies nested deeper than
+    `max_depth` are flattened into their ancestor at that depth. Only the first
+    `replies_per_page` replies of a comment are shown unless its id is `expand`.
+    """
+    comments = list(
+        Comment.objects.filter(active = True, media_type = media_type, media_id = media_id)
+        .select_related('user__profile').order_by('created_at', 'id'))
+
+    by_id = {comment.pk: comment for comment in comments}
+    roots = []
+    for comment in comments:
+        comment.children = []
+    for comment in comments:
+        if comment.parent_id is None:
+            roots.append(comment)
+        elif comment.parent_id in by_id:
+            # replies of inactive comments stay hidden, like their parent
+            by_id[comment.parent_id].children.append(comment)
+
+    expand = str(expand or '')
+
+    def descendants(comment):
+        for child in comment.children:
+            yield child
+            yield from descendants(child)
+
+    def assemble(comment, depth):
+        comment.depth = depth
+        if depth == max_depth - 1:
+            replies = sorted(descendants(comment), key=lambda reply: (reply.created_at, reply.pk))
+            for reply in replies:
+                reply.depth, reply.children, reply.replies, reply.more_replies = depth + 1, [], [], 0
+        else:
+            replies = comment.children
+            for reply in replies:
+                assemble(reply, depth + 1)
+        visible = replies if str(comment.pk) == expand else replies[:replies_per_page]
+        comment.replies = visible
+        comment.more_replies = len(replies) - len(visible)
+
+    for root in roots:
+        assemble(root, 0)
+    return Paginator(roots, per_page).get_page(page)
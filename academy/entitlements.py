@@ -0,0 +1,54 @@
+"""
+Which courses a user may watch, cached per user so lesson pages need no order joins.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from myacademy.media import sign_media_url, url_expiry
+from myacademy.metrics import cache_get_or_set
+from .models import Course
+
+
+def entitlement_key(user_id):
+    return f'entitlements:{user_id}'
+
+
+def load_entitled_course_ids(user_id):
+    from cart.models import CartItem
+    purchased = CartItem.objects.filter(
+        cart__order__status = 'paid', cart__order__user = user_id, content_type = 'course',
+    ).values_list('media_id', flat=True)
+    taught = Course.objects.filter(teacher = user_id).values_list('pk', flat=True)
+    return frozenset(purchased) | frozenset(taught)
+
+
+def get_entitled_course_ids(user):
+    """Ids of courses the user bought or teaches, one cache read once warm."""
+    if not user.is_authenticated:
+        return frozenset()
+    return cache_get_or_set(
+        'entitlements', entitlement_key(user.pk), lambda: load_entitled_course_ids(user.pk), settings.ENTITLEMENT_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_entitlements(user_id):
+    cache.delete(entitlement_key(user_id))
+
+
+def attach_lesson_urls(user, course, lessons):
+    """
+    Set `media_url`, and `stream_url` of the HLS playlist and `thumbnails_url` of the
+    seek preview track once they are made, on every lesson the user may watch, None on
+    the others.
+    Free lessons need a login, the rest a purchase of the course.
+    """
+    entitled = course.pk in get_entitled_course_ids(user)
+    expires = url_expiry()
+    for lesson in lessons:
+        allowed = lesson.file and (entitled or (lesson.is_free and user.is_authenticated))
+        lesson.media_url = sign_media_url(lesson.file.name, expires) if allowed else None
+        info = lesson.media_info or {}
+        stream = allowed and info.get('source') == lesson.file.name and info.get('hls')
+        lesson.stream_url = sign_media_url(stream['playlist'], expires) if stream else None
+        sprites = stream and info.get('sprites', {}).get('track')
+        lesson.thumbnails_url = sign_media_url(sprites, expires) if sprites else None
+    return lessons
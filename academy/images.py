@@ -0,0 +1,137 @@
+"""
+Resized WebP variants of uploaded images.
+
+Variants are rendered after the upload is committed, by a background task, and their
+names and sizes are stored next to the image so templates never open a file.
+"""
+import logging
+import os
+from io import BytesIO
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import models, transaction
+from django.db.models.signals import post_save
+from PIL import Image, ImageOps, UnidentifiedImageError
+from taskqueue.queue import task
+
+
+logger = logging.getLogger(__name__)
+
+
+class VariantImageField(models.ImageField):
+    """
+    ImageField that keeps WebP variants `variant_widths` pixels wide.
+    Their metadata is stored in the JSONField named by `variants_field`:
+    {'source': name, 'width': w, 'height': h, 'variants': [{'name', 'width', 'height'}]}
+    """
+    def __init__(self, *args, variant_widths=(), variants_field=None, **kwargs):
+        self.variant_widths = tuple(sorted(variant_widths))
+        self.variants_field = variants_field
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['variant_widths'] = self.variant_widths
+        kwargs['variants_field'] = self.variants_field
+        return name, path, args, kwargs
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        if not cls._meta.abstract:
+            post_save.connect(self.schedule_variants, sender=cls)
+
+    def get_variants(self, instance):
+        """Metadata of the current file, empty until its variants are rendered."""
+        data = getattr(instance, self.variants_field) or {}
+        return data if data.get('source') == getattr(instance, self.attname).name else {}
+
+    def schedule_variants(self, sender, instance, raw=False, **kwargs):
+        name = getattr(instance, self.attname).name
+        if raw or not name or self.get_variants(instance):
+            return
+        label, pk = sender._meta.label, instance.pk
+        if settings.IMAGE_VARIANTS_BACKGROUND:
+            update_variants.delay(label, pk, self.name, name)
+        else:
+            transaction.on_commit(lambda: update_variants(label, pk, self.name, name))
+
+
+def variant_name(name, width):
+    directory, filename = os.path.split(name)
+    return os.path.join(directory, 'variants', f'{os.path.splitext(filename)[0]}-{width}w.webp')
+
+
+def render_variants(file, widths):
+    """Write the variants of `file` to its storage and return their metadata."""
+    with file.open('rb'), Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        width, height = image.size
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        variants = []
+        for variant_width in widths:
+            if variant_width >= width:
+                break
+            variant = image.resize((variant_width, max(round(height * variant_width / width), 1)), Image.Resampling.LANCZOS)
+            content = BytesIO()
+            variant.save(content, 'WEBP', quality=settings.IMAGE_VARIANT_QUALITY, method=4)
+            saved = file.storage.save(variant_name(file.name, variant_width), ContentFile(content.getvalue()))
+            variants.append({'name': saved, 'width': variant.width, 'height': variant.height})
+    return {'source': file.name, 'width': width, 'height': height, 'variants': variants}
+
+
+def delete_variants(data, storage, keep=None):
+    """Delete the variant files of `data` that `keep` does not list."""
+    kept = {variant['name'] for variant in (keep or {}).get('variants', [])}
+    for variant in data.get('variants', []):
+        if variant['name'] not in kept:
+            storage.delete(variant['name'])
+
+
+@task(max_attempts=2)
+def update_variants(label, pk, field_name, name):
+    """Render the variants of one image and store them, unless the image changed meanwhile."""
+    model = apps.get_model(label)
+    field = model._meta.get_field(field_name)
+    instance = model._default_manager.filter(pk=pk).first()
+    if instance is None or getattr(instance, field.attname).name != name:
+        return
+    file = getattr(instance, field.attname)
+    try:
+        data = render_variants(file, field.variant_widths)
+    except (OSError, UnidentifiedImageError) as ex:
+        logger.warning('Rendering variants of %s failed: %s', name, ex)
+        return
+    old = getattr(instance, field.variants_field) or {}
+    setattr(instance, field.variants_field, data)
+    # signals of the save refresh caches holding the instance
+    instance.save(update_fields=[field.variants_field])
+    delete_variants(old, file.storage, keep=data)
+
+
+def variant_fields():
+    """(model, field) of every VariantImageField."""
+    return [
+        (model, field)
+        for model in apps.get_models()
+        for field in model._meta.get_fields()
+        if isinstance(field, VariantImageField)
+    ]
+
+
+def image_attrs(file):
+    """src and srcset of an image, without touching the file."""
+    if not file:
+        return {}
+    attrs = {'src': file.url}
+    data = file.field.get_variants(file.instance) if isinstance(file.field, VariantImageField) else {}
+    if data.get('variants'):
+        attrs['srcset'] = ', '.join(
+            [f'{file.storage.url(variant["name"])} {variant["width"]}w' for variant in data['variants']]
+            + [f'{attrs["src"]} {data["width"]}w']
+        )
+    return attrs
+
+
+def srcset(file):
+    return image_attrs(file).get('srcset', '')
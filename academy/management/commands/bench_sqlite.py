@@ -0,0 +1,124 @@
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand
+from myacademy.sqlite import PROFILES, init_command
+
+
+SCHEMA = [
+    'CREATE TABLE item (id INTEGER PRIMARY KEY, owner INTEGER NOT NULL, body TEXT NOT NULL, created_at REAL NOT NULL)',
+    'CREATE INDEX item_owner ON item (owner, created_at)',
+]
+
+
+def connect(path, profile):
+    """A connection set up like the Django backend does with the profile's DATABASES entry."""
+    config = PROFILES[profile]
+    conn = sqlite3.connect(path, timeout=config['timeout'], isolation_level=None)
+    if config['pragmas']:
+        for statement in init_command(config['pragmas']).split(';'):
+            conn.execute(statement)
+    return conn
+
+
+def write(conn, mode, owner, rng):
+    # read then write in one transaction, like get_or_create or a cart checkout
+    conn.execute(f'BEGIN {mode or ""}')
+    try:
+        conn.execute('SELECT count(*) FROM item WHERE owner = ?', (owner,)).fetchone()
+        conn.execute('INSERT INTO item (owner, body, created_at) VALUES (?, ?, ?)', (owner, 'x' * rng.randint(50, 500), time.time()))
+        conn.execute('COMMIT')
+    except sqlite3.OperationalError:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def read(conn, mode, owner, rng):
+    conn.execute('SELECT id, body FROM item WHERE owner = ? ORDER BY created_at DESC LIMIT 10', (owner,)).fetchall()
+    conn.execute('SELECT count(*) FROM item').fetchone()
+
+
+def run_client(path, profile, role, start_at, seconds, seed):
+    """Run one writer or reader until the end of the run, returns (operations, errors)."""
+    config = PROFILES[profile]
+    operation = write if role == 'writer' else read
+    rng = random.Random(seed)
+    conn = None
+    operations = errors = 0
+    time.sleep(max(start_at - time.time(), 0))
+    while time.time() < start_at + seconds:
+        if conn is None:
+            conn = connect(path, profile)
+        try:
+            operation(conn, config['transaction_mode'], rng.randint(1, 100), rng)
+            operations += 1
+        except sqlite3.OperationalError:
+            # database is locked
+            errors += 1
+        if not config['conn_max_age']:
+            # a connection per request
+            conn.close()
+            conn = None
+    if conn is not None:
+        conn.close()
+    return operations, errors
+
+
+class Command(BaseCommand):
+    help = 'Measure writer and reader throughput of concurrent processes on SQLite with every database profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--profile', action='append', choices=sorted(PROFILES), help='profiles to measure (default: all)')
+        parser.add_argument('--report', help='write the machine readable report to this json file')
+
+    def handle(self, *args, **options):
+        results = {profile: self.measure(profile, options) for profile in options['profile'] or PROFILES}
+
+        self.stdout.write(f'{"profile":<14}{"writes/s":>10}{"reads/s":>10}{"write errors":>14}{"read errors":>13}')
+        for profile, result in results.items():
+            self.stdout.write(
+                f'{profile:<14}{result["writes_per_second"]:>10.0f}{result["reads_per_second"]:>10.0f}'
+                f'{result["write_errors"]:>14}{result["read_errors"]:>13}'
+            )
+        if options['report']:
+            with open(options['report'], 'w') as file:
+                json.dump(results, file, indent=2)
+
+    def measure(self, profile, options):
+        roles = ['writer'] * options['writers'] + ['reader'] * options['readers']
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.sqlite3')
+            conn = connect(path, profile)
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.close()
+
+            with ProcessPoolExecutor(max(len(roles), 1), mp_context=multiprocessing.get_context('spawn')) as executor:
+                # started together once every process is up
+                start_at = time.time() + 1 + len(roles) * 0.1
+                futures = [
+                    (role, executor.submit(run_client, path, profile, role, start_at, options['seconds'], seed))
+                    for seed, role in enumerate(roles)
+                ]
+                totals = {'writer': [0, 0], 'reader': [0, 0]}
+                for role, future in futures:
+                    operations, errors = future.result()
+                    totals[role][0] += operations
+                    totals[role][1] += errors
+        return {
+            'writers': options['writers'],
+            'readers': options['readers'],
+            'seconds': options['seconds'],
+            'writes_per_second': totals['writer'][0] / options['seconds'],
+            'reads_per_second': totals['reader'][0] / options['seconds'],
+            'write_errors': totals['writer'][1],
+            'read_errors': totals['reader'][1],
+        }
@@ -0,0 +1,75 @@
+import json
+import platform
+from pathlib import Path
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from academy.benchmarks import compare, run_benchmarks, seed_dataset
+
+
+BASELINE = Path(__file__).resolve().parents[2] / 'bench_baseline.json'
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway database, measure every view and compare against the checked-in baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--baseline', default=str(BASELINE))
+        parser.add_argument('--report', help='write the machine readable report to this json file')
+        parser.add_argument('--update-baseline', action='store_true')
+        parser.add_argument('--query-tolerance', type=int, default=0)
+        parser.add_argument('--time-tolerance', type=float, default=None, help='allowed relative slowdown, e.g. 0.5; timings are not compared by default')
+
+    def handle(self, *args, **options):
+        setup_test_environment(debug=False)
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            data = seed_dataset(options['scale'], options['seed'])
+            results, unmeasured = run_benchmarks(data, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        baseline_path = Path(options['baseline'])
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+        regressions = compare(results, baseline.get('results', {}), options['query_tolerance'], options['time_tolerance'])
+
+        self.stdout.write(f'{"endpoint":<58}{"status":>7}{"queries":>9}{"sql ms":>9}{"tpl ms":>9}{"wall ms":>9}')
+        for key, result in sorted(results.items()):
+            self.stdout.write(
+                f'{key:<58}{result["status"]:>7}{result["queries"]:>9}{result["sql_ms"]:>9.1f}{result["template_ms"]:>9.1f}{result["wall_ms"]:>9.1f}'
+            )
+        for name in unmeasured:
+            self.stdout.write(self.style.WARNING(f'{name} has no benchmark case in academy.benchmarks.ENDPOINTS'))
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'scale': options['scale'],
+            'seed': options['seed'],
+            'repeat': options['repeat'],
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'results': results,
+            'unmeasured': unmeasured,
+            'regressions': regressions,
+        }
+        if options['report']:
+            Path(options['report']).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        if options['update_baseline']:
+            del report['regressions']
+            baseline_path.write_text(json.dumps(report, indent=2, ensure_ascii=False, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {baseline_path}'))
+            return
+
+        for regression in regressions:
+            self.stderr.write(f'{regression["endpoint"]}: {regression["metric"]} {regression["baseline"]} -> {regression["value"]}')
+        if regressions:
+            raise CommandError(f'{len(regressions)} regressions against {baseline_path}')
+        self.stdout.write(self.style.SUCCESS(f'{len(results)} endpoint measurements within the baseline.'))
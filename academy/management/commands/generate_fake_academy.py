@@ -0,0 +1,221 @@
+import random
+import time
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from academy.models import Bookmark, Category, Comment, Course, Lesson, Seasion
+from academy.search import update_course_index
+from academy.stats import refresh_course_stats
+from cart.models import Cart, CartItem, Order
+from user.models import Profile, User
+
+
+class Command(BaseCommand):
+    help = 'Bulk create a large synthetic catalog for load tests, without save() or signals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--teachers', type=int, default=500)
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--courses', type=int, default=10_000)
+        parser.add_argument('--seasions-per-course', type=int, default=3)
+        parser.add_argument('--lessons-per-seasion', type=int, default=5)
+        parser.add_argument('--comments', type=int, default=100_000)
+        parser.add_argument('--reply-ratio', type=float, default=0.4, help='share of comments that are replies')
+        parser.add_argument('--bookmarks-per-user', type=int, default=5)
+        parser.add_argument('--cart-ratio', type=float, default=0.2, help='share of students with an open cart')
+        parser.add_argument('--order-ratio', type=float, default=0.3, help='share of students with a paid order')
+        parser.add_argument('--items-per-cart', type=int, default=3)
+        parser.add_argument('--batch-size', type=int, default=2_000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--skip-index', action='store_true', help='do not rebuild statistics and the search index')
+
+    def handle(self, *args, **options):
+        if options['teachers'] > options['users']:
+            raise CommandError('--teachers can not be more than --users.')
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.started = time.perf_counter()
+        # a unique prefix keeps repeated runs from colliding on usernames, emails and phone numbers
+        self.run_id = User.objects.count()
+
+        teacher_ids, student_ids = self.create_users()
+        category_ids = self.create_categories()
+        course_ids = self.create_courses(teacher_ids, student_ids, category_ids)
+        self.create_bookmarks(student_ids, course_ids)
+        self.create_carts(student_ids, course_ids)
+
+        if not options['skip_index']:
+            for start in range(0, len(course_ids), self.batch_size):
+                batch = course_ids[start:start + self.batch_size]
+                refresh_course_stats(batch)
+                update_course_index(batch)
+            self.log('statistics and search index')
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - self.started:.1f}s.'))
+
+    def log(self, message):
+        self.stdout.write(f'[{time.perf_counter() - self.started:8.1f}s] {message}')
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield range(start, min(start + self.batch_size, total))
+
+    def create_users(self):
+        password = make_password('password')
+        teachers = self.options['teachers']
+        ids = []
+        for batch in self.batches(self.options['users']):
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(
+                        username = f'fake{self.run_id}-{i}',
+                        email = f'fake{self.run_id}-{i}@example.com',
+                        phone_number = f'08{self.run_id + i:09d}',
+                        password = password,
+                        is_active = True,
+                        is_mentor = i < teachers,
+                    )
+                    for i in batch
+                ])
+                Profile.objects.bulk_create([Profile(user_id = user.pk) for user in users])
+            ids += [user.pk for user in users]
+            self.log(f'{len(ids)} users')
+        return ids[:teachers], ids[teachers:] or ids
+
+    def create_categories(self):
+        categories = Category.objects.bulk_create([
+            Category(title = f'دسته {i}', slug = f'fake{self.run_id}-category-{i}')
+            for i in range(self.options['categories'])
+        ])
+        return [category.pk for category in categories]
+
+    def create_courses(self, teacher_ids, student_ids, category_ids):
+        """Courses are created batch by batch together with their seasions, lessons and comments."""
+        options, rng = self.options, self.rng
+        seasions_per_course, lessons_per_seasion = options['seasions_per_course'], options['lessons_per_seasion']
+        total = options['courses']
+        comments_per_course, extra_comments = divmod(options['comments'], total) if total else (0, 0)
+        course_ids = []
+        comments = 0
+
+        for batch in self.batches(total):
+            with transaction.atomic():
+                courses = Course.objects.bulk_create([
+                    Course(
+                        name = f'دوره آزمایشی {i}',
+                        description = 'توضیحات دوره آزمایشی',
+                        teacher_id = rng.choice(teacher_ids),
+                        price = rng.randrange(0, 2_000_000, 10_000),
+                        thumbnail = 'courses/images/fake.png',
+                        time = '10:00:00',
+                        difficulty_level = rng.choice('jms'),
+                        is_active = rng.random() < 0.9,
+                    )
+                    for i in batch
+                ])
+                Course.category.through.objects.bulk_create([
+                    Course.category.through(course_id = course.pk, category_id = category_id)
+                    for course in courses for category_id in rng.sample(category_ids, min(2, len(category_ids)))
+                ], batch_size = self.batch_size)
+
+                seasions = Seasion.objects.bulk_create(
+                    [Seasion(title = f'فصل {n + 1}') for _ in courses for n in range(seasions_per_course)],
+                    batch_size = self.batch_size,
+                )
+                Course.seasions.through.objects.bulk_create([
+                    Course.seasions.through(course_id = course.pk, seasion_id = seasion.pk)
+                    for index, course in enumerate(courses)
+                    for seasion in seasions[index * seasions_per_course:(index + 1) * seasions_per_course]
+                ], batch_size = self.batch_size)
+
+                lessons = Lesson.objects.bulk_create([
+                    Lesson(
+                        title = f'درس {n + 1}',
+                        description = 'توضیحات درس',
+                        file = 'courses/lessons/files/fake.mp4',
+                        teacher_id = course.teacher_id,
+                        time = f'00:{rng.randrange(3, 40):02d}:00',
+                        is_free = n == 0,
+                    )
+                    for course in courses for _ in range(seasions_per_course) for n in range(lessons_per_seasion)
+                ], batch_size = self.batch_size)
+                Seasion.lessons.through.objects.bulk_create([
+                    Seasion.lessons.through(seasion_id = seasions[index // lessons_per_seasion].pk, lesson_id = lesson.pk)
+                    for index, lesson in enumerate(lessons)
+                ], batch_size = self.batch_size)
+
+                counts = {}
+                for course in courses:
+                    counts[course.pk] = comments_per_course + (1 if len(course_ids) < extra_comments else 0)
+                    course_ids.append(course.pk)
+                comments += self.create_comments(counts, student_ids)
+            self.log(f'{len(course_ids)} courses, {comments} comments')
+        return course_ids
+
+    def create_comments(self, counts, user_ids):
+        """
+        Roots of every course first, then replies in waves, each wave answering
+        comments of the previous one on the same course.
+        """
+        rng = self.rng
+        replies = {course_id: int(count * self.options['reply_ratio']) for course_id, count in counts.items()}
+        created = Comment.objects.bulk_create([
+            Comment(media_id = course_id, message = 'نظر آزمایشی', user_id = rng.choice(user_ids), active = rng.random() < 0.95)
+            for course_id, count in counts.items() for _ in range(count - replies[course_id])
+        ], batch_size = self.batch_size)
+        total = len(created)
+        while created:
+            parents = {}
+            for comment in created:
+                parents.setdefault(comment.media_id, []).append(comment.pk)
+            wave = []
+            for course_id, course_parents in parents.items():
+                size = min(replies[course_id], max(1, replies[course_id] // 2))
+                replies[course_id] -= size
+                wave += [
+                    Comment(media_id = course_id, parent_id = rng.choice(course_parents), message = 'پاسخ آزمایشی', user_id = rng.choice(user_ids), active = True)
+                    for _ in range(size)
+                ]
+            created = Comment.objects.bulk_create(wave, batch_size = self.batch_size)
+            total += len(created)
+        return total
+
+    def create_bookmarks(self, student_ids, course_ids):
+        per_user = min(self.options['bookmarks_per_user'], len(course_ids))
+        created = 0
+        for batch in self.batches(len(student_ids)):
+            Bookmark.objects.bulk_create([
+                Bookmark(user_id = student_ids[i], content_type = 'course', media_id = course_id)
+                for i in batch for course_id in self.rng.sample(course_ids, per_user)
+            ], batch_size = self.batch_size)
+            created += len(batch) * per_user
+        self.log(f'{created} bookmarks')
+
+    def create_carts(self, student_ids, course_ids):
+        rng, options = self.rng, self.options
+        per_cart = min(options['items_per_cart'], len(course_ids))
+        prices = dict(Course.objects.filter(pk__in = course_ids).values_list('pk', 'price')) if per_cart else {}
+        carts = orders = 0
+        for batch in self.batches(len(student_ids)):
+            with transaction.atomic():
+                new_carts = []
+                for i in batch:
+                    if rng.random() < options['order_ratio']:
+                        new_carts.append(Cart(user_id = student_ids[i], status = 'paid'))
+                    if rng.random() < options['cart_ratio']:
+                        new_carts.append(Cart(user_id = student_ids[i], status = 'created'))
+                new_carts = Cart.objects.bulk_create(new_carts)
+                items = {
+                    cart.pk: [CartItem(cart_id = cart.pk, media_id = course_id, price = prices[course_id]) for course_id in rng.sample(course_ids, per_cart)]
+                    for cart in new_carts
+                }
+                CartItem.objects.bulk_create([item for cart_items in items.values() for item in cart_items], batch_size = self.batch_size)
+                paid = [
+                    Order(user_id = cart.user_id, cart_id = cart.pk, status = 'paid', total_price = sum(item.price for item in items[cart.pk]))
+                    for cart in new_carts if cart.status == 'paid'
+                ]
+                Order.objects.bulk_create(paid)
+            carts += len(new_carts)
+            orders += len(paid)
+        self.log(f'{carts} carts, {orders} orders')
@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from PIL import UnidentifiedImageError
+from academy.cache import bump_home_version
+from academy.images import delete_variants, render_variants, variant_fields
+from cart.commerce import bump_commerce_version
+
+
+class Command(BaseCommand):
+    help = 'Render the WebP variants of uploaded images that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='render the variants of every image again')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        rendered = failed = 0
+        with ThreadPoolExecutor(options['workers']) as executor:
+            for model, field in variant_fields():
+                queryset = model._default_manager.exclude(**{field.attname: ''}).order_by('pk')
+                last_pk = 0
+                while True:
+                    instances = list(queryset.filter(pk__gt = last_pk)[:options['batch_size']])
+                    if not instances:
+                        break
+                    last_pk = instances[-1].pk
+                    pending = [instance for instance in instances if options['force'] or not field.get_variants(instance)]
+                    # Pillow releases the GIL while resizing and encoding, so threads render in parallel
+                    for instance, result in zip(pending, executor.map(lambda instance: self.render(instance, field), pending)):
+                        if result is None:
+                            failed += 1
+                            continue
+                        old = getattr(instance, field.variants_field) or {}
+                        # update() skips signals, caches are invalidated once at the end
+                        updated = model._default_manager.filter(pk = instance.pk, **{field.attname: result['source']}).update(**{field.variants_field: result})
+                        if updated:
+                            delete_variants(old, getattr(instance, field.attname).storage, keep=result)
+                            rendered += 1
+                self.stdout.write(f'{model._meta.label}.{field.name}: done')
+
+        if rendered:
+            bump_home_version()
+            bump_commerce_version()
+        self.stdout.write(self.style.SUCCESS(f'Rendered variants of {rendered} images, {failed} failed.'))
+
+    def render(self, instance, field):
+        file = getattr(instance, field.attname)
+        try:
+            return render_variants(file, field.variant_widths)
+        except (OSError, UnidentifiedImageError) as ex:
+            self.stderr.write(f'{file.name}: {ex}')
+            return None
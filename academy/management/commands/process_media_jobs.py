@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from academy.media_jobs import JobRunner
+
+
+class Command(BaseCommand):
+    help = 'Probe, segment to HLS and render preview sprites of uploaded lesson files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='worker processes, 0 runs jobs in this process (default: MEDIA_JOB_WORKERS)')
+        parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+        parser.add_argument('--poll', type=float, default=5, help='seconds between looks at an empty queue')
+
+    def handle(self, *args, **options):
+        runner = JobRunner(workers=options['workers'])
+        try:
+            runner.run(once=options['once'], poll=options['poll'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Processed {runner.stats["done"]} media jobs, {runner.stats["failed"]} failed.'))
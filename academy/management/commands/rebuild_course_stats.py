@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from academy.models import Course
+from academy.stats import refresh_course_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute lesson, duration, comment and enrollment counters of all courses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = 0
+        last_pk = 0
+        while True:
+            course_ids = list(Course.objects.filter(pk__gt = last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not course_ids:
+                break
+            refresh_course_stats(course_ids)
+            updated += len(course_ids)
+            last_pk = course_ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f'{updated} courses updated.'))
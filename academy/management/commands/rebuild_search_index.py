@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from academy.models import Course
+from academy.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the course search index from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        backend = get_search_backend()
+        backend.setup()
+        if hasattr(backend, 'clear'):
+            backend.clear()
+
+        indexed = 0
+        last_pk = 0
+        while True:
+            courses = list(
+                Course.objects.filter(pk__gt = last_pk).order_by('pk')
+                .select_related('teacher').prefetch_related('category')[:batch_size])
+            if not courses:
+                break
+            indexed += len(backend.index_courses(courses))
+            last_pk = courses[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(f'{indexed} courses indexed.'))
@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from myacademy.replicas import sync_replicas
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database into the DATABASE_REPLICAS files, for local replica setups'
+
+    def handle(self, *args, **options):
+        if not settings.REPLICA_DATABASES:
+            raise CommandError('No replicas configured, set DATABASE_REPLICAS.')
+        sync_replicas()
+        self.stdout.write(self.style.SUCCESS(f'Synced {", ".join(settings.REPLICA_DATABASES)}.'))
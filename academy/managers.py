@@ -1,10 +1,73 @@
-from django.db.models import Manager
+from collections import defaultdict
+from django.apps import apps
+from django.db.models import Manager, QuerySet
+from django.db.models.query import ModelIterable
 
 
-class CommentManager(Manager):
+# media type -> (model, select_related, prefetch_related) used to load referenced objects
+MEDIA_TYPES = {
+    'course': ('academy.Course', ['teacher__profile'], []),
+}
+
+
+def resolve_media(rows, type_field='content_type', id_field='media_id'):
+    """
+    Attach the object referenced by (type_field, id_field) to every row,
+    fetching each media type with a single query.
+    Rows that reference a missing object or an unknown type get None.
+    """
+    rows = [row for row in rows if not hasattr(row, '_media_cache')]
+    ids = defaultdict(set)
+    for row in rows:
+        ids[getattr(row, type_field)].add(getattr(row, id_field))
+
+    objects = {}
+    for media_type, media_ids in ids.items():
+        if media_type in MEDIA_TYPES:
+            model, select_related, prefetch_related = MEDIA_TYPES[media_type]
+            queryset = apps.get_model(model).objects.select_related(*select_related).prefetch_related(*prefetch_related)
+            objects[media_type] = queryset.in_bulk(media_ids)
+
+    for row in rows:
+        row._media_cache = objects.get(getattr(row, type_field), {}).get(getattr(row, id_field))
+    return rows
+
+
+class MediaQuerySet(QuerySet):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._prefetch_media = False
+
+    def prefetch_media(self):
+        """Resolve the referenced media of all rows in one query per type when evaluated."""
+        clone = self._chain()
+        clone._prefetch_media = True
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._prefetch_media = self._prefetch_media
+        return clone
+
+    def _fetch_all(self):
+        fetched = self._result_cache is None
+        super()._fetch_all()
+        if fetched and self._prefetch_media and self._iterable_class is ModelIterable:
+            resolve_media(self._result_cache, self.model.media_type_field)
+
+
+class MediaManager(Manager.from_queryset(MediaQuerySet)):
+    pass
+
+
+class CommentQuerySet(MediaQuerySet):
     def all_active(self):
         return self.filter(active = True)
 
+
+class CommentManager(Manager.from_queryset(CommentQuerySet)):
+    pass
+
 class CommentManager2(Manager):
     def all_active(self):
         return self.filter(active=True)
@@ -0,0 +1,228 @@
+"""
+Processing of lesson files: the duration for Lesson.time, an HLS ladder and seek preview sprites.
+
+Jobs are queued when a lesson gets a new file and run by the process_media_jobs command.
+Runners claim jobs with a conditional update, so several of them can share the queue, and
+run them in a process pool with a limit per kind. Workers never touch the database, the
+runner stores their results in Lesson.media_info:
+{'source': name, 'duration', 'width', 'height', 'hls': {'playlist', ...}, 'sprites': {'sheets', 'track', ...}}
+"""
+import hashlib
+import logging
+import multiprocessing
+import posixpath
+import shutil
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import time as clock_time, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Lesson, MediaJob
+from .video import run_job
+
+
+logger = logging.getLogger(__name__)
+
+KINDS = [MediaJob.Kinds.probe, MediaJob.Kinds.hls, MediaJob.Kinds.sprites]
+
+
+def output_name(lesson_id, source, kind):
+    """Directory of the outputs of a job, relative to MEDIA_ROOT."""
+    digest = hashlib.sha1(source.encode()).hexdigest()[:12]
+    return posixpath.join('courses/lessons/streams', str(lesson_id), digest, kind)
+
+
+def lesson_storage():
+    return Lesson._meta.get_field('file').storage
+
+
+def delete_outputs(lesson_id, source):
+    storage = lesson_storage()
+    for kind in KINDS:
+        shutil.rmtree(storage.path(output_name(lesson_id, source, kind)), ignore_errors=True)
+
+
+def duration_time(seconds):
+    seconds = min(round(seconds), 24 * 60 * 60 - 1)
+    return clock_time(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def enqueue_media_jobs(lesson):
+    """Queue the jobs of the file of `lesson` once the save is committed, unless it has its outputs."""
+    source = lesson.file.name
+    if not source or (lesson.media_info or {}).get('source') == source:
+        return
+    lesson_id = lesson.pk
+    transaction.on_commit(lambda: MediaJob.objects.bulk_create(
+        [MediaJob(lesson_id = lesson_id, kind = kind, source = source) for kind in KINDS], ignore_conflicts=True,
+    ))
+
+
+def claim_job(kinds):
+    """
+    Take the next due job of one of `kinds`, None when there is none. Jobs left running
+    for MEDIA_JOB_TIMEOUT belong to a runner that died and are taken again.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.MEDIA_JOB_TIMEOUT)
+    candidates = MediaJob.objects.filter(
+        Q(status = MediaJob.Statuses.queued, run_after__lte = now) | Q(status = MediaJob.Statuses.running, started_at__lt = stale),
+        kind__in = kinds,
+    ).order_by('run_after', 'pk').values_list('pk', 'status', 'attempts')[:20]
+    for pk, status, attempts in candidates:
+        job = MediaJob.objects.filter(pk = pk, status = status, attempts = attempts)
+        if attempts >= settings.MEDIA_JOB_MAX_ATTEMPTS:
+            job.update(status = MediaJob.Statuses.failed, error = 'Timed out.', finished_at = now)
+            continue
+        # another runner took it if nothing is updated
+        if job.update(status = MediaJob.Statuses.running, attempts = attempts + 1, started_at = now, finished_at = None):
+            return MediaJob.objects.select_related('lesson').get(pk = pk)
+    return None
+
+
+def job_arguments(job):
+    """Arguments of video.run_job for `job`, with an empty output directory."""
+    storage = lesson_storage()
+    output = storage.path(output_name(job.lesson_id, job.source, job.kind))
+    shutil.rmtree(output, ignore_errors=True)
+    processor = import_string(settings.MEDIA_PROCESSOR)
+    return processor, settings.MEDIA_PROCESSOR_OPTIONS, job.kind, storage.path(job.source), output
+
+
+def complete_job(job, result):
+    """Store the result of `job` on its lesson, the outputs of a replaced file are deleted."""
+    with transaction.atomic():
+        lesson = Lesson.objects.select_for_update().filter(pk = job.lesson_id).first()
+        if lesson is None or lesson.file.name != job.source:
+            MediaJob.objects.filter(pk = job.pk).delete()
+            delete_outputs(job.lesson_id, job.source)
+            return
+        old_source = (lesson.media_info or {}).get('source')
+        info = lesson.media_info if old_source == job.source else {'source': job.source}
+        fields = ['media_info']
+        if job.kind == MediaJob.Kinds.probe:
+            info.update(result)
+            lesson.time = duration_time(result['duration'])
+            fields.append('time')
+        else:
+            directory = output_name(lesson.pk, job.source, job.kind)
+            if job.kind == MediaJob.Kinds.hls:
+                result['playlist'] = posixpath.join(directory, result['playlist'])
+            else:
+                result['sheets'] = [posixpath.join(directory, name) for name in result['sheets']]
+                result['track'] = posixpath.join(directory, result['track'])
+            info[job.kind] = result
+        lesson.media_info = info
+        # signals of the save refresh the course duration
+        lesson.save(update_fields=fields)
+        MediaJob.objects.filter(pk = job.pk).update(status = MediaJob.Statuses.done, error = '', finished_at = timezone.now())
+    if old_source and old_source != job.source:
+        delete_outputs(lesson.pk, old_source)
+
+
+def fail_job(job, error):
+    """Queue `job` again after a growing delay, or mark it failed once its attempts are used."""
+    now = timezone.now()
+    if job.attempts < settings.MEDIA_JOB_MAX_ATTEMPTS:
+        changes = {'status': MediaJob.Statuses.queued, 'run_after': now + timedelta(seconds=settings.MEDIA_JOB_RETRY_DELAY * 2 ** (job.attempts - 1))}
+    else:
+        changes = {'status': MediaJob.Statuses.failed, 'finished_at': now}
+    MediaJob.objects.filter(pk = job.pk).update(error = str(error)[:2000], **changes)
+
+
+class InlineExecutor:
+    """Runs jobs in the calling process, for tests and debugging."""
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as ex:
+            future.set_exception(ex)
+        return future
+
+    def shutdown(self, **kwargs):
+        pass
+
+
+class JobRunner:
+    """
+    Claims jobs while fewer than `workers` run and fewer than `concurrency[kind]`
+    of their kind, workers=0 runs them one by one in this process.
+    """
+    def __init__(self, workers=None, concurrency=None):
+        self.workers = settings.MEDIA_JOB_WORKERS if workers is None else workers
+        self.concurrency = concurrency or settings.MEDIA_JOB_CONCURRENCY
+        self.running = {}
+        self.stats = Counter()
+
+    def get_executor(self):
+        if not self.workers:
+            return InlineExecutor()
+        # spawned workers only import academy.video, forking would copy the database connection
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def fill(self, executor):
+        while len(self.running) < max(self.workers, 1):
+            busy = Counter(job.kind for job in self.running.values())
+            kinds = [kind for kind in KINDS if busy[kind] < self.concurrency.get(kind, self.workers or 1)]
+            if not kinds:
+                return
+            job = claim_job(kinds)
+            if job is None:
+                return
+            if job.lesson.file.name != job.source:
+                job.delete()
+                continue
+            self.running[executor.submit(run_job, *job_arguments(job))] = job
+
+    def finish(self, job, future):
+        """Store the outcome of a job, True when its worker process crashed."""
+        error = future.exception()
+        if error is None:
+            complete_job(job, future.result())
+            self.stats['done'] += 1
+            return False
+        logger.warning('Media job %s of lesson %s failed: %s', job.kind, job.lesson_id, error)
+        fail_job(job, error)
+        self.stats['failed'] += 1
+        return isinstance(error, BrokenProcessPool)
+
+    def run(self, once=False, poll=5):
+        """Run jobs until the queue is empty with `once`, forever otherwise."""
+        executor = self.get_executor()
+        try:
+            while True:
+                self.fill(executor)
+                if not self.running:
+                    if once:
+                        return self.stats
+                    time.sleep(poll)
+                    continue
+                done, _ = wait(self.running, timeout=poll, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    broken |= self.finish(self.running.pop(future), future)
+                if broken:
+                    # the other futures of a broken pool fail as well
+                    for future, job in list(self.running.items()):
+                        self.finish(self.running.pop(future), future)
+                    executor.shutdown(wait=False)
+                    executor = self.get_executor()
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+
+def job_states(lessons):
+    """Set `current_jobs` on every lesson, the jobs of its current file."""
+    jobs = MediaJob.objects.filter(lesson__in = lessons).order_by('pk')
+    by_lesson = {}
+    for job in jobs:
+        by_lesson.setdefault(job.lesson_id, []).append(job)
+    for lesson in lessons:
+        lesson.current_jobs = [job for job in by_lesson.get(lesson.pk, []) if job.source == lesson.file.name]
+    return lessons
@@ -1,9 +1,23 @@
 from django.db import models
+from django.utils import timezone
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from user.models import User
-from .managers import CommentManager
-from django.db.models import Count, Sum
+from .images import VariantImageField
+from .managers import CommentManager, MediaManager, resolve_media
+
+
+class MediaReferenceMixin:
+    """
+    For models pointing to a media by (type, media_id).
+    The object is loaded once and memoized, querysets can batch it with prefetch_media().
+    """
+    media_type_field = 'content_type'
+
+    def get_object(self):
+        if not hasattr(self, '_media_cache'):
+            resolve_media([self], self.media_type_field)
+        return self._media_cache
 
 
 class Course(models.Model):
@@ -16,7 +30,8 @@ class Course(models.Model):
     price_with_discount = models.IntegerField(_('قیمت با تخفیف'), blank=True, null=True)
     tax = models.DecimalField(_('مالیات'), max_digits=4, decimal_places=2, default=0.0, help_text='درصد مالیات')
     related_course = models.ManyToManyField('self', blank=True, verbose_name=_('دوره های مرتبط'))
-    thumbnail = models.ImageField(_('عکس'), upload_to='courses/images/')
+    thumbnail = VariantImageField(_('عکس'), upload_to='courses/images/', variant_widths=(100, 370, 770), variants_field='thumbnail_variants')
+    thumbnail_variants = models.JSONField(default=dict, blank=True, editable=False)
     time = models.TimeField(_('زمان'))
     skils_type = (('j', 'مبتدی'), ('m', 'متوسط'), ('s', 'پیشرفته'))
     difficulty_level = models.CharField(_('سظح مهارت'), default='j', choices=skils_type, max_length=1)
@@ -24,6 +39,10 @@ class Course(models.Model):
     trailer = models.FileField(_('ویدیو معرفی'), blank=True, upload_to='courses/trailer/')
     is_askable = models.BooleanField(_('اجازه پرسش و پاسخ'), default=True)
     is_active = models.BooleanField(_('فعال'), help_text='وضعیت نمایش به دانشجو', default=False)
+    lesson_count = models.PositiveIntegerField(_('تعداد درس ها'), default=0, editable=False)
+    total_duration = models.PositiveIntegerField(_('مدت کل درس ها'), default=0, editable=False, help_text='ثانیه')
+    comment_count = models.PositiveIntegerField(_('تعداد نظرات'), default=0, editable=False)
+    enrollment_count = models.PositiveIntegerField(_('تعداد دانشجو'), default=0, editable=False)
     updated_at = models.DateTimeField(_('اپدیت شده در'), auto_now=True)
     created_at = models.DateTimeField(_('زمان ساخت'), auto_now_add=True)
 
@@ -31,10 +50,15 @@ class Course(models.Model):
     class Meta:
         verbose_name = 'دوره'
         verbose_name_plural = 'دوره ها'
-        ordering = ['is_active', 'created_at']
+        ordering = ['id']
+        indexes = [
+            # course lists, paginated over updated_at, see academy.pagination. Partial, django
+            # filters booleans with a bare column which an index on is_active does not match
+            models.Index(fields=['updated_at'], condition=models.Q(is_active=True), name='course_active_updated'),
+        ]
 
     def lessons_count(self):
-        return self.seasions.annotate(lessons_count = Count('lessons')).aggregate(count = Sum('lessons_count'))['count'] or 0
+        return self.lesson_count
     
     def get_final_price(self):
         """
@@ -56,7 +80,7 @@ class Course(models.Model):
         return self.name
 
 
-class Comment(models.Model):
+class Comment(MediaReferenceMixin, models.Model):
     comment_class = (('course', 'دوره'),)
     media_id = models.IntegerField(_('ایدی مدیا'))
     media_type = models.CharField(_('نوع'), default='course', max_length=10, choices=comment_class)
@@ -66,17 +90,19 @@ class Comment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_('کاربر'))
     active = models.BooleanField(_('وضعیت'), default=False)
     objects = CommentManager()
+    media_type_field = 'media_type'
 
-    def get_media(self, obj):
-        objects = {
-            'course': Course,
-        }
-        return objects[obj].objects.get(id = self.media_id)
+    def get_media(self, obj=None):
+        return self.get_object()
     
     class Meta:
         verbose_name = 'کامنت'
         verbose_name_plural = 'کامنت ها'
         ordering = ['active', 'created_at']
+        indexes = [
+            # comment threads, read in created_at order, and comment counts
+            models.Index(fields=['media_type', 'media_id', 'created_at'], condition=models.Q(active=True), name='comment_media_thread'),
+        ]
 
     def __str__(self):
         return f'{self.user.__str__()}:{self.pk}'
@@ -107,7 +133,8 @@ class Team(models.Model):
     social_rubika = models.URLField(_('ادرس روبیکا'), blank=True)
     social_instagram = models.URLField(_('ادرس اینستاگرام'), blank=True)
     social_github = models.URLField(_('ادرس گیتهاب'), blank=True)
-    image = models.ImageField(_('عکس کاربر'), blank=True, upload_to='users/team/profiles/', help_text='260px * 350px none background')
+    image = VariantImageField(_('عکس کاربر'), blank=True, upload_to='users/team/profiles/', help_text='260px * 350px none background', variant_widths=(260, 520), variants_field='image_variants')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     position = models.TextField(_('سِمَت'), max_length=150)
 
     class Meta:
@@ -127,6 +154,8 @@ class Lesson(models.Model):
     time = models.TimeField(_('زمان'), blank=True, null=True)
     teacher = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_('مدرس'))
     is_free = models.BooleanField(_('رایگان'), default=False)
+    # outputs of the media jobs of the current file, see academy.media_jobs
+    media_info = models.JSONField(default=dict, blank=True, editable=False)
 
     class Meta:
         verbose_name = 'درس'
@@ -152,7 +181,8 @@ class Seasion(models.Model):
 
 class MainPageCategoryAdd(models.Model):
     title = models.CharField(_('نام تبلیغاتی دسته بندی '), max_length=150)
-    image = models.ImageField(_('عکس تبلیغاتی دسته بندی'), upload_to='categorys/images/')
+    image = VariantImageField(_('عکس تبلیغاتی دسته بندی'), upload_to='categorys/images/', variant_widths=(200, 400), variants_field='image_variants')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name=_('دسته بندی'))
 
     class Meta:
@@ -177,22 +207,62 @@ class MainPageCourseAdd(models.Model):
         return self.title
 
 
-class Bookmark(models.Model):
+class Bookmark(MediaReferenceMixin, models.Model):
     content_types = (('course', 'دوره ویدیویی'), ('file', 'فایل'))
     content_type = models.CharField(_("نوع محتوا"), max_length=6, choices=content_types)
     media_id = models.IntegerField(_("ایدی محصول"))
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_("کاربر"))
+    objects = MediaManager()
 
     class Meta:
         verbose_name = "محصولات / پست های ذخیره شده"
         verbose_name_plural = "محصول / پست ذخیره شده"
         ordering = ['id']
-
-    def get_object(self):
-        content_types = {
-            'course': Course,
-        }
-        return content_types[self.content_type].objects.get(id=self.media_id)
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'content_type', 'media_id'], name='unique_bookmark'),
+        ]
 
     def __str__(self):
         return f"{self.content_type} : {self.media_id}"
+
+
+class MediaJob(models.Model):
+    """
+    Processing of a lesson file, run by the process_media_jobs command.
+    `source` is the file name the job was made for, jobs of a replaced file are dropped.
+    """
+    class Kinds(models.TextChoices):
+        probe = 'probe', 'مدت زمان'
+        hls = 'hls', 'HLS'
+        sprites = 'sprites', 'پیش نمایش'
+
+    class Statuses(models.TextChoices):
+        queued = 'queued', 'در صف'
+        running = 'running', 'در حال پردازش'
+        done = 'done', 'انجام شده'
+        failed = 'failed', 'ناموفق'
+
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='media_jobs', verbose_name=_('درس'))
+    kind = models.CharField(_('نوع'), choices=Kinds.choices, max_length=7)
+    source = models.CharField(_('فایل'), max_length=255)
+    status = models.CharField(_('وضعیت'), choices=Statuses.choices, default=Statuses.queued, max_length=7)
+    attempts = models.PositiveSmallIntegerField(_('تلاش ها'), default=0)
+    error = models.TextField(_('خطا'), blank=True)
+    run_after = models.DateTimeField(_('اجرا بعد از'), default=timezone.now)
+    started_at = models.DateTimeField(_('زمان شروع'), blank=True, null=True)
+    finished_at = models.DateTimeField(_('زمان پایان'), blank=True, null=True)
+    created_at = models.DateTimeField(_('زمان ساخت'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'پردازش ویدیو'
+        verbose_name_plural = 'پردازش های ویدیو'
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['lesson', 'kind', 'source'], name='media_job_unique_source'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='media_job_queue'),
+        ]
+
+    def __str__(self):
+        return f'{self.lesson_id} {self.kind} : {self.status}'
@@ -0,0 +1,140 @@
+import hashlib
+from math import ceil
+from django.core import signing
+from django.db.models import Q
+from myacademy.metrics import cache_get_or_set
+
+
+CURSOR_SALT = 'academy.pagination.cursor'
+
+
+class CursorPage:
+    """
+    A page of a keyset paginated queryset, usable like django's Page in templates.
+    Links carry an opaque signed cursor instead of a page number.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, request, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.request = request
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def _url(self, cursor=None):
+        query = self.request.GET.copy()
+        query.pop('page', None)
+        query.pop('cursor', None)
+        if cursor:
+            query['cursor'] = cursor
+        return '?' + query.urlencode()
+
+    def first_url(self):
+        return self._url()
+
+    def next_url(self):
+        if self._has_next and self.object_list:
+            return self._url(self.paginator.encode_cursor(self.object_list[-1], backward=False))
+
+    def previous_url(self):
+        if self._has_previous and self.object_list:
+            return self._url(self.paginator.encode_cursor(self.object_list[0], backward=True))
+
+
+class CursorPaginator:
+    """
+    Keyset pagination over `ordering`, which must end with a unique field.
+    Each page is a single indexed range query, no OFFSET and no COUNT(*).
+    The total is optional, approximate and cached for `total_timeout` seconds.
+    """
+    def __init__(self, queryset, per_page, ordering=('updated_at', 'id'), with_total=False, total_timeout=300):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        self.with_total = with_total
+        self.total_timeout = total_timeout
+
+    def _field(self, name):
+        meta = self.queryset.model._meta
+        return meta.pk if name == 'pk' else meta.get_field(name)
+
+    def encode_cursor(self, obj, backward):
+        values = [self._field(name).value_to_string(obj) for name, descending in self.ordering]
+        return signing.dumps({'v': values, 'b': backward}, salt=CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, cursor):
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+            values = [self._field(name).to_python(value) for (name, descending), value in zip(self.ordering, data['v'], strict=True)]
+        except Exception:
+            return None, False
+        return values, bool(data.get('b'))
+
+    def _after(self, values, forward):
+        condition = Q()
+        for index, (name, descending) in enumerate(self.ordering):
+            lookup = 'gt' if descending != forward else 'lt'
+            equal = {previous_name: values[position] for position, (previous_name, _) in enumerate(self.ordering[:index])}
+            condition |= Q(**{f'{name}__{lookup}': values[index]}, **equal)
+        return condition
+
+    def _order_by(self, forward):
+        return [('-' if descending == forward else '') + name for name, descending in self.ordering]
+
+    def page(self, request):
+        values, backward = self.decode_cursor(request.GET.get('cursor', ''))
+        queryset = self.queryset.order_by(*self._order_by(forward=not backward))
+        if values is not None:
+            queryset = queryset.filter(self._after(values, forward=not backward))
+
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if backward:
+            object_list.reverse()
+            return CursorPage(object_list, self, request, has_next=True, has_previous=has_more)
+        return CursorPage(object_list, self, request, has_next=has_more, has_previous=values is not None)
+
+    @property
+    def count(self):
+        if not self.with_total:
+            return None
+        key = 'pagination:count:' + hashlib.md5(str(self.queryset.query).encode()).hexdigest()
+        return cache_get_or_set('pagination', key, self.queryset.count, self.total_timeout)
+
+    @property
+    def num_pages(self):
+        count = self.count
+        return None if count is None else max(ceil(count / self.per_page), 1)
+
+
+def cursor_paginate(queryset, per_page, request, ordering=('updated_at', 'id'), with_total=True):
+    return CursorPaginator(queryset, per_page, ordering, with_total=with_total).page(request)
+
+
+class CursorPaginationMixin:
+    """ListView mixin replacing page number pagination by keyset pagination."""
+    cursor_ordering = ('updated_at', 'id')
+
+    def paginate_queryset(self, queryset, page_size):
+        page = cursor_paginate(queryset, page_size, self.request, self.cursor_ordering)
+        return (page.paginator, page, page.object_list, page.has_other_pages())
@@ -0,0 +1,76 @@
+"""
+The hot lookups of the site and the plans they must keep, checked by
+academy.tests.tests_query_plans with EXPLAIN QUERY PLAN.
+
+Add a query here with the index it needs whenever a view or task gets a new hot
+filter, and keep the entries passing when the schema changes. A query regresses
+when it scans a table other than through its `index` in order, or sorts though
+`sorted` is False.
+"""
+from collections import namedtuple
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+from cart.models import Cart, CartItem
+from taskqueue.queue import due_tasks
+from user.models import OTPCode, SMSMessage
+from .models import Bookmark, Comment, Course
+
+
+HotQuery = namedtuple('HotQuery', ['name', 'build', 'index', 'sorted'], defaults=[None, False])
+
+HOT_QUERIES = [
+    HotQuery('course-list', lambda: Course.objects.filter(is_active = True).order_by('-updated_at', '-id')[:10], 'course_active_updated'),
+    HotQuery(
+        'comment-thread',
+        lambda: Comment.objects.filter(active = True, media_type = 'course', media_id = 1).order_by('created_at', 'id'),
+        'comment_media_thread',
+    ),
+    HotQuery(
+        'comment-counts',
+        lambda: Comment.objects.filter(media_type = 'course', media_id__in = [1, 2], active = True).values('media_id').annotate(count = Count('id')),
+        'comment_media_thread',
+    ),
+    HotQuery(
+        # unique constraints are part of the table on SQLite, their index has no stable name
+        'bookmark-toggle', lambda: Bookmark.objects.filter(user = 1, content_type = 'course', media_id = 1),
+    ),
+    HotQuery('open-cart', lambda: Cart.objects.filter(user = 1, status = 'created')),
+    HotQuery(
+        'course-purchases', lambda: CartItem.objects.filter(content_type = 'course', media_id__in = [1, 2]), 'cart_item_media',
+    ),
+    HotQuery(
+        'otp-lookup',
+        lambda: OTPCode.objects.filter(phone_number = '09123456789', code_type = 'register', expire_time__gte = timezone.now()),
+    ),
+    HotQuery('otp-purge', lambda: OTPCode.objects.filter(expire_time__lt = timezone.now()), 'otp_code_expiry'),
+    HotQuery('due-tasks', lambda: due_tasks(timezone.now()).values_list('pk')[:20], 'task_queue', sorted = True),
+    HotQuery(
+        'due-sms',
+        lambda: SMSMessage.objects.filter(status = 'queued', send_after__lte = timezone.now()).order_by('send_after', 'pk'),
+        'sms_delivery_queue',
+    ),
+]
+
+
+def query_plan(queryset):
+    """The steps of the plan of `queryset` on the default database, like 'SEARCH t USING INDEX i (a=?)'."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(query):
+    """What is wrong with the plan of a HotQuery, empty when nothing is."""
+    plan = query_plan(query.build())
+    # walking the index of the query in order, with a LIMIT, is how lists are paginated
+    problems = [
+        f'full scan: {step}' for step in plan
+        if step.startswith('SCAN') and not (query.index and step.endswith(f'INDEX {query.index}'))
+    ]
+    if not query.sorted:
+        problems += [f'sort: {step}' for step in plan if 'TEMP B-TREE' in step]
+    if query.index and not any(f'INDEX {query.index} ' in f'{step} ' for step in plan):
+        problems.append(f'{query.index} is not used')
+    return problems
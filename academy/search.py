@@ -0,0 +1,156 @@
+import re
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+
+PERSIAN_CHARACTERS = str.maketrans({
+    'ي': 'ی',
+    'ى': 'ی',
+    'ك': 'ک',
+    'ة': 'ه',
+    'ۀ': 'ه',
+    'أ': 'ا',
+    'إ': 'ا',
+    'ٱ': 'ا',
+    '\u200c': ' ',
+    '\u200f': ' ',
+    **{chr(0x06f0 + i): str(i) for i in range(10)},
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+})
+DIACRITICS = re.compile('[\u064b-\u065f\u0670\u0640]')
+TOKEN = re.compile(r'\w+')
+
+
+def normalize(text):
+    """
+    Unify arabic/persian letters and digits, drop diacritics and ZWNJ
+    so indexed text and queries are compared in the same form.
+    """
+    text = DIACRITICS.sub('', (text or '').translate(PERSIAN_CHARACTERS))
+    return ' '.join(text.lower().split())
+
+
+def tokenize(text):
+    return TOKEN.findall(normalize(text))
+
+
+def get_search_backend():
+    return import_string(getattr(settings, 'SEARCH_BACKEND', 'academy.search.SQLiteFTSBackend'))()
+
+
+def search_courses(queryset, query):
+    return get_search_backend().search(queryset, query)
+
+
+def update_course_index(course_ids):
+    from .models import Course
+
+    course_ids = set(course_ids)
+    if not course_ids:
+        return
+    backend = get_search_backend()
+    courses = Course.objects.filter(pk__in=course_ids).select_related('teacher').prefetch_related('category')
+    found = backend.index_courses(courses)
+    backend.remove_courses(course_ids - found)
+
+
+class BaseSearchBackend:
+    def setup(self, using='default'):
+        pass
+
+    def index_courses(self, courses, using='default'):
+        """Index the given courses and return the set of indexed ids."""
+        raise NotImplementedError
+
+    def remove_courses(self, course_ids, using='default'):
+        raise NotImplementedError
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def get_document(self, course):
+        return {
+            'name': normalize(course.name),
+            'categories': normalize(' '.join(category.title for category in course.category.all())),
+            'teacher': normalize(course.teacher.get_full_name() or course.teacher.username),
+            'description': normalize(course.description),
+        }
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """
+    Index-less fallback for databases without a full-text engine.
+    Every token must appear in the name, description or a category title.
+    """
+    def index_courses(self, courses, using='default'):
+        return {course.pk for course in courses}
+
+    def remove_courses(self, course_ids, using='default'):
+        pass
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset
+        for token in tokens:
+            queryset = queryset.filter(
+                Q(name__icontains = token) | Q(description__icontains = token) | Q(category__title__icontains = token))
+        return queryset.distinct()
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """
+    SQLite FTS5 index keyed by course id, ranked with bm25.
+    Column weights favour matches in the name over categories, teacher and description.
+    """
+    table = 'academy_course_search'
+    columns = ('name', 'categories', 'teacher', 'description')
+    weights = (10.0, 4.0, 3.0, 1.0)
+
+    def setup(self, using='default'):
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5('
+                f"{', '.join(self.columns)}, tokenize='unicode61 remove_diacritics 2')")
+
+    def index_courses(self, courses, using='default'):
+        rows = [(course.pk, *self.get_document(course).values()) for course in courses]
+        if rows:
+            with connections[using].cursor() as cursor:
+                cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(row[0],) for row in rows])
+                cursor.executemany(
+                    f'INSERT INTO {self.table} (rowid, {", ".join(self.columns)}) VALUES (%s, %s, %s, %s, %s)', rows)
+        return {row[0] for row in rows}
+
+    def remove_courses(self, course_ids, using='default'):
+        if course_ids:
+            with connections[using].cursor() as cursor:
+                cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(pk,) for pk in course_ids])
+
+    def clear(self, using='default'):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    def get_match_expression(self, query):
+        # every token is quoted and used as a prefix so partial words match while typing
+        return ' '.join(f'"{token}"*' for token in tokenize(query))
+
+    def search(self, queryset, query):
+        expression = self.get_match_expression(query)
+        if not expression:
+            return queryset
+
+        # matched and ranked inside the query, the filters of `queryset` apply before the cap
+        opts = queryset.model._meta
+        weights = ', '.join(map(str, self.weights))
+        matches = RawSQL(f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [expression])
+        rank = RawSQL(
+            f'SELECT bm25({self.table}, {weights}) FROM {self.table} '
+            f'WHERE {self.table} MATCH %s AND rowid = "{opts.db_table}"."{opts.pk.column}"',
+            [expression],
+        )
+        queryset = queryset.filter(pk__in = matches).annotate(search_rank = rank).order_by('search_rank', 'pk')
+        return queryset[:getattr(settings, 'SEARCH_MAX_RESULTS', 500)]
@@ -1,7 +1,13 @@
-from django.db.models.signals import pre_save, m2m_changed
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, post_migrate, m2m_changed
 from django.dispatch import receiver
 from django.forms import ValidationError
-from .models import MainPageCourseAdd, MainPageCategoryAdd
+from user.models import Profile
+from .cache import bump_home_version
+from .entitlements import invalidate_entitlements
+from .media_jobs import delete_outputs, enqueue_media_jobs
+from .models import Category, Comment, Course, Lesson, MainPageCourseAdd, MainPageCategoryAdd, Seasion, Team
+from .search import get_search_backend, update_course_index
+from .stats import courses_of_lessons, courses_of_seasions, refresh_course_stats
 
 @receiver(pre_save, sender=MainPageCourseAdd)
 def limit_course_instance(sender, instance, **kwargs):
@@ -17,3 +23,121 @@ def limit_category_instance(sender, instance, **kwargs):
 def limit_courses_count(sender, instance, action, **kwargs):
     if action in ['pre_add', 'pre_set'] and instance.courses.count() + len(kwargs.get('pk_set', [])) > 6:
         raise ValidationError('تعداد محصولات هر تب نمیتواند بیشتر از 6 محصول باشد.')
+
+
+@receiver(post_migrate)
+def setup_search_index(sender, using, **kwargs):
+    if sender.name == 'academy':
+        get_search_backend().setup(using)
+
+@receiver(post_save, sender=Course)
+def index_course(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_course_index([instance.pk])
+
+@receiver(post_delete, sender=Course)
+def unindex_course(sender, instance, **kwargs):
+    get_search_backend().remove_courses([instance.pk])
+
+@receiver(m2m_changed, sender=Course.category.through)
+def index_course_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ['post_add', 'post_remove']:
+        update_course_index(pk_set if reverse else [instance.pk])
+    elif action == 'pre_clear' and reverse:
+        instance._search_course_ids = list(instance.courses.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        update_course_index(getattr(instance, '_search_course_ids', []) if reverse else [instance.pk])
+
+@receiver(post_save, sender=Category)
+def index_category_courses(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        update_course_index(instance.courses.values_list('pk', flat=True))
+
+@receiver(pre_delete, sender=Category)
+def collect_category_courses(sender, instance, **kwargs):
+    instance._search_course_ids = list(instance.courses.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Category)
+def index_deleted_category_courses(sender, instance, **kwargs):
+    update_course_index(getattr(instance, '_search_course_ids', []))
+
+
+@receiver(m2m_changed, sender=Seasion.lessons.through)
+def update_stats_seasion_lessons(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        instance._stats_course_ids = courses_of_lessons([instance.pk]) if reverse else courses_of_seasions([instance.pk])
+    elif action == 'post_clear':
+        refresh_course_stats(getattr(instance, '_stats_course_ids', []))
+    elif action in ['post_add', 'post_remove']:
+        refresh_course_stats(courses_of_seasions(pk_set if reverse else [instance.pk]))
+
+@receiver(m2m_changed, sender=Course.seasions.through)
+def update_stats_course_seasions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._stats_course_ids = courses_of_seasions([instance.pk])
+    elif action == 'post_clear':
+        refresh_course_stats(getattr(instance, '_stats_course_ids', []) if reverse else [instance.pk])
+    elif action in ['post_add', 'post_remove']:
+        refresh_course_stats(pk_set if reverse else [instance.pk])
+
+@receiver(post_save, sender=Lesson)
+def update_stats_lesson(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        refresh_course_stats(courses_of_lessons([instance.pk]))
+
+@receiver(post_save, sender=Lesson)
+def queue_lesson_media_jobs(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and (update_fields is None or 'file' in update_fields):
+        enqueue_media_jobs(instance)
+
+@receiver(pre_delete, sender=Lesson)
+@receiver(pre_delete, sender=Seasion)
+def collect_stats_courses(sender, instance, **kwargs):
+    lookup = courses_of_lessons if sender is Lesson else courses_of_seasions
+    instance._stats_course_ids = lookup([instance.pk])
+
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender=Seasion)
+def update_stats_deleted(sender, instance, **kwargs):
+    refresh_course_stats(getattr(instance, '_stats_course_ids', []))
+
+@receiver(post_delete, sender=Lesson)
+def delete_lesson_media_outputs(sender, instance, **kwargs):
+    source = (instance.media_info or {}).get('source')
+    if source:
+        delete_outputs(instance.pk, source)
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def update_stats_comment(sender, instance, raw=False, **kwargs):
+    if not raw and instance.media_type == 'course':
+        refresh_course_stats([instance.media_id])
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_teacher_entitlements(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_entitlements(instance.teacher_id)
+
+
+@receiver(post_save, sender=MainPageCategoryAdd)
+@receiver(post_save, sender=MainPageCourseAdd)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Team)
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=MainPageCategoryAdd)
+@receiver(post_delete, sender=MainPageCourseAdd)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Team)
+@receiver(post_delete, sender=Profile)
+def invalidate_home(sender, **kwargs):
+    bump_home_version()
+
+@receiver(m2m_changed, sender=MainPageCourseAdd.courses.through)
+@receiver(m2m_changed, sender=Course.category.through)
+def invalidate_home_relations(sender, action, **kwargs):
+    if action in ['post_add', 'post_remove', 'post_clear']:
+        bump_home_version()
@@ -0,0 +1,53 @@
+from collections import Counter
+from django.db.models import Count
+from .models import Comment, Course, Lesson
+
+
+STATS_FIELDS = ['lesson_count', 'total_duration', 'comment_count', 'enrollment_count']
+
+
+def courses_of_seasions(seasion_ids):
+    return list(Course.objects.filter(seasions__in = seasion_ids).values_list('pk', flat=True).distinct())
+
+
+def courses_of_lessons(lesson_ids):
+    return list(Course.objects.filter(seasions__lessons__in = lesson_ids).values_list('pk', flat=True).distinct())
+
+
+def refresh_course_stats(course_ids):
+    """
+    Recompute the denormalized statistics of the given courses with one grouped
+    query per statistic and write them back without touching updated_at or signals.
+    """
+    from cart.models import Order
+
+    course_ids = set(course_ids)
+    if not course_ids:
+        return
+
+    lesson_count, total_duration = Counter(), Counter()
+    for course_id, time in Lesson.objects.filter(seasion__course__in = course_ids).values_list('seasion__course', 'time'):
+        lesson_count[course_id] += 1
+        if time:
+            total_duration[course_id] += time.hour * 3600 + time.minute * 60 + time.second
+
+    comment_count = dict(
+        Comment.objects.filter(media_type = 'course', media_id__in = course_ids, active = True)
+        .values('media_id').annotate(count = Count('id')).values_list('media_id', 'count'))
+
+    enrollment_count = dict(
+        Order.objects.filter(status = 'paid', cart__items__content_type = 'course', cart__items__media_id__in = course_ids)
+        .values('cart__items__media_id').annotate(count = Count('user', distinct=True))
+        .values_list('cart__items__media_id', 'count'))
+
+    courses = [
+        Course(
+            pk = pk,
+            lesson_count = lesson_count[pk],
+            total_duration = total_duration[pk],
+            comment_count = comment_count.get(pk, 0),
+            enrollment_count = enrollment_count.get(pk, 0),
+        )
+        for pk in Course.objects.filter(pk__in = course_ids).values_list('pk', flat=True)
+    ]
+    Course.objects.bulk_update(courses, STATS_FIELDS)
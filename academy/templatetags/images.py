@@ -0,0 +1,18 @@
+from django import template
+from django.utils.html import format_html_join
+from academy.images import image_attrs as get_image_attrs
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def image_attrs(file, sizes=None, default=''):
+    """
+    src, srcset and sizes attributes of an <img> for an image field:
+    <img alt="" {% image_attrs course.thumbnail '370px' %}>
+    """
+    attrs = get_image_attrs(file) or ({'src': default} if default else {})
+    if sizes and 'srcset' in attrs:
+        attrs['sizes'] = sizes
+    return format_html_join(' ', '{}="{}"', attrs.items())
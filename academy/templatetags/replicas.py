@@ -0,0 +1,25 @@
+from django import template
+from myacademy.replicas import primary_reads as read_primary
+
+
+register = template.Library()
+
+
+class PrimaryReadsNode(template.Node):
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render(self, context):
+        with read_primary():
+            return self.nodelist.render(context)
+
+
+@register.tag
+def primary_reads(parser, token):
+    """
+    Render the block reading from the primary, for the contents of a {% cache %} fragment:
+    {% cache timeout name version %}{% primary_reads %}...{% endprimary_reads %}{% endcache %}
+    """
+    nodelist = parser.parse(('endprimary_reads',))
+    parser.delete_first_token()
+    return PrimaryReadsNode(nodelist)
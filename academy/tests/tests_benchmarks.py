@@ -0,0 +1,30 @@
+from django.core.cache import cache
+from django.test import TestCase
+from academy.benchmarks import ENDPOINTS, SKIPPED, compare, run_benchmarks, seed_dataset, url_names
+
+
+class TestBenchmarks(TestCase):
+    def test_every_url_has_a_case(self):
+        self.assertEqual([name for name in url_names() if name not in ENDPOINTS and name not in SKIPPED], [])
+
+    def test_run(self):
+        cache.clear()
+        data = seed_dataset()
+        results, unmeasured = run_benchmarks(data, repeat = 1, roles = ('anonymous', 'student'), names = ['academy:home', 'academy:courseslist'])
+        self.assertEqual(unmeasured, [])
+        self.assertEqual(
+            set(results),
+            {f'{name}|{role}' for name in ('academy:home', 'academy:courseslist', 'academy:courseslist?name=دوره') for role in ('anonymous', 'student')},
+        )
+        self.assertEqual(results['academy:home|anonymous']['queries'], 0)
+        self.assertEqual(results['academy:courseslist|student']['status'], 200)
+
+    def test_compare(self):
+        baseline = {'a|anonymous': {'status': 200, 'queries': 3, 'sql_ms': 1, 'template_ms': 10, 'wall_ms': 20}}
+        same = {'a|anonymous': {'status': 200, 'queries': 3, 'sql_ms': 2, 'template_ms': 30, 'wall_ms': 40}}
+        self.assertEqual(compare(same, baseline), [])
+        self.assertEqual(len(compare(same, baseline, time_tolerance = 0.5)), 2)
+
+        worse = {'a|anonymous': {'status': 500, 'queries': 5, 'sql_ms': 1, 'template_ms': 10, 'wall_ms': 20}, 'new|anonymous': same['a|anonymous']}
+        self.assertEqual([regression['metric'] for regression in compare(worse, baseline)], ['status', 'queries'])
+        self.assertEqual([regression['metric'] for regression in compare(worse, baseline, query_tolerance = 2)], ['status'])
@@ -0,0 +1,95 @@
+from django.test import TestCase
+from django.urls import reverse
+from academy.comments import build_comment_thread
+from academy.models import Comment, Course
+from user.models import Profile, User
+
+
+class TestCommentThread(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='user1', email='user1@gmail.com', phone_number='09123456789')
+        Profile.objects.create(user = self.user)
+        self.course = Course.objects.create(
+            name = 'test',
+            description = 'test',
+            teacher = self.user,
+            thumbnail = 'courses/images/test.png',
+            time = '01:00:00',
+            is_active = True,
+        )
+
+    def comment(self, parent=None, active=True):
+        return Comment.objects.create(media_id = self.course.pk, message = 'm', user = self.user, parent = parent, active = active)
+
+    def test_single_query(self):
+        for _ in range(3):
+            root = self.comment()
+            reply = self.comment(root)
+            self.comment(reply)
+        with self.assertNumQueries(1):
+            page = build_comment_thread('course', self.course.pk)
+            for root in page:
+                root.user.get_photo()
+                for reply in root.replies:
+                    reply.user.get_photo()
+        self.assertEqual(len(page), 3)
+        self.assertEqual(page[0].replies[0].replies[0].depth, 2)
+
+    def test_inactive_hidden_with_replies(self):
+        root = self.comment()
+        hidden = self.comment(root, active = False)
+        self.comment(hidden)
+        self.comment(active = False)
+        page = build_comment_thread('course', self.course.pk)
+        self.assertEqual(list(page), [root])
+        self.assertEqual(page[0].replies, [])
+
+    def test_deep_replies_flattened(self):
+        root = self.comment()
+        parent = self.comment(root)
+        chain = []
+        for _ in range(4):
+            parent = self.comment(parent)
+            chain.append(parent)
+        page = build_comment_thread('course', self.course.pk, max_depth = 3, replies_per_page = 10)
+        third = page[0].replies[0].replies[0]
+        self.assertEqual(third, chain[0])
+        self.assertEqual(third.replies, chain[1:])
+        self.assertTrue(all(reply.replies == [] and reply.depth == 3 for reply in third.replies))
+
+    def test_replies_truncated_and_expanded(self):
+        root = self.comment()
+        replies = [self.comment(root) for _ in range(7)]
+        page = build_comment_thread('course', self.course.pk, replies_per_page = 5)
+        self.assertEqual(page[0].replies, replies[:5])
+        self.assertEqual(page[0].more_replies, 2)
+
+        page = build_comment_thread('course', self.course.pk, replies_per_page = 5, expand = str(root.pk))
+        self.assertEqual(page[0].replies, replies)
+        self.assertEqual(page[0].more_replies, 0)
+
+    def test_roots_paginated(self):
+        roots = [self.comment() for _ in range(12)]
+        page = build_comment_thread('course', self.course.pk, page = 2, per_page = 10)
+        self.assertEqual(list(page), roots[10:])
+        self.assertFalse(page.has_next())
+
+    def test_course_details_view(self):
+        root = self.comment()
+        self.comment(root)
+        response = self.client.get(reverse('academy:course-details', args=[self.course.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f'id="comment-{root.pk}"')
+
+    def test_links_keep_other_parameters(self):
+        for _ in range(10):
+            self.comment()
+        root = self.comment()
+        for _ in range(6):
+            self.comment(root)
+        url = reverse('academy:course-details', args=[self.course.pk])
+        response = self.client.get(url, {'replies': root.pk})
+        self.assertContains(response, f'href="?replies={root.pk}&amp;comments_page=2"')
+
+        response = self.client.get(url, {'comments_page': 2})
+        self.assertContains(response, f'href="?comments_page=2&amp;replies={root.pk}#comment-{root.pk}"')
@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import time
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from academy.entitlements import attach_lesson_urls, get_entitled_course_ids
+from academy.models import Course, Lesson, Seasion
+from cart.models import Cart, CartItem, Order
+from myacademy.media import sign_media_url
+from user.models import Profile, User
+
+
+class TestEntitlements(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create(username='teacher', email='teacher@gmail.com', phone_number='09123456788', is_active=True)
+        self.user = User.objects.create(username='user1', email='user1@gmail.com', phone_number='09123456789', is_active=True)
+        for user in (self.teacher, self.user):
+            Profile.objects.create(user = user)
+        self.course = Course.objects.create(name = 'c', description = 'd', teacher = self.teacher, thumbnail = 'c.png', time = '01:00:00', is_active = True)
+        seasion = Seasion.objects.create(title = 's')
+        self.course.seasions.add(seasion)
+        self.free = Lesson.objects.create(title = 'free', description = 'd', file = 'courses/lessons/files/free.mp4', teacher = self.teacher, is_free = True)
+        self.paid = Lesson.objects.create(title = 'paid', description = 'd', file = 'courses/lessons/files/paid.mp4', teacher = self.teacher)
+        seasion.lessons.add(self.free, self.paid)
+
+    def buy(self):
+        cart = Cart.objects.create(user = self.user, status = 'paid')
+        CartItem.objects.create(cart = cart, media_id = self.course.pk, price = 0)
+        return Order.objects.create(user = self.user, cart = cart, status = 'paid', total_price = 0)
+
+    def urls(self, user):
+        return {lesson.title: lesson.media_url for lesson in attach_lesson_urls(user, self.course, [self.free, self.paid])}
+
+    def test_index(self):
+        self.assertEqual(get_entitled_course_ids(self.user), frozenset())
+        self.assertEqual(get_entitled_course_ids(self.teacher), {self.course.pk})
+        order = self.buy()
+        self.assertEqual(get_entitled_course_ids(self.user), {self.course.pk})
+        with self.assertNumQueries(0):
+            get_entitled_course_ids(self.user)
+
+        order.status = 'failed'
+        order.save()
+        self.assertEqual(get_entitled_course_ids(self.user), frozenset())
+
+    def test_lesson_urls(self):
+        self.assertEqual(self.urls(self.user)['paid'], None)
+        self.assertTrue(self.urls(self.user)['free'].startswith('/media/courses/lessons/files/free.mp4?expires='))
+        self.buy()
+        self.assertIsNotNone(self.urls(self.user)['paid'])
+
+        res = self.client.get(self.course.get_absolute_url())
+        self.assertNotIn('paid.mp4', res.content.decode())
+        self.client.force_login(self.user)
+        res = self.client.get(self.course.get_absolute_url())
+        self.assertIn('paid.mp4?expires=', res.content.decode())
+
+
+class TestSignedMedia(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT = self.media_root, MEDIA_SERVE_OFFLOAD = None)
+        self.override.enable()
+        os.makedirs(os.path.join(self.media_root, 'courses/lessons/files'))
+        with open(os.path.join(self.media_root, 'courses/lessons/files/lesson.mp4'), 'wb') as file:
+            file.write(b'video')
+        self.path = 'courses/lessons/files/lesson.mp4'
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_signature(self):
+        with self.assertNumQueries(0):
+            res = self.client.get(sign_media_url(self.path))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Cache-Control'], 'private')
+
+        self.assertEqual(self.client.get(f'/media/{self.path}').status_code, 403)
+        self.assertEqual(self.client.get(sign_media_url(self.path, int(time.time()) - 1)).status_code, 403)
+        other = sign_media_url('courses/lessons/files/other.mp4').split('?')[1]
+        self.assertEqual(self.client.get(f'/media/{self.path}?{other}').status_code, 403)
+        self.assertEqual(self.client.get(sign_media_url(self.path).replace('files/', 'x/../files/')).status_code, 200)
@@ -0,0 +1,38 @@
+from io import StringIO
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+from academy.models import Bookmark, Comment, Course, Lesson
+from cart.models import Cart, Order
+from user.models import Profile, User
+
+
+class TestGenerateFakeAcademy(TestCase):
+    def generate(self, **options):
+        call_command('generate_fake_academy', users = 30, teachers = 5, categories = 4, courses = 7, comments = 100,
+                     batch_size = 3, stdout = StringIO(), **options)
+
+    def test_counts(self):
+        self.generate(cart_ratio = 1, order_ratio = 1)
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Profile.objects.count(), 30)
+        self.assertEqual(User.objects.filter(is_mentor = True).count(), 5)
+        self.assertEqual(Course.objects.count(), 7)
+        self.assertEqual(Lesson.objects.count(), 7 * 3 * 5)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertTrue(Comment.objects.filter(parent__isnull = False).exists())
+        self.assertFalse(Comment.objects.exclude(parent = None).exclude(parent__media_id = F('media_id')).exists())
+        self.assertEqual(Bookmark.objects.count(), 25 * 5)
+        self.assertEqual(Cart.objects.filter(status = 'created').count(), 25)
+        self.assertEqual(Order.objects.filter(status = 'paid').count(), 25)
+
+        course = Course.objects.first()
+        self.assertEqual(course.lesson_count, 15)
+        self.assertEqual(course.comment_count, Comment.objects.filter(media_id = course.pk, active = True).count())
+
+    def test_deterministic_and_repeatable(self):
+        self.generate()
+        first = list(Course.objects.order_by('pk').values_list('price', flat=True))
+        self.generate()
+        second = list(Course.objects.order_by('pk').values_list('price', flat=True))[7:]
+        self.assertEqual(first, second)
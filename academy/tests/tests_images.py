@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from PIL import Image
+from academy.models import Course
+from user.models import Profile, User
+
+
+def image_file(name='image.png', size=(1000, 500)):
+    content = BytesIO()
+    Image.new('RGB', size, 'red').save(content, 'PNG')
+    return SimpleUploadedFile(name, content.getvalue(), content_type='image/png')
+
+
+class TestImageVariants(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT = self.media_root, IMAGE_VARIANTS_BACKGROUND = False)
+        self.override.enable()
+        self.user = User.objects.create(username='user1', email='user1@gmail.com', phone_number='09123456789')
+        Profile.objects.create(user = self.user)
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root)
+
+    def create_course(self, thumbnail):
+        with self.captureOnCommitCallbacks(execute = True):
+            return Course.objects.create(name = 'c', description = 'd', teacher = self.user, thumbnail = thumbnail, time = '01:00:00')
+
+    def test_variants_on_upload(self):
+        course = self.create_course(image_file())
+        course.refresh_from_db()
+        data = course.thumbnail_variants
+        self.assertEqual(data['source'], course.thumbnail.name)
+        self.assertEqual((data['width'], data['height']), (1000, 500))
+        self.assertEqual([(variant['width'], variant['height']) for variant in data['variants']], [(100, 50), (370, 185), (770, 385)])
+        for variant in data['variants']:
+            self.assertTrue(variant['name'].endswith('.webp'))
+            with Image.open(os.path.join(self.media_root, variant['name'])) as image:
+                self.assertEqual(image.format, 'WEBP')
+
+        html = Template("{% load images %}<img {% image_attrs course.thumbnail '370px' %}>").render(Context({'course': course}))
+        self.assertIn(f'src="/media/{course.thumbnail.name}"', html)
+        self.assertIn('-370w.webp 370w', html)
+        self.assertIn(f'{course.thumbnail.name} 1000w', html)
+        self.assertIn('sizes="370px"', html)
+
+    def test_new_upload_replaces_variants(self):
+        course = self.create_course(image_file())
+        course.refresh_from_db()
+        old = [variant['name'] for variant in course.thumbnail_variants['variants']]
+
+        course.thumbnail = image_file('other.png', (200, 200))
+        self.assertEqual(Template('{% load images %}{% image_attrs course.thumbnail %}').render(Context({'course': course})), f'src="/media/{course.thumbnail.name}"')
+        with self.captureOnCommitCallbacks(execute = True):
+            course.save()
+        course.refresh_from_db()
+        self.assertEqual([variant['width'] for variant in course.thumbnail_variants['variants']], [100])
+        self.assertFalse(any(os.path.exists(os.path.join(self.media_root, name)) for name in old))
+
+    def test_missing_file(self):
+        with self.assertLogs('academy.images', 'WARNING'):
+            course = self.create_course('courses/images/missing.png')
+        course.refresh_from_db()
+        self.assertEqual(course.thumbnail_variants, {})
+        self.assertEqual(Template("{% load images %}{% image_attrs course.thumbnail '370px' %}").render(Context({'course': course})), 'src="/media/courses/images/missing.png"')
+
+    def test_backfill(self):
+        name = Course.thumbnail.field.storage.save('courses/images/old.png', image_file())
+        Course.objects.bulk_create([Course(name = 'c', description = 'd', teacher = self.user, thumbnail = name, time = '01:00:00')])
+        Profile.objects.filter(user = self.user).update(picture = 'users/profile/missing.png')
+
+        out, err = StringIO(), StringIO()
+        call_command('generate_image_variants', stdout = out, stderr = err)
+        self.assertIn('Rendered variants of 1 images, 1 failed.', out.getvalue())
+        self.assertIn('missing.png', err.getvalue())
+        self.assertEqual(len(Course.objects.get().thumbnail_variants['variants']), 3)
+
+        out = StringIO()
+        call_command('generate_image_variants', stdout = out, stderr = StringIO())
+        self.assertIn('Rendered variants of 0 images', out.getvalue())
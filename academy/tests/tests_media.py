@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+from django.test import SimpleTestCase, override_settings
+
+
+class TestServeMedia(SimpleTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT = self.media_root, MEDIA_SERVE_OFFLOAD = None)
+        self.override.enable()
+        os.makedirs(os.path.join(self.media_root, 'courses/trailer'))
+        self.content = bytes(range(256)) * 40
+        with open(os.path.join(self.media_root, 'courses/trailer/video.mp4'), 'wb') as file:
+            file.write(self.content)
+        self.url = '/media/courses/trailer/video.mp4'
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_full(self):
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], 'video/mp4')
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertEqual(int(res['Content-Length']), len(self.content))
+        self.assertEqual(b''.join(res.streaming_content), self.content)
+
+        res = self.client.head(self.url)
+        self.assertEqual(int(res['Content-Length']), len(self.content))
+        self.assertEqual(res.content, b'')
+
+    def test_ranges(self):
+        res = self.client.get(self.url, HTTP_RANGE = 'bytes=100-199')
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(res['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(b''.join(res.streaming_content), self.content[100:200])
+
+        res = self.client.get(self.url, HTTP_RANGE = 'bytes=10000-')
+        self.assertEqual(b''.join(res.streaming_content), self.content[10000:])
+        res = self.client.get(self.url, HTTP_RANGE = 'bytes=-10')
+        self.assertEqual(b''.join(res.streaming_content), self.content[-10:])
+
+        res = self.client.get(self.url, HTTP_RANGE = 'bytes=20000-')
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], f'bytes */{len(self.content)}')
+
+        # several ranges are answered with the whole file
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE = 'bytes=0-1,5-6').status_code, 200)
+
+    def test_conditional(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH = etag).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE = 'bytes=0-9', HTTP_IF_RANGE = etag).status_code, 206)
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE = 'bytes=0-9', HTTP_IF_RANGE = '"old"').status_code, 200)
+
+    def test_not_found(self):
+        self.assertEqual(self.client.get('/media/courses/trailer/missing.mp4').status_code, 404)
+        self.assertEqual(self.client.get('/media/courses/trailer').status_code, 404)
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+    def test_offload(self):
+        with override_settings(MEDIA_SERVE_OFFLOAD = 'x-accel-redirect'):
+            res = self.client.get(self.url, HTTP_RANGE = 'bytes=0-9')
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res['X-Accel-Redirect'], '/protected-media/courses/trailer/video.mp4')
+            self.assertEqual(res.content, b'')
+        with override_settings(MEDIA_SERVE_OFFLOAD = 'x-sendfile'):
+            res = self.client.get(self.url)
+            self.assertEqual(res['X-Sendfile'], os.path.join(self.media_root, 'courses/trailer/video.mp4'))
@@ -0,0 +1,182 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future
+from datetime import time, timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from academy.entitlements import attach_lesson_urls
+from academy.media_jobs import JobRunner
+from academy.models import Course, Lesson, MediaJob, Seasion
+from academy.tests.tests_views import BaseTestCase
+from academy.video import ProcessingError, StubProcessor
+from myacademy.media import sign_media_url
+
+
+class FailingProcessor(StubProcessor):
+    def probe(self, source):
+        raise ProcessingError('broken file')
+
+
+class PendingExecutor:
+    def submit(self, fn, *args):
+        return Future()
+
+
+class TestMediaJobs(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(
+            MEDIA_ROOT = self.media_root, MEDIA_PROCESSOR = 'academy.video.StubProcessor', MEDIA_JOB_MAX_ATTEMPTS = 2,
+        )
+        self.override.enable()
+        self.lesson = self.create_lesson('courses/lessons/files/video.mp4')
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root)
+
+    def create_lesson(self, name):
+        self.write(name)
+        with self.captureOnCommitCallbacks(execute = True):
+            return Lesson.objects.create(title = 'l', description = 'd', file = name, teacher = self.user)
+
+    def write(self, name):
+        os.makedirs(os.path.dirname(os.path.join(self.media_root, name)), exist_ok=True)
+        with open(os.path.join(self.media_root, name), 'wb') as file:
+            file.write(b'video')
+
+    def test_jobs_queued_on_upload(self):
+        jobs = MediaJob.objects.filter(lesson = self.lesson)
+        self.assertEqual(sorted(jobs.values_list('kind', flat=True)), ['hls', 'probe', 'sprites'])
+        self.assertEqual({job.source for job in jobs}, {self.lesson.file.name})
+
+        with self.captureOnCommitCallbacks(execute = True):
+            self.lesson.title = 'other'
+            self.lesson.save()
+        self.assertEqual(jobs.count(), 3)
+
+    def test_run_jobs(self):
+        stats = JobRunner(workers=0).run(once=True)
+        self.assertEqual((stats['done'], stats['failed']), (3, 0))
+        self.assertFalse(MediaJob.objects.exclude(status = MediaJob.Statuses.done).exists())
+
+        self.lesson.refresh_from_db()
+        info = self.lesson.media_info
+        self.assertEqual(self.lesson.time, time(0, 1, 30))
+        self.assertEqual((info['source'], info['duration']), (self.lesson.file.name, 90.0))
+        # the 1080p rendition is taller than the source
+        self.assertEqual([rendition['height'] for rendition in info['hls']['renditions']], [360, 720])
+        self.assertTrue(os.path.isfile(os.path.join(self.media_root, info['hls']['playlist'])))
+        self.assertEqual(info['sprites']['count'], 9)
+        self.assertEqual(len(info['sprites']['sheets']), 1)
+        self.assertTrue(os.path.isfile(os.path.join(self.media_root, info['sprites']['sheets'][0])))
+
+        with self.captureOnCommitCallbacks(execute = True):
+            self.lesson.save()
+        self.assertEqual(MediaJob.objects.count(), 3)
+
+    def test_retry_then_fail(self):
+        with self.settings(MEDIA_PROCESSOR = 'academy.tests.tests_media_jobs.FailingProcessor'), self.assertLogs('academy.media_jobs', 'WARNING'):
+            stats = JobRunner(workers=0).run(once=True)
+            self.assertEqual(stats['failed'], 3)
+            job = MediaJob.objects.get(lesson = self.lesson, kind = 'probe')
+            self.assertEqual((job.status, job.attempts, job.error), ('queued', 1, 'broken file'))
+            self.assertGreater(job.run_after, timezone.now())
+
+            MediaJob.objects.update(run_after = timezone.now() - timedelta(seconds=1))
+            JobRunner(workers=0).run(once=True)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ('failed', 2))
+            self.assertIsNotNone(job.finished_at)
+
+    def test_stale_job_runs_again(self):
+        MediaJob.objects.update(status = MediaJob.Statuses.running, attempts = 1, started_at = timezone.now() - timedelta(days=1))
+        stats = JobRunner(workers=0).run(once=True)
+        self.assertEqual(stats['done'], 3)
+        self.assertEqual(set(MediaJob.objects.values_list('attempts', flat=True)), {2})
+
+    def test_concurrency(self):
+        self.create_lesson('courses/lessons/files/other.mp4')
+        runner = JobRunner(workers=4, concurrency={'probe': 2, 'hls': 1, 'sprites': 0})
+        runner.fill(PendingExecutor())
+        self.assertEqual(sorted(job.kind for job in runner.running.values()), ['hls', 'probe', 'probe'])
+        self.assertEqual(MediaJob.objects.filter(status = MediaJob.Statuses.running).count(), 3)
+
+    def test_replaced_file(self):
+        JobRunner(workers=0).run(once=True)
+        self.lesson.refresh_from_db()
+        old_playlist = os.path.join(self.media_root, self.lesson.media_info['hls']['playlist'])
+
+        self.write('courses/lessons/files/new.mp4')
+        with self.captureOnCommitCallbacks(execute = True):
+            self.lesson.file = 'courses/lessons/files/new.mp4'
+            self.lesson.save()
+        JobRunner(workers=0).run(once=True)
+        self.lesson.refresh_from_db()
+        self.assertEqual(self.lesson.media_info['source'], 'courses/lessons/files/new.mp4')
+        self.assertTrue(os.path.isfile(os.path.join(self.media_root, self.lesson.media_info['hls']['playlist'])))
+        self.assertFalse(os.path.exists(old_playlist))
+
+    def test_jobs_of_replaced_file_dropped(self):
+        Lesson.objects.filter(pk = self.lesson.pk).update(file = 'courses/lessons/files/new.mp4')
+        stats = JobRunner(workers=0).run(once=True)
+        self.assertEqual(stats['done'], 0)
+        self.assertFalse(MediaJob.objects.exists())
+
+    def test_command_with_process_pool(self):
+        out = StringIO()
+        call_command('process_media_jobs', workers=2, once=True, poll=0.1, stdout=out)
+        self.assertIn('Processed 3 media jobs, 0 failed.', out.getvalue())
+        self.lesson.refresh_from_db()
+        self.assertEqual(self.lesson.time, time(0, 1, 30))
+
+    def test_signed_playlist(self):
+        JobRunner(workers=0).run(once=True)
+        self.lesson.refresh_from_db()
+        res = self.client.get(sign_media_url(self.lesson.media_info['hls']['playlist']))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], 'application/vnd.apple.mpegurl')
+        variants = [line for line in res.content.decode().splitlines() if line and not line.startswith('#')]
+        self.assertEqual(len(variants), 2)
+        self.assertIn('/hls/360p/index.m3u8?expires=', variants[0])
+
+        res = self.client.get(variants[0])
+        segments = [line for line in res.content.decode().splitlines() if line and not line.startswith('#')]
+        self.assertIn('/hls/360p/segment-00000.ts?expires=', segments[0])
+        self.assertEqual(self.client.get(segments[0]).status_code, 200)
+        self.assertEqual(self.client.get(segments[0].split('?')[0]).status_code, 403)
+
+    def test_signed_thumbnails(self):
+        JobRunner(workers=0).run(once=True)
+        self.lesson.refresh_from_db()
+        course = Course.objects.create(name = 'c', description = 'd', teacher = self.user, thumbnail = 'c.png', time = '01:00:00')
+        lesson, = attach_lesson_urls(self.user, course, [self.lesson])
+        self.assertIsNotNone(lesson.stream_url)
+        res = self.client.get(lesson.thumbnails_url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], 'text/vtt; charset=utf-8')
+        lines = res.content.decode().splitlines()
+        self.assertEqual(lines[0], 'WEBVTT')
+        self.assertEqual([line for line in lines if '-->' in line][1], '00:00:10.000 --> 00:00:20.000')
+        tiles = [line for line in lines if '#xywh=' in line]
+        self.assertEqual(len(tiles), 9)
+        self.assertIn('/sprites/sprite-001.jpg?expires=', tiles[1])
+        self.assertTrue(tiles[1].endswith('#xywh=160,0,160,90'))
+        self.assertEqual(self.client.get(tiles[1].split('#')[0]).status_code, 200)
+
+    def test_dashboard_states(self):
+        course = Course.objects.create(name = 'c', description = 'd', teacher = self.user, thumbnail = 'c.png', time = '01:00:00')
+        seasion = Seasion.objects.create(title = 's')
+        seasion.lessons.add(self.lesson)
+        course.seasions.add(seasion)
+        with self.settings(MEDIA_PROCESSOR = 'academy.tests.tests_media_jobs.FailingProcessor'), self.assertLogs('academy.media_jobs', 'WARNING'):
+            JobRunner(workers=0).run(once=True)
+        self.login()
+        res = self.client.get(reverse('dashboard:course-update', args=[course.pk]))
+        self.assertEqual([job.status for job in res.context['lessons'][0].current_jobs], ['queued'] * 3)
+        self.assertContains(res, 'title="broken file"')
@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+import threading
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from academy.models import Course
+from myacademy.metrics import CACHE_REQUESTS, CART_ITEMS_ADDED, REGISTRY, Counter, Histogram, Registry
+from user.models import Profile, User
+
+
+def value(metric, **labels):
+    return REGISTRY.collect().get(metric.key(labels), 0)
+
+
+class TestRegistry(TestCase):
+    def setUp(self):
+        self.registry = Registry()
+        self.counter = Counter('test_total', 'Test counter.', ['kind'], registry = self.registry)
+        self.histogram = Histogram('test_seconds', 'Test histogram.', buckets = (0.1, 1), registry = self.registry)
+
+    def test_expose(self):
+        self.counter.inc(kind = 'a"b')
+        self.counter.inc(2, kind = 'a"b')
+        for seconds in (0.05, 0.1, 0.5, 3):
+            self.histogram.observe(seconds)
+        lines = self.registry.expose().splitlines()
+        self.assertIn('# TYPE test_total counter', lines)
+        self.assertIn('test_total{kind="a\\"b"} 3', lines)
+        self.assertEqual(
+            [line for line in lines if line.startswith('test_seconds_')],
+            ['test_seconds_bucket{le="0.1"} 2', 'test_seconds_bucket{le="1"} 3', 'test_seconds_bucket{le="+Inf"} 4', 'test_seconds_sum 3.65', 'test_seconds_count 4'],
+        )
+        with self.assertRaises(ValueError):
+            self.counter.inc(other = 'a')
+
+    def test_threads(self):
+        def work():
+            for _ in range(1000):
+                self.counter.inc(kind = 'a')
+                self.histogram.observe(0.5)
+        threads = [threading.Thread(target = work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.counter.inc(kind = 'a')
+
+        values = self.registry.collect()
+        self.assertEqual(values[('test_total', ('a',))], 4001)
+        self.assertEqual(values[('test_seconds', ())][:3], [0, 4000, 0])
+        # finished threads are folded into one dict
+        self.assertEqual(len(self.registry._shards), 1)
+
+    def test_multiprocess(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_MULTIPROCESS_DIR = directory):
+            with open(os.path.join(directory, 'metrics-1.json'), 'w') as file:
+                json.dump([['test_total', ['a'], 5], ['test_seconds', [], [1, 0, 0, 0.05]]], file)
+            self.counter.inc(kind = 'a')
+            self.histogram.observe(2)
+            self.registry.flush()
+            self.assertTrue(os.path.exists(self.registry.path()))
+
+            values = self.registry.collect()
+            self.assertEqual(values[('test_total', ('a',))], 6)
+            self.assertEqual(values[('test_seconds', ())], [1, 0, 1, 2.05])
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='user1', email='user1@gmail.com', phone_number='09123456789', is_active=True)
+        Profile.objects.create(user = self.user)
+        self.url = reverse('metrics')
+
+    def test_staff_only(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get(reverse('academy:home'))
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('myacademy_http_requests_total{view="academy:home",method="GET",status="200"}', res.content.decode())
+
+    @override_settings(METRICS_TOKEN = 'secret')
+    def test_token(self):
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION = 'Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION = 'Bearer secret').status_code, 200)
+
+    def test_cache_and_cart(self):
+        hits, misses = value(CACHE_REQUESTS, namespace = 'home', result = 'hit'), value(CACHE_REQUESTS, namespace = 'home', result = 'miss')
+        self.client.get(reverse('academy:home'))
+        self.client.get(reverse('academy:home'))
+        self.assertEqual(value(CACHE_REQUESTS, namespace = 'home', result = 'miss'), misses + 1)
+        self.assertEqual(value(CACHE_REQUESTS, namespace = 'home', result = 'hit'), hits + 1)
+
+        added = value(CART_ITEMS_ADDED, content_type = 'course')
+        course = Course.objects.create(name = 'c', description = 'd', teacher = self.user, thumbnail = 'c.png', time = '01:00:00', is_active = True)
+        self.client.post(reverse('cart:cart-add', args = ['course', course.pk]))
+        self.assertEqual(value(CART_ITEMS_ADDED, content_type = 'course'), added + 1)
@@ -0,0 +1,57 @@
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from academy.models import Course
+from academy.pagination import CursorPaginator
+from user.models import User
+
+
+class TestCursorPaginator(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        teacher = User.objects.create(username='teacher', email='teacher@gmail.com', phone_number='09123456780')
+        for i in range(23):
+            Course.objects.create(name = f'course {i}', description = 'd', teacher = teacher, thumbnail = 'c.png', time = '01:00:00')
+        self.ordered = list(Course.objects.order_by('updated_at', 'id'))
+
+    def get_page(self, url='?', per_page=10):
+        request = self.factory.get('/courses' + url)
+        return CursorPaginator(Course.objects.all(), per_page, with_total=True).page(request)
+
+    def test_walk_forward_and_backward(self):
+        first = self.get_page()
+        self.assertEqual(list(first), self.ordered[:10])
+        self.assertFalse(first.has_previous())
+
+        second = self.get_page(first.next_url())
+        third = self.get_page(second.next_url())
+        self.assertEqual(list(second), self.ordered[10:20])
+        self.assertEqual(list(third), self.ordered[20:])
+        self.assertFalse(third.has_next())
+        self.assertIsNone(third.next_url())
+
+        back = self.get_page(third.previous_url())
+        self.assertEqual(list(back), self.ordered[10:20])
+        self.assertEqual(list(self.get_page(back.previous_url())), self.ordered[:10])
+
+    def test_update_does_not_shift_next_page(self):
+        first = self.get_page()
+        self.ordered[0].save()
+        self.assertEqual(list(self.get_page(first.next_url())), self.ordered[10:20])
+
+    def test_tampered_cursor_returns_first_page(self):
+        first = self.get_page()
+        self.assertEqual(list(self.get_page(first.next_url() + 'x')), self.ordered[:10])
+
+    def test_keeps_other_query_parameters(self):
+        page = self.get_page('?name=test&page=3')
+        self.assertIn('name=test', page.next_url())
+        self.assertNotIn('page=', page.next_url())
+
+    def test_cached_total(self):
+        page = self.get_page()
+        self.assertEqual(page.paginator.count, 23)
+        self.assertEqual(page.paginator.num_pages, 3)
+        page = self.get_page()
+        with self.assertNumQueries(0):
+            self.assertEqual(page.paginator.count, 23)
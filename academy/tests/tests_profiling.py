@@ -0,0 +1,63 @@
+import json
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from academy.models import Course
+from myacademy.profiling import fingerprint, profile_block
+from user.models import Profile, User
+
+
+class TestServerTiming(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='user1', email='user1@gmail.com', phone_number='09123456789')
+        Profile.objects.create(user = self.user)
+        self.url = reverse('academy:courseslist')
+
+    @override_settings(SERVER_TIMING = True, PROFILING_SAMPLE_RATE = 0)
+    def test_headers(self):
+        res = self.client.get(self.url)
+        metrics = {metric.split(';')[0] for metric in res['Server-Timing'].split(', ')}
+        self.assertEqual(metrics, {'sql', 'dup', 'tpl', 'total'})
+
+    @override_settings(SERVER_TIMING = False, PROFILING_SAMPLE_RATE = 0)
+    def test_disabled(self):
+        res = self.client.get(self.url)
+        self.assertFalse(res.has_header('Server-Timing'))
+
+    @override_settings(SERVER_TIMING = False, PROFILING_SAMPLE_RATE = 1)
+    def test_sampled_log(self):
+        with self.assertLogs('myacademy.profiling', 'INFO') as logs:
+            res = self.client.get(self.url)
+        self.assertFalse(res.has_header('Server-Timing'))
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['path'], self.url)
+        self.assertEqual(line['status'], 200)
+        self.assertGreater(line['template_ms'], 0)
+
+    def test_duplicates(self):
+        courses = [
+            Course.objects.create(name = f'c{i}', description = 'd', teacher = self.user, thumbnail = 'c.png', time = '01:00:00')
+            for i in range(3)
+        ]
+        with profile_block() as profile:
+            for course in Course.objects.filter(pk__in = [course.pk for course in courses]):
+                course.teacher.username
+            list(User.objects.filter(pk__in = [1, 2, 3]))
+            list(User.objects.filter(pk__in = [4]))
+        self.assertEqual(profile.query_count, 6)
+        self.assertEqual(profile.duplicate_count, 3)
+
+    @override_settings(SERVER_TIMING = True, PROFILING_SAMPLE_RATE = 0)
+    def test_nested_blocks(self):
+        with profile_block() as outer:
+            self.client.get(self.url)
+            with profile_block() as inner:
+                list(User.objects.all())
+        # the request profiled by the middleware counts in the outer block, every query once
+        self.assertGreater(outer.template_time, 0)
+        self.assertEqual(inner.query_count, 1)
+        with profile_block() as alone:
+            self.client.get(self.url)
+        self.assertEqual(outer.query_count, alone.query_count + 1)
+
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint('SELECT 1 WHERE id IN (%s, %s,%s)'), fingerprint('SELECT 1 WHERE id IN (%s)'))
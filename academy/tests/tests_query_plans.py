@@ -0,0 +1,16 @@
+from django.test import TestCase
+from academy.models import Course
+from academy.query_plans import HOT_QUERIES, HotQuery, plan_problems
+
+
+class TestQueryPlans(TestCase):
+    def test_hot_queries_use_indexes(self):
+        for query in HOT_QUERIES:
+            with self.subTest(query.name):
+                self.assertEqual(plan_problems(query), [])
+
+    def test_regression_detected(self):
+        problems = plan_problems(HotQuery('by-name', lambda: Course.objects.filter(name = 'c').order_by('created_at'), 'course_active_updated'))
+        self.assertEqual(problems, [
+            'full scan: SCAN academy_course', 'sort: USE TEMP B-TREE FOR ORDER BY', 'course_active_updated is not used',
+        ])
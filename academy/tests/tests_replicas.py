@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.urls import reverse
+from academy.entitlements import get_entitled_course_ids
+from academy.models import Comment, Course, MainPageCourseAdd
+from myacademy.replicas import read_replica, replica_reads
+from myacademy.sqlite import database_settings
+from user.models import User
+
+
+class ReplicaTestCase(TransactionTestCase):
+    """
+    Adds a `replica` database in a temporary SQLite file. It holds nothing until
+    sync_replicas() copies the primary into it, so tests see which database a read used.
+    The alias exists while the tests of the class run only, the runner does not know it.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        replica = database_settings(os.path.join(cls.directory, 'replica.sqlite3'))
+        # configure_settings() fills in the defaults, and requires a default alias
+        connections.settings['replica'] = connections.configure_settings({'default': {}, 'replica': replica})['replica']
+        cls.databases = {'default', 'replica'}
+        cls.replicas = override_settings(REPLICA_DATABASES = ['replica'])
+        cls.replicas.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.replicas.disable()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        shutil.rmtree(cls.directory)
+
+    def sync(self):
+        call_command('sync_replicas', stdout=StringIO())
+
+
+class TestReplicas(ReplicaTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser(username = 'admin', email = 'admin@example.com', phone_number = '09123456789', password = 'password')
+        self.create_course('synced')
+        self.sync()
+        self.create_course('not synced')
+
+    def create_course(self, name):
+        return Course.objects.create(name = name, description = 'd', teacher = self.user, thumbnail = 'c.png', time = '01:00:00', is_active = True)
+
+    def course_names(self, res):
+        return [course.name for course in res.context['courses']]
+
+    def test_read_only_view_reads_replica(self):
+        res = self.client.get(reverse('academy:courseslist'))
+        self.assertEqual(self.course_names(res), ['synced'])
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, res.cookies)
+
+    def test_course_details_reads_replica(self):
+        synced, not_synced = Course.objects.get(name = 'synced'), Course.objects.get(name = 'not synced')
+        Comment.objects.create(user = self.user, media_id = synced.pk, message = 'not synced', active = True)
+        with CaptureQueriesContext(connections['default']) as primary, CaptureQueriesContext(connections['replica']) as replica:
+            res = self.client.get(reverse('academy:course-details', args=[synced.pk]))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(list(res.context['comments']), [])
+        self.assertEqual(len(primary), 0)
+        self.assertGreater(len(replica), 0)
+        self.assertEqual(self.client.get(reverse('academy:course-details', args=[not_synced.pk])).status_code, 404)
+
+    def test_home_cache_filled_from_primary(self):
+        self.client.get(reverse('academy:home'))
+        # saving the tab bumps the home version
+        tab = MainPageCourseAdd.objects.create(title = 'new tab')
+        tab.courses.add(Course.objects.get(name = 'not synced'))
+        res = self.client.get(reverse('academy:home'))
+        self.assertEqual([tab.title for tab in res.context['mainpage_tabs_courses']], ['new tab'])
+        self.sync()
+        res = self.client.get(reverse('academy:home'))
+        self.assertEqual([course.name for course in res.context['mainpage_tabs_courses'][0].courses.all()], ['not synced'])
+
+    def test_entitlements_cached_from_primary(self):
+        course = Course.objects.get(name = 'not synced')
+        with replica_reads():
+            self.assertIn(course.pk, get_entitled_course_ids(self.user))
+        self.sync()
+        with replica_reads():
+            self.assertIn(course.pk, get_entitled_course_ids(self.user))
+
+    def test_write_pins_to_primary(self):
+        self.client.force_login(self.user)
+        course = Course.objects.get(name = 'synced')
+        res = self.client.post(reverse('academy:course-details', args=[course.pk]), {'message': 'hi'})
+        self.assertEqual(res.context['msg'], 'success')
+        self.assertIn(settings.REPLICA_PIN_COOKIE, res.cookies)
+        self.assertEqual(res.cookies[settings.REPLICA_PIN_COOKIE]['max-age'], settings.REPLICA_PIN_SECONDS)
+
+        res = self.client.get(reverse('academy:courseslist'))
+        self.assertEqual(sorted(self.course_names(res)), ['not synced', 'synced'])
+
+    def test_read_after_write(self):
+        with replica_reads():
+            self.assertEqual(Course.objects.all().db, 'replica')
+            self.create_course('new')
+            self.assertEqual(Course.objects.all().db, 'default')
+        self.assertEqual(Course.objects.all().db, 'default')
+
+    def test_unsafe_methods_use_primary(self):
+        @read_replica
+        def view(request):
+            return Course.objects.all().db
+
+        factory = RequestFactory()
+        self.assertEqual(view(factory.get('/')), 'replica')
+        self.assertEqual(view(factory.post('/')), 'default')
+
+    def test_replica_objects_saved_to_primary(self):
+        with replica_reads():
+            course = Course.objects.get(name = 'synced')
+        self.assertEqual(course._state.db, 'replica')
+        course.name = 'renamed'
+        course.save()
+        self.assertTrue(Course.objects.using('default').filter(name = 'renamed').exists())
+        self.assertFalse(Course.objects.using('replica').filter(name = 'renamed').exists())
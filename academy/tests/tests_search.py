@@ -0,0 +1,74 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from academy.models import Category, Course
+from academy.search import normalize, search_courses
+from user.models import User
+
+
+class TestNormalize(TestCase):
+    def test_arabic_letters_and_digits(self):
+        self.assertEqual(normalize('كتاب علي ۱۲۳ ٤٥'), 'کتاب علی 123 45')
+
+    def test_zwnj_and_diacritics(self):
+        self.assertEqual(normalize('برنامه‌نویسی  مُحَمَّد'), 'برنامه نویسی محمد')
+
+
+class TestCourseSearch(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create(username='teacher', email='teacher@gmail.com', phone_number='09123456780', first_name='رضا')
+        self.python = self.create_course('آموزش پایتون', 'برنامه نویسی مقدماتی')
+        self.django = self.create_course('آموزش جنگو', 'ساخت وب سایت با پایتون')
+
+    def create_course(self, name, description):
+        return Course.objects.create(
+            name = name,
+            description = description,
+            teacher = self.teacher,
+            thumbnail = 'courses/images/test.png',
+            time = '01:00:00',
+            is_active = True,
+        )
+
+    def search(self, query):
+        return list(search_courses(Course.objects.all(), query))
+
+    def test_name_ranked_before_description(self):
+        self.assertEqual(self.search('پایتون'), [self.python, self.django])
+
+    def test_prefix_and_arabic_letters(self):
+        self.assertEqual(self.search('پايت'), [self.python, self.django])
+
+    def test_description_search(self):
+        self.assertEqual(self.search('سایت'), [self.django])
+
+    def test_index_updated_on_save(self):
+        self.python.name = 'آموزش گو'
+        self.python.description = 'زبان گو'
+        self.python.save()
+        self.assertEqual(self.search('پایتون'), [self.django])
+
+    def test_category_and_teacher_search(self):
+        category = Category.objects.create(title = 'هوش مصنوعی', slug = 'ai')
+        self.django.category.add(category)
+        self.assertEqual(self.search('مصنوعی'), [self.django])
+        self.assertEqual(self.search('رضا'), [self.python, self.django])
+
+        category.title = 'داده کاوی'
+        category.save()
+        self.assertEqual(self.search('مصنوعی'), [])
+
+    def test_deleted_course_removed(self):
+        self.django.delete()
+        self.assertEqual(self.search('پایتون'), [self.python])
+
+    @override_settings(SEARCH_MAX_RESULTS = 1)
+    def test_cap_after_filters(self):
+        # ranked below the cap among all courses, first among the inactive ones
+        self.django.is_active = False
+        self.django.save()
+        self.assertEqual(list(search_courses(Course.objects.filter(is_active = False), 'پایتون')), [self.django])
+        self.assertEqual(self.search('پایتون'), [self.python])
+
+    def test_listing_view_search(self):
+        res = self.client.get(reverse('academy:courseslist'), {'name': 'جنگو'})
+        self.assertEqual(list(res.context['courses']), [self.django])
@@ -0,0 +1,41 @@
+import os
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase
+from myacademy.sqlite import database_settings
+
+
+class TestSQLiteProfiles(SimpleTestCase):
+    # a connection of its own to a file, not the test database
+    databases = {'default'}
+
+    def test_development(self):
+        config = database_settings('db.sqlite3')
+        self.assertEqual((config['CONN_MAX_AGE'], config['CONN_HEALTH_CHECKS']), (0, False))
+        self.assertEqual(config['OPTIONS'], {'timeout': 5})
+
+    def test_production(self):
+        config = database_settings('db.sqlite3', 'production', conn_max_age=60)
+        self.assertEqual((config['CONN_MAX_AGE'], config['CONN_HEALTH_CHECKS']), (60, True))
+        self.assertEqual(config['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertIn('PRAGMA journal_mode = WAL', config['OPTIONS']['init_command'])
+        with self.assertRaises(ValueError):
+            database_settings('db.sqlite3', 'staging')
+
+    def test_pragmas_applied(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config = database_settings(os.path.join(directory, 'test.sqlite3'), 'production')
+            connection = DatabaseWrapper({**config, 'TIME_ZONE': None, 'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False})
+            try:
+                with connection.cursor() as cursor:
+                    pragmas = {name: cursor.execute(f'PRAGMA {name}').fetchone()[0] for name in ('journal_mode', 'synchronous', 'busy_timeout')}
+            finally:
+                connection.close()
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 20000})
+
+    def test_benchmark(self):
+        out = StringIO()
+        call_command('bench_sqlite', writers=1, readers=1, seconds=0.2, profile=['production'], stdout=out)
+        self.assertIn('production', out.getvalue())
@@ -0,0 +1,78 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from academy.models import Comment, Course, Lesson, Seasion
+from cart.models import Cart, CartItem, Order
+from user.models import User
+
+
+class TestCourseStats(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='teacher', email='teacher@gmail.com', phone_number='09123456780')
+        self.course = Course.objects.create(
+            name = 'test',
+            description = 'test',
+            teacher = self.user,
+            thumbnail = 'courses/images/test.png',
+            time = '01:00:00',
+        )
+        self.seasion = Seasion.objects.create(title = 'seasion')
+        self.course.seasions.add(self.seasion)
+        self.lessons = [
+            Lesson.objects.create(title = f'lesson {i}', description = 'd', file = 'f.mp4', teacher = self.user, time = '00:10:30')
+            for i in range(3)
+        ]
+
+    def assertStats(self, **expected):
+        course = Course.objects.get(pk = self.course.pk)
+        for field, value in expected.items():
+            self.assertEqual(getattr(course, field), value, field)
+
+    def test_lessons_added_and_removed(self):
+        self.seasion.lessons.add(*self.lessons)
+        self.assertStats(lesson_count = 3, total_duration = 3 * 630)
+        self.assertEqual(Course.objects.get(pk = self.course.pk).lessons_count(), 3)
+
+        self.seasion.lessons.remove(self.lessons[0])
+        self.assertStats(lesson_count = 2, total_duration = 2 * 630)
+
+        self.lessons[1].delete()
+        self.assertStats(lesson_count = 1)
+
+        self.seasion.lessons.clear()
+        self.assertStats(lesson_count = 0, total_duration = 0)
+
+    def test_lesson_time_changed(self):
+        self.seasion.lessons.add(self.lessons[0])
+        self.lessons[0].time = '01:00:00'
+        self.lessons[0].save()
+        self.assertStats(total_duration = 3600)
+
+    def test_seasion_removed_from_course(self):
+        self.seasion.lessons.add(*self.lessons)
+        self.course.seasions.remove(self.seasion)
+        self.assertStats(lesson_count = 0)
+
+    def test_only_active_comments_counted(self):
+        comment = Comment.objects.create(media_id = self.course.pk, message = 'm', user = self.user)
+        self.assertStats(comment_count = 0)
+        comment.active = True
+        comment.save()
+        self.assertStats(comment_count = 1)
+        comment.delete()
+        self.assertStats(comment_count = 0)
+
+    def test_paid_order_counts_enrollment(self):
+        cart = Cart.objects.create(user = self.user)
+        CartItem.objects.create(cart = cart, media_id = self.course.pk, price = 0)
+        order = Order.objects.create(user = self.user, cart = cart, total_price = 0)
+        self.assertStats(enrollment_count = 0)
+        order.status = 'paid'
+        order.save()
+        self.assertStats(enrollment_count = 1)
+
+    def test_rebuild_command(self):
+        self.seasion.lessons.add(*self.lessons)
+        Course.objects.update(lesson_count = 0, total_duration = 0)
+        call_command('rebuild_course_stats', stdout=StringIO())
+        self.assertStats(lesson_count = 3, total_duration = 3 * 630)
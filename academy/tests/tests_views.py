@@ -2,8 +2,9 @@ import glob
 import os
 from unittest.mock import patch
 from django_recaptcha.client import RecaptchaResponse
+from django.core.cache import cache
 from django.test import TestCase
-from academy.models import Category, Course
+from academy.models import Category, Course, MainPageCategoryAdd, MainPageCourseAdd, Team
 from user.models import Profile, User
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -12,6 +13,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 class BaseTestCase(TestCase):
 
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create(username='user1', email='user1@gmail.com', phone_number='09123456789')
         self.user.set_password('password')
         self.user.is_active = True
@@ -91,4 +93,33 @@ class TestCourseCategoryView(BaseTestCase):
             try:
                 os.remove(file)
             except:
-                pass
\ No newline at end of file
+                pass
+
+class TestHomeView(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.url = reverse('academy:home')
+        course = Course.objects.create(name = 'test', teacher = self.user, thumbnail = 'courses/images/test.png', time = '01:00:00', is_active = True)
+        category = Category.objects.create(title = 'test1', slug = 'title')
+        MainPageCategoryAdd.objects.create(title = 'promoted category', image = 'categorys/images/test.png', category = category)
+        MainPageCourseAdd.objects.create(title = 'promoted tab').courses.add(course)
+        self.member = Team.objects.create(user = self.user, position = 'first position')
+
+    def test_url(self):
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, 'promoted category')
+        self.assertContains(res, 'promoted tab')
+
+    def test_warm_cache_without_queries(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            res = self.client.get(self.url)
+        self.assertContains(res, 'first position')
+
+    def test_invalidated_on_change(self):
+        self.client.get(self.url)
+        self.member.position = 'second position'
+        self.member.save()
+        self.assertContains(self.client.get(self.url), 'second position')
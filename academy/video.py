@@ -0,0 +1,199 @@
+"""
+Video processors, run by academy.media_jobs in worker processes.
+
+This module does not import Django so it loads in a fresh worker process as well. Every
+option comes in the `options` dict; processors write into `output`, a local directory,
+and return names relative to it.
+"""
+import math
+import os
+import shutil
+import subprocess
+from PIL import Image
+
+
+class ProcessingError(Exception):
+    pass
+
+
+def vtt_time(seconds):
+    minutes, seconds = divmod(seconds, 60)
+    return f'{int(minutes // 60):02d}:{int(minutes % 60):02d}:{seconds:06.3f}'
+
+
+class Processor:
+    def __init__(self, options):
+        self.options = options
+
+    def probe(self, source):
+        """{'duration': seconds, 'width': pixels, 'height': pixels} of a video."""
+        raise NotImplementedError
+
+    def hls(self, source, output, info):
+        """Write the HLS ladder of `source` and return {'playlist', 'renditions'}."""
+        raise NotImplementedError
+
+    def sprites(self, source, output, info):
+        """Write the seek preview sprite sheets of `source` and their thumbnails track, return their metadata."""
+        raise NotImplementedError
+
+    def renditions(self, info):
+        """The renditions of the ladder no taller than the source, at least the smallest one."""
+        ladder = sorted(self.options['renditions'])
+        renditions = [(height, bitrate) for height, bitrate in ladder if height <= info['height']]
+        return renditions or ladder[:1]
+
+    def sprite_layout(self, info):
+        interval, width = self.options['sprite_interval'], self.options['sprite_width']
+        # even sizes, as encoders require
+        height = max(round(info['height'] * width / info['width'] / 2) * 2, 2) if info['width'] else width
+        count = max(math.ceil(info['duration'] / interval), 1)
+        return {
+            'interval': interval, 'width': width, 'height': height, 'count': count,
+            'columns': self.options['sprite_columns'], 'rows': self.options['sprite_rows'],
+        }
+
+    def thumbnails_track(self, output, layout, sheets):
+        """
+        Write the WebVTT thumbnails track of the sprite sheets, a cue per frame pointing
+        at its tile with a media fragment, and return its name.
+        """
+        per_sheet = layout['columns'] * layout['rows']
+        lines = ['WEBVTT', '']
+        for index in range(min(layout['count'], len(sheets) * per_sheet)):
+            tile = index % per_sheet
+            x, y = tile % layout['columns'] * layout['width'], tile // layout['columns'] * layout['height']
+            lines += [
+                f'{vtt_time(index * layout["interval"])} --> {vtt_time((index + 1) * layout["interval"])}',
+                f'{sheets[index // per_sheet]}#xywh={x},{y},{layout["width"]},{layout["height"]}',
+                '',
+            ]
+        with open(os.path.join(output, 'thumbnails.vtt'), 'w') as file:
+            file.write('\n'.join(lines))
+        return 'thumbnails.vtt'
+
+    def master_playlist(self, output, renditions):
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+        for rendition in renditions:
+            lines.append(
+                f'#EXT-X-STREAM-INF:BANDWIDTH={rendition["bandwidth"]},RESOLUTION={rendition["width"]}x{rendition["height"]}'
+            )
+            lines.append(rendition['playlist'])
+        with open(os.path.join(output, 'master.m3u8'), 'w') as file:
+            file.write('\n'.join(lines) + '\n')
+        return 'master.m3u8'
+
+
+class FFmpegProcessor(Processor):
+    """Probes with ffprobe and encodes with ffmpeg, both looked up on PATH."""
+    def binary(self, name):
+        path = shutil.which(self.options.get(name) or name)
+        if path is None:
+            raise ProcessingError(f'{name} is not installed.')
+        return path
+
+    def run(self, *args):
+        try:
+            return subprocess.run(args, capture_output=True, check=True, text=True, timeout=self.options['timeout']).stdout
+        except subprocess.CalledProcessError as ex:
+            raise ProcessingError(f'{os.path.basename(args[0])} exited with {ex.returncode}: {ex.stderr[-500:]}')
+        except subprocess.TimeoutExpired:
+            raise ProcessingError(f'{os.path.basename(args[0])} timed out.')
+
+    def probe(self, source):
+        output = self.run(
+            self.binary('ffprobe'), '-v', 'error', '-select_streams', 'v:0',
+            '-show_entries', 'stream=width,height:format=duration', '-of', 'default=noprint_wrappers=1', source,
+        )
+        values = dict(line.split('=', 1) for line in output.splitlines() if '=' in line)
+        try:
+            return {'duration': float(values['duration']), 'width': int(values['width']), 'height': int(values['height'])}
+        except (KeyError, ValueError):
+            raise ProcessingError('No video stream found.')
+
+    def hls(self, source, output, info):
+        ffmpeg, segment = self.binary('ffmpeg'), str(self.options['segment_seconds'])
+        renditions = []
+        for height, bitrate in self.renditions(info):
+            directory = f'{height}p'
+            os.makedirs(os.path.join(output, directory), exist_ok=True)
+            self.run(
+                ffmpeg, '-nostdin', '-y', '-i', source, '-map', '0:v:0', '-map', '0:a:0?',
+                '-vf', f'scale=-2:{height}', '-c:v', 'libx264', '-preset', 'veryfast', '-profile:v', 'main',
+                '-b:v', f'{bitrate}k', '-maxrate', f'{bitrate * 107 // 100}k', '-bufsize', f'{bitrate * 3 // 2}k',
+                # keyframes on segment boundaries, so every rendition switches at the same points
+                '-force_key_frames', f'expr:gte(t,n_forced*{segment})', '-sc_threshold', '0',
+                '-c:a', 'aac', '-b:a', '128k', '-ac', '2',
+                '-f', 'hls', '-hls_time', segment, '-hls_playlist_type', 'vod',
+                '-hls_segment_filename', os.path.join(output, directory, 'segment-%05d.ts'),
+                os.path.join(output, directory, 'index.m3u8'),
+            )
+            width = round(info['width'] * height / info['height'] / 2) * 2 if info['height'] else height
+            renditions.append({
+                'height': height, 'width': width, 'bandwidth': (bitrate + 128) * 1000, 'playlist': f'{directory}/index.m3u8',
+            })
+        return {'playlist': self.master_playlist(output, renditions), 'renditions': renditions}
+
+    def sprites(self, source, output, info):
+        layout = self.sprite_layout(info)
+        self.run(
+            self.binary('ffmpeg'), '-nostdin', '-y', '-i', source, '-an',
+            '-vf', f'fps=1/{layout["interval"]},scale={layout["width"]}:{layout["height"]},tile={layout["columns"]}x{layout["rows"]}',
+            '-q:v', '5', os.path.join(output, 'sprite-%03d.jpg'),
+        )
+        sheets = sorted(name for name in os.listdir(output) if name.startswith('sprite-'))
+        return {**layout, 'sheets': sheets, 'track': self.thumbnails_track(output, layout, sheets)}
+
+
+class StubProcessor(Processor):
+    """
+    Writes outputs of the right shape without decoding anything, for tests and
+    machines without ffmpeg. Every video is `duration` seconds of 1280x720.
+    """
+    duration = 90.0
+    width = 1280
+    height = 720
+
+    def probe(self, source):
+        if not os.path.isfile(source):
+            raise ProcessingError(f'{source} does not exist.')
+        return {'duration': self.duration, 'width': self.width, 'height': self.height}
+
+    def hls(self, source, output, info):
+        segment = self.options['segment_seconds']
+        count = max(math.ceil(info['duration'] / segment), 1)
+        renditions = []
+        for height, bitrate in self.renditions(info):
+            directory = f'{height}p'
+            os.makedirs(os.path.join(output, directory), exist_ok=True)
+            lines = ['#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{segment}', '#EXT-X-PLAYLIST-TYPE:VOD']
+            for index in range(count):
+                open(os.path.join(output, directory, f'segment-{index:05d}.ts'), 'wb').close()
+                lines += [f'#EXTINF:{min(segment, info["duration"] - index * segment):.3f},', f'segment-{index:05d}.ts']
+            with open(os.path.join(output, directory, 'index.m3u8'), 'w') as file:
+                file.write('\n'.join(lines + ['#EXT-X-ENDLIST']) + '\n')
+            renditions.append({
+                'height': height, 'width': round(info['width'] * height / info['height'] / 2) * 2,
+                'bandwidth': (bitrate + 128) * 1000, 'playlist': f'{directory}/index.m3u8',
+            })
+        return {'playlist': self.master_playlist(output, renditions), 'renditions': renditions}
+
+    def sprites(self, source, output, info):
+        layout = self.sprite_layout(info)
+        per_sheet = layout['columns'] * layout['rows']
+        sheets = []
+        for index in range(math.ceil(layout['count'] / per_sheet)):
+            name = f'sprite-{index + 1:03d}.jpg'
+            Image.new('RGB', (layout['width'] * layout['columns'], layout['height'] * layout['rows'])).save(os.path.join(output, name))
+            sheets.append(name)
+        return {**layout, 'sheets': sheets, 'track': self.thumbnails_track(output, layout, sheets)}
+
+
+def run_job(processor_class, options, kind, source, output):
+    """Entry point of the worker processes: probe `source` and run `kind` on it."""
+    processor = processor_class(options)
+    info = processor.probe(source)
+    if kind == 'probe':
+        return info
+    os.makedirs(output, exist_ok=True)
+    return getattr(processor, kind)(source, output, info)
@@ -1,15 +1,19 @@
+from django.conf import settings
 from django.http import Http404
 from django.shortcuts import get_object_or_404, render, redirect
 from django.urls import reverse
 from django.views.generic import View
-from cart.models import Cart
-from cart.utils import get_cart
-from .models import Bookmark, Category, Course, MainPageCategoryAdd, MainPageCourseAdd, Team
+from .models import Bookmark, Category, Course, MainPageCategoryAdd, Team
+from .cache import get_home_tabs, get_home_version
+from .comments import build_comment_thread
+from .entitlements import attach_lesson_urls
 from .forms import CommentForm
-from django.db.models import Count
+from .search import search_courses
+from .pagination import cursor_paginate
 from django.core.paginator import Paginator
 from django.contrib.auth.mixins import LoginRequiredMixin
 from academy.models import Comment
+from myacademy.replicas import ReadReplicaMixin
 
 
 def paginate(queryset, per_page, request):
@@ -20,80 +24,61 @@ def paginate(queryset, per_page, request):
     return paginator.page(page)
 
 
-class Home(View):
+class Home(ReadReplicaMixin, View):
     template_name = 'academy/home.html'
 
     def get(self, request, *args, **kwargs):
+        # categories and team are only queried when their cached fragments are missing
+        home_version = get_home_version()
         context = {
-            'mainpage_categorys': MainPageCategoryAdd.objects.all()[:4],
-            'mainpage_tabs_courses': MainPageCourseAdd.objects.all()[:4],
-            'team': Team.objects.all(),
+            'home_version': home_version,
+            'home_cache_timeout': settings.HOME_CACHE_TIMEOUT,
+            'mainpage_categorys': MainPageCategoryAdd.objects.select_related('category')[:4],
+            'mainpage_tabs_courses': get_home_tabs(home_version),
+            'team': Team.objects.select_related('user__profile'),
         }
 
-        if request.user.is_authenticated:
-            cart, total_price, cart_courses = get_cart(request.user)
-            all_bookmarks = [course.media_id for course in Bookmark.objects.filter(user = request.user)]
-
-            context.update({
-                'total_price': total_price,
-                'cart_courses': cart_courses,
-                'all_bookmarks': all_bookmarks,
-            })
         return render(request, self.template_name, context)
 
 
-class CourseFilterView(View):
+class CourseFilterView(ReadReplicaMixin, View):
     template_name = 'academy/course.html'
 
     def get(self, request, *args, **kwargs):
 
-        courses = Course.objects.filter(is_active = True).select_related('teacher').prefetch_related('category', 'seasions').annotate(lessons_count = Count('seasions__lessons')).order_by('updated_at')
+        courses = Course.objects.filter(is_active = True).select_related('teacher').prefetch_related('category')
         course_name = request.GET.get('name', None)
         if course_name:
-            courses = courses.filter(name__contains = course_name)
+            courses = paginate(search_courses(courses, course_name), 9, request)
+        else:
+            courses = cursor_paginate(courses, 9, request)
 
         context = {
-            'courses': paginate(courses, 9, request),
+            'courses': courses,
             'current_url': request.get_full_path(),
             'page_name': 'تمام دوره ها | آکادمی من',
             }
 
-        if request.user.is_authenticated:
-            cart, total_price, cart_courses = get_cart(request.user)
-            all_bookmarks = [course.media_id for course in Bookmark.objects.filter(user = request.user)]
-
-        context.update({
-            'total_price': total_price,
-            'cart_courses': cart_courses,
-            'all_bookmarks': all_bookmarks,
-        })
         return render(request, self.template_name, context)
 
 
-class CourseCategoryView(View):
+class CourseCategoryView(ReadReplicaMixin, View):
     template_name = 'academy/course.html'
 
     def get(self, request, category_slug, *args, **kwargs):
         category = get_object_or_404(Category, slug = category_slug)
-        courses = Course.objects.filter(is_active = True, category__slug = category_slug).select_related('teacher').prefetch_related('category', 'seasions').annotate(lessons_count = Count('seasions__lessons')).order_by('updated_at')
+        courses = Course.objects.filter(is_active = True, category__slug = category_slug).select_related('teacher').prefetch_related('category')
         course_name = request.GET.get('name', None)
         if course_name:
-            courses = courses.filter(name__contains = course_name)
+            courses = paginate(search_courses(courses, course_name), 9, request)
+        else:
+            courses = cursor_paginate(courses, 9, request)
 
         context = {
-            'courses': paginate(courses, 9, request),
+            'courses': courses,
             'page_name': f'دوره های {category.title} | آکادمی من',
             }
 
-        if request.user.is_authenticated:
-            cart, total_price, cart_courses = get_cart(request.user)
-            all_bookmarks = [course.media_id for course in Bookmark.objects.filter(user = request.user)]
-
-            context.update({
-                'total_price': total_price,
-                'cart_courses': cart_courses,
-                'all_bookmarks': all_bookmarks,
-            })
         return render(request, self.template_name, context)
 
 
@@ -112,39 +97,32 @@ class BookmarkView(LoginRequiredMixin, View):
         return redirect(request.GET.get('next', reverse('academy:courseslist')))
 
 
-class CourseDetailsView(View):
+class CourseDetailsView(ReadReplicaMixin, View):
     template_name = 'academy/course-details.html'
 
-    def dispatch(self, request, *args, **kwargs):
+    def load(self, request, course_id):
+        # called by get() and post(), inside ReadReplicaMixin.dispatch() which routes the reads of get()
         self.course = get_object_or_404(
-            Course.objects.prefetch_related('category', 'seasions', 'seasions__lessons').select_related('teacher').annotate(lessons_count = Count('seasions__lessons')),
+            Course.objects.prefetch_related('category', 'seasions', 'seasions__lessons').select_related('teacher'),
             is_active = True,
-            id = kwargs['course_id']
+            id = course_id
             )
 
+        # the prefetched lessons are the instances the template iterates
+        attach_lesson_urls(request.user, self.course, [lesson for seasion in self.course.seasions.all() for lesson in seasion.lessons.all()])
         self.context = {
             'course': self.course,
-            'comments': Comment.objects.filter(active = True, media_type = 'course', parent__isnull = True, media_id = self.course.pk),
+            'comments': build_comment_thread('course', self.course.pk, request.GET.get('comments_page'), expand=request.GET.get('replies')),
             'form': CommentForm(),
+            'hls_js_url': settings.HLS_JS_URL,
         }
 
-        if request.user.is_authenticated:
-            cart, total_price, cart_courses = get_cart(request.user)
-            all_bookmarks = [course.media_id for course in Bookmark.objects.filter(user = request.user)]
-            product_in_cart = cart_courses.filter(media_id = self.course.id)
-
-            self.context.update({
-                'product_in_cart': product_in_cart,
-                'total_price': total_price,
-                'cart_courses': cart_courses,
-                'all_bookmarks': all_bookmarks,
-            })
-        return super().dispatch(request, *args, **kwargs)
-
     def get(self, request, course_id, *args, **kwargs):
+        self.load(request, course_id)
         return render(request, self.template_name, self.context)
 
     def post(self, request, course_id, *args, **kwargs):
+        self.load(request, course_id)
         if request.user.is_authenticated:
             form = CommentForm(request.POST)
             if form.is_valid():
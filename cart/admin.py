@@ -1,26 +1,34 @@
 from django.contrib import admin
+from django.db.models import Count
 from .models import Cart, CartItem, Order
 
 
 @admin.register(CartItem)
 class CartItemRegister(admin.ModelAdmin):
-    list_display = ['content_type', 'media_id', 'price']
+    list_display = ['content_type', 'media_id', 'price', 'cart']
     list_filter = ['content_type']
+    raw_id_fields = ['cart']
+    list_select_related = ['cart__user']
+
+
+class CartItemInline(admin.TabularInline):
+    model = CartItem
+    extra = 0
 
 
 @admin.register(Cart)
 class CartRegister(admin.ModelAdmin):
-    list_display = ['id', 'status', 'user', 'get_items_count']
+    list_display = ['id', 'status', 'user', 'get_items_count', 'updated_at']
     list_display_links = ['id', 'status']
     list_filter = ['status']
-    filter_horizontal = ['items']
+    inlines = [CartItemInline]
 
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user').prefetch_related('items')
+        return super().get_queryset(request).select_related('user').annotate(items_count = Count('items'))
 
-    @admin.display()
+    @admin.display(ordering='items_count')
     def get_items_count(self, obj):
-        return obj.items.count()
+        return obj.items_count
 
 
 @admin.register(Order)
@@ -0,0 +1,110 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from academy.images import srcset
+from academy.managers import resolve_media
+from academy.models import Bookmark
+from myacademy.metrics import cache_get_or_set
+from .utils import get_open_cart
+
+
+COMMERCE_VERSION_KEY = 'commerce:version'
+
+
+def user_version_key(user_id):
+    return f'commerce:version:{user_id}'
+
+
+def bump_commerce_version(user_id=None):
+    """
+    Invalidate the cached commerce summary of one user,
+    or of every user when a shared object like a course changed.
+    """
+    key = COMMERCE_VERSION_KEY if user_id is None else user_version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def summarize_cart_items(items):
+    summary = []
+    for item in items:
+        media = item.get_object()
+        if media is None:
+            continue
+        summary.append({
+            'content_type': item.content_type,
+            'media_id': item.media_id,
+            'price': item.price,
+            'name': media.name,
+            'display_price': media.price,
+            'thumbnail': media.thumbnail.url if media.thumbnail else '',
+            'thumbnail_srcset': srcset(media.thumbnail),
+            'url': media.get_absolute_url(),
+            'remove_url': media.get_remove_from_cart_url(),
+        })
+    return summary
+
+
+def load_commerce_summary(user):
+    cart = get_open_cart(user)
+    items = summarize_cart_items(cart.items.all().prefetch_media()) if cart is not None else []
+    bookmarks = list(Bookmark.objects.filter(user = user).values_list('content_type', 'media_id'))
+    return {'items': items, 'bookmarks': bookmarks}
+
+
+class Commerce:
+    """
+    Cart and bookmark state of the current user, loaded at most once per request.
+    Reads are served from the cache until a cart, bookmark or course changes.
+    Anonymous users only have the cart kept in `cart_storage`.
+    """
+    def __init__(self, user, cart_storage=None):
+        self.user = user
+        self.cart_storage = cart_storage
+
+    @cached_property
+    def summary(self):
+        if not self.user.is_authenticated:
+            items = self.cart_storage.items() if self.cart_storage is not None else []
+            return {'items': summarize_cart_items(resolve_media(items)), 'bookmarks': []}
+        user_key = user_version_key(self.user.pk)
+        versions = cache.get_many([COMMERCE_VERSION_KEY, user_key])
+        missing = {key: time.time_ns() for key in (COMMERCE_VERSION_KEY, user_key) if key not in versions}
+        if missing:
+            cache.set_many(missing, None)
+            versions.update(missing)
+        key = f'commerce:{self.user.pk}:{versions[user_key]}:{versions[COMMERCE_VERSION_KEY]}'
+        return cache_get_or_set('commerce', key, lambda: load_commerce_summary(self.user), settings.COMMERCE_CACHE_TIMEOUT)
+
+    @property
+    def cart_items(self):
+        return self.summary['items']
+
+    @property
+    def cart_count(self):
+        return len(self.cart_items)
+
+    @cached_property
+    def total_price(self):
+        return sum(item['price'] for item in self.cart_items)
+
+    @cached_property
+    def cart_course_ids(self):
+        return {item['media_id'] for item in self.cart_items if item['content_type'] == 'course'}
+
+    @cached_property
+    def bookmarked_course_ids(self):
+        return {media_id for content_type, media_id in self.bookmarks if content_type == 'course'}
+
+    def in_cart(self, content_type, media_id):
+        return any(item['content_type'] == content_type and item['media_id'] == media_id for item in self.cart_items)
+
+    @cached_property
+    def bookmarks(self):
+        return {tuple(bookmark) for bookmark in self.summary['bookmarks']}
+
+    def is_bookmarked(self, content_type, media_id):
+        return (content_type, media_id) in self.bookmarks
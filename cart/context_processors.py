@@ -0,0 +1,8 @@
+from .commerce import Commerce
+from .storage import get_cart_storage
+
+
+def commerce(request):
+    if not hasattr(request, 'commerce'):
+        request.commerce = Commerce(request.user, get_cart_storage(request))
+    return {'commerce': request.commerce}
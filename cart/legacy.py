@@ -0,0 +1,60 @@
+"""
+Moving cart items from the old Cart.items many to many to CartItem.cart.
+
+The migration that adds CartItem.cart and drops Cart.items must copy the rows in
+between, or every existing item, paid ones included, is left without a cart:
+
+    migrations.AddField('cartitem', 'cart', ...),
+    migrations.RunPython(copy_legacy_cart_items, migrations.RunPython.noop),
+    migrations.RemoveField('cart', 'items'),
+
+Migrations are generated per deployment, add the RunPython step to the generated one.
+"""
+LEGACY_TABLE = 'cart_cart_items'
+
+
+def legacy_table_exists(connection):
+    with connection.cursor() as cursor:
+        return LEGACY_TABLE in connection.introspection.table_names(cursor)
+
+
+def backfill_cart_items(connection):
+    """
+    Give every item of the old table its cart, returns how many links were copied.
+    Items shared by several carts are copied, one row per cart.
+    """
+    if not legacy_table_exists(connection):
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT cart_id, cartitem_id FROM {LEGACY_TABLE} ORDER BY id')
+        links = cursor.fetchall()
+        copied = 0
+        for cart_id, item_id in links:
+            cursor.execute('SELECT cart_id, content_type, media_id, price FROM cart_cartitem WHERE id = %s', [item_id])
+            row = cursor.fetchone()
+            if row is None:
+                continue
+            current_cart, content_type, media_id, price = row
+            if current_cart == cart_id:
+                continue
+            cursor.execute(
+                'SELECT 1 FROM cart_cartitem WHERE cart_id = %s AND content_type = %s AND media_id = %s',
+                [cart_id, content_type, media_id],
+            )
+            if cursor.fetchone():
+                # the cart has this course already
+                continue
+            if current_cart is None:
+                cursor.execute('UPDATE cart_cartitem SET cart_id = %s WHERE id = %s', [cart_id, item_id])
+            else:
+                cursor.execute(
+                    'INSERT INTO cart_cartitem (cart_id, content_type, media_id, price) VALUES (%s, %s, %s, %s)',
+                    [cart_id, content_type, media_id, price],
+                )
+            copied += 1
+    return copied
+
+
+def copy_legacy_cart_items(apps, schema_editor):
+    """RunPython step of the migration dropping Cart.items."""
+    backfill_cart_items(schema_editor.connection)
@@ -0,0 +1,92 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from academy.models import Course
+from cart.storage import DatabaseCartStorage, SessionCartStorage, SignedCookieCartStorage
+from user.models import User
+
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class Command(BaseCommand):
+    help = 'Compare database, session and signed cookie cart storages under concurrent add/remove traffic'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--operations', type=int, default=200, help='add/remove operations per thread')
+        parser.add_argument('--courses', type=int, default=20, help='distinct courses the traffic picks from')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        media_ids = list(Course.objects.order_by('pk').values_list('pk', flat=True)[:options['courses']])
+        if not media_ids:
+            raise CommandError('No courses to add, create some first (see generate_fake_academy).')
+
+        users = [
+            User.objects.create(username = f'bench-cart-{i}', email = f'bench-cart-{i}@example.com', phone_number = f'0990000{i:04d}')
+            for i in range(options['threads'])
+        ]
+        try:
+            self.stdout.write(f'{"storage":<12}{"ops":>8}{"seconds":>10}{"ops/s":>10}{"db writes":>12}{"errors":>8}')
+            for name, storage_class in (('database', DatabaseCartStorage), ('session', SessionCartStorage), ('cookie', SignedCookieCartStorage)):
+                ops, seconds, writes, errors = self.run(storage_class, users, media_ids, options)
+                self.stdout.write(f'{name:<12}{ops:>8}{seconds:>10.3f}{ops / seconds:>10.0f}{writes:>12}{errors:>8}')
+        finally:
+            User.objects.filter(pk__in = [user.pk for user in users]).delete()
+
+    def run(self, storage_class, users, media_ids, options):
+        session_store = import_module(settings.SESSION_ENGINE).SessionStore
+        factory = RequestFactory()
+
+        def worker(index):
+            rng = random.Random(options['seed'] + index)
+            request = factory.post('/')
+            request.user = users[index] if storage_class is DatabaseCartStorage else AnonymousUser()
+            request.session = session_store()
+            writes = errors = 0
+
+            def count_writes(execute, sql, params, many, context):
+                nonlocal writes
+                if sql.lstrip().split(' ', 1)[0].upper() in WRITE_STATEMENTS:
+                    writes += 1
+                return execute(sql, params, many, context)
+
+            try:
+                with connection.execute_wrapper(count_writes):
+                    for _ in range(options['operations']):
+                        # a fresh storage per operation, like one request each
+                        storage = storage_class(request)
+                        media_id = rng.choice(media_ids)
+                        try:
+                            if rng.random() < 0.5:
+                                storage.add('course', media_id, 0)
+                            else:
+                                storage.remove('course', media_id)
+                        except OperationalError:
+                            # "database is locked" from concurrent sqlite writers
+                            errors += 1
+                            continue
+                        response = HttpResponse()
+                        storage.save(response)
+                        if settings.CART_SESSION_ID in response.cookies:
+                            request.COOKIES[settings.CART_SESSION_ID] = response.cookies[settings.CART_SESSION_ID].value
+                        if request.session.modified:
+                            request.session.save()
+                            request.session.modified = False
+            finally:
+                connection.close()
+            return writes, errors
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['threads']) as executor:
+            results = list(executor.map(worker, range(options['threads'])))
+        seconds = time.perf_counter() - start
+        return options['threads'] * options['operations'], seconds, sum(r[0] for r in results), sum(r[1] for r in results)
@@ -0,0 +1,49 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from cart.legacy import LEGACY_TABLE, legacy_table_exists
+from cart.models import Cart, CartItem
+
+
+class Command(BaseCommand):
+    help = 'Delete open carts untouched for --days and, with --delete-orphans, cart items without a cart, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='open carts not updated for this many days are abandoned')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument(
+            '--delete-orphans', action='store_true',
+            help='also delete items without a cart, only once cart.legacy copied the old many to many into CartItem.cart',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        orphans = 0
+        if options['delete_orphans']:
+            # items of the old many to many have no cart until the backfill ran, paid ones too
+            if legacy_table_exists(connection):
+                raise CommandError(f'{LEGACY_TABLE} still exists, run cart.legacy.backfill_cart_items() and drop it first.')
+            orphans = self.delete_in_batches(CartItem.objects.filter(cart__isnull = True), options)
+        # carts referenced by an order are history, never compact them
+        abandoned = self.delete_in_batches(
+            Cart.objects.filter(status = 'created', updated_at__lt = cutoff, order__isnull = True),
+            options,
+        )
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {orphans} orphaned items and {abandoned} abandoned carts.'))
+
+    def delete_in_batches(self, queryset, options):
+        """Walk the primary keys in order so each batch is a short transaction."""
+        deleted = 0
+        last_pk = 0
+        while True:
+            pks = list(queryset.filter(pk__gt = last_pk).order_by('pk').values_list('pk', flat=True)[:options['batch_size']])
+            if not pks:
+                return deleted
+            if not options['dry_run']:
+                queryset.model.objects.filter(pk__in = pks).delete()
+            deleted += len(pks)
+            last_pk = pks[-1]
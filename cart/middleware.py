@@ -0,0 +1,20 @@
+from django.utils.functional import SimpleLazyObject
+from .commerce import Commerce
+from .storage import get_cart_storage
+
+
+class CommerceMiddleware:
+    """
+    Attach a lazy `request.commerce`, nothing is loaded until a view or template reads it.
+    Also writes the anonymous cart back to the response when it changed.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.commerce = SimpleLazyObject(lambda: Commerce(request.user, get_cart_storage(request)))
+        response = self.get_response(request)
+        storage = getattr(request, '_anonymous_cart_storage', None)
+        if storage is not None:
+            storage.save(response)
+        return response
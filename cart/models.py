@@ -1,27 +1,33 @@
 from django.db import models
+from django.utils import timezone
 from user.models import User
-from academy.models import Course
+from academy.managers import MediaManager
+from academy.models import MediaReferenceMixin
 from django.utils.translation import gettext_lazy as _
 
 
-class CartItem(models.Model):
+class CartItem(MediaReferenceMixin, models.Model):
     class ContentTypes(models.TextChoices):
         course = 'course', 'دوره ویدیویی'
         files = 'files', 'فایل'
 
+    # null only for rows of the old many to many the backfill of cart.legacy did not reach, see compact_carts
+    cart = models.ForeignKey('Cart', on_delete=models.CASCADE, related_name='items', blank=True, null=True, verbose_name=_("سبد خرید"))
     content_type = models.CharField(_("نوع دوره"), choices=ContentTypes.choices, default=ContentTypes.course, max_length=6)
     media_id = models.IntegerField(_("ایدی دوره"))
     price = models.IntegerField(_("قیمت"))
+    objects = MediaManager()
 
     class Meta:
         verbose_name = 'آیتم سبد خرید'
         verbose_name_plural = 'آیتم های سبد خرید'
-
-    def get_object(self):
-        content_type = {
-            'course': Course,
-        }
-        return content_type[self.content_type].objects.get(id=self.media_id) if self.content_type in content_type.keys() else None
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'content_type', 'media_id'], name='unique_cart_item'),
+        ]
+        indexes = [
+            # purchases and enrollments of a course
+            models.Index(fields=['content_type', 'media_id'], name='cart_item_media'),
+        ]
 
     def __str__(self):
         return f'{self.content_type} : {self.media_id}'
@@ -30,12 +36,19 @@ class CartItem(models.Model):
 class Cart(models.Model):
     status_list = (('created', 'ساخته شده'), ('pending', 'در انتظار'), ('paid', 'پرداخت شده'))
     status = models.CharField(_("وضعیت"), choices = status_list, default='created', max_length=7)
-    items = models.ManyToManyField(CartItem, verbose_name=_("دوره ها"))
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_("کاربر"))
+    created_at = models.DateTimeField(_("زمان ساخت"), default=timezone.now, editable=False)
+    updated_at = models.DateTimeField(_("آخرین تغییر"), auto_now=True)
 
     class Meta:
         verbose_name = 'سبد خرید'
         verbose_name_plural = 'سبد های خرید'
+        constraints = [
+            models.UniqueConstraint(fields=['user'], condition=models.Q(status='created'), name='unique_open_cart_per_user'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'status'], name='cart_user_status'),
+        ]
 
     def __str__(self):
         return self.user.__str__() + " : " + self.get_status_display()
@@ -43,7 +56,7 @@ class Cart(models.Model):
 
 class Order(models.Model):
     status_types = (('pending', 'در انتظار پرداخت'),
-                    ('payed', 'پرداخت شده'),
+                    ('paid', 'پرداخت شده'),
                     ('failed', 'ناموفق'),)
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_('دانشجو'))
     total_price = models.IntegerField(_('قیمت کل'), blank=True, null=True)
@@ -0,0 +1,55 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from academy.entitlements import invalidate_entitlements
+from academy.models import Bookmark, Course
+from academy.stats import refresh_course_stats
+from .commerce import bump_commerce_version
+from .models import Cart, CartItem, Order
+from .storage import merge_anonymous_cart
+
+
+@receiver(post_save, sender=Order)
+def update_course_enrollments(sender, instance, raw=False, **kwargs):
+    if not raw and instance.status == 'paid':
+        refresh_course_stats(instance.cart.items.filter(content_type = 'course').values_list('media_id', flat=True))
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_order_entitlements(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_entitlements(instance.user_id)
+
+
+@receiver(post_save, sender=Cart)
+@receiver(post_delete, sender=Cart)
+@receiver(post_save, sender=Bookmark)
+@receiver(post_delete, sender=Bookmark)
+def invalidate_user_commerce(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_commerce_version(instance.user_id)
+
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def invalidate_cart_item(sender, instance, raw=False, **kwargs):
+    if raw or instance.cart_id is None:
+        return
+    user_id = Cart.objects.filter(pk = instance.cart_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        bump_commerce_version(user_id)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_all_commerce(sender, raw=False, **kwargs):
+    # cart summaries hold course names, prices and thumbnails
+    if not raw:
+        bump_commerce_version()
+
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    if request is not None:
+        merge_anonymous_cart(request)
@@ -0,0 +1,171 @@
+from django.conf import settings
+from django.core import signing
+from django.utils.module_loading import import_string
+from .models import CartItem
+from .utils import get_open_cart, get_or_create_cart
+
+
+class BaseCartStorage:
+    """
+    Where the cart of a request lives. Items are unsaved CartItem instances,
+    so templates and `resolve_media` treat every storage the same way.
+    """
+    def __init__(self, request):
+        self.request = request
+
+    def items(self):
+        raise NotImplementedError
+
+    def add(self, content_type, media_id, price):
+        raise NotImplementedError
+
+    def remove(self, content_type, media_id):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def save(self, response):
+        """Persist pending changes on the response, if the storage needs it."""
+
+
+class DatabaseCartStorage(BaseCartStorage):
+    """Cart rows of an authenticated user."""
+    def items(self):
+        cart = get_open_cart(self.request.user)
+        return list(cart.items.all()) if cart is not None else []
+
+    def add(self, content_type, media_id, price):
+        self.add_items([CartItem(content_type = content_type, media_id = media_id, price = price)])
+
+    def add_items(self, items):
+        """Upsert items into the open cart, adding a course twice only refreshes its price."""
+        cart = get_or_create_cart(self.request.user)
+        for item in items:
+            item.cart = cart
+        CartItem.objects.bulk_create(
+            items,
+            update_conflicts=True,
+            unique_fields=['cart', 'content_type', 'media_id'],
+            update_fields=['price'],
+        )
+        # bulk_create sends no signals, saving the cart invalidates the cached summary
+        cart.save(update_fields=['updated_at'])
+
+    def remove(self, content_type, media_id):
+        cart = get_open_cart(self.request.user)
+        if cart is None:
+            return False
+        deleted, _ = cart.items.filter(content_type = content_type, media_id = media_id).delete()
+        return bool(deleted)
+
+    def clear(self):
+        cart = get_open_cart(self.request.user)
+        if cart is not None:
+            cart.items.all().delete()
+
+
+class AnonymousCartStorage(BaseCartStorage):
+    """Keeps [content_type, media_id, price] triples outside the database until login."""
+    def __init__(self, request):
+        super().__init__(request)
+        self._items = None
+        self.modified = False
+
+    def load(self):
+        raise NotImplementedError
+
+    def dump(self, items):
+        raise NotImplementedError
+
+    @property
+    def data(self):
+        if self._items is None:
+            self._items = [item for item in self.load() if isinstance(item, list) and len(item) == 3]
+        return self._items
+
+    def items(self):
+        return [CartItem(content_type = content_type, media_id = media_id, price = price) for content_type, media_id, price in self.data]
+
+    def add(self, content_type, media_id, price):
+        if not any(item[:2] == [content_type, media_id] for item in self.data):
+            self.data.append([content_type, media_id, price])
+            self.dump(self.data)
+
+    def remove(self, content_type, media_id):
+        items = [item for item in self.data if item[:2] != [content_type, media_id]]
+        removed = len(items) != len(self.data)
+        if removed:
+            self._items = items
+            self.dump(items)
+        return removed
+
+    def clear(self):
+        self._items = []
+        self.dump([])
+
+
+class SessionCartStorage(AnonymousCartStorage):
+    """
+    Stores the cart in the session under CART_SESSION_ID.
+    Only free of database writes with a cache or signed cookie SESSION_ENGINE.
+    """
+    def load(self):
+        return self.request.session.get(settings.CART_SESSION_ID, [])
+
+    def dump(self, items):
+        if items:
+            self.request.session[settings.CART_SESSION_ID] = items
+        else:
+            self.request.session.pop(settings.CART_SESSION_ID, None)
+
+
+class SignedCookieCartStorage(AnonymousCartStorage):
+    """Stores the cart in a signed cookie named CART_SESSION_ID, written by CommerceMiddleware."""
+    salt = 'cart.storage'
+
+    def load(self):
+        try:
+            return signing.loads(self.request.COOKIES.get(settings.CART_SESSION_ID, ''), salt=self.salt, max_age=settings.CART_COOKIE_AGE)
+        except signing.BadSignature:
+            return []
+
+    def dump(self, items):
+        self.modified = True
+
+    def save(self, response):
+        if not self.modified:
+            return
+        if self.data:
+            response.set_cookie(
+                settings.CART_SESSION_ID,
+                signing.dumps(self.data, salt=self.salt, compress=True),
+                max_age=settings.CART_COOKIE_AGE,
+                httponly=True,
+                samesite='Lax',
+                secure=settings.SESSION_COOKIE_SECURE,
+            )
+        else:
+            response.delete_cookie(settings.CART_SESSION_ID, samesite='Lax')
+
+
+def get_anonymous_cart_storage(request):
+    if not hasattr(request, '_anonymous_cart_storage'):
+        request._anonymous_cart_storage = import_string(settings.CART_ANONYMOUS_STORAGE)(request)
+    return request._anonymous_cart_storage
+
+
+def get_cart_storage(request):
+    if request.user.is_authenticated:
+        return DatabaseCartStorage(request)
+    return get_anonymous_cart_storage(request)
+
+
+def merge_anonymous_cart(request):
+    """Move the items of the anonymous cart into the database cart of the logged in user."""
+    storage = get_anonymous_cart_storage(request)
+    items = storage.items()
+    if not items:
+        return
+    DatabaseCartStorage(request).add_items(items)
+    storage.clear()
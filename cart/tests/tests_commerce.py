@@ -0,0 +1,70 @@
+from django.contrib.auth.models import AnonymousUser
+from django.urls import reverse
+from academy.models import Bookmark, Course
+from academy.tests.tests_views import BaseTestCase
+from cart.commerce import Commerce
+from cart.models import Cart, CartItem
+
+
+class TestCommerce(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.courses = [
+            Course.objects.create(name = f'course {i}', description = 'd', teacher = self.user, thumbnail = 'c.png', time = '01:00:00', price = 10, is_active = True)
+            for i in range(3)
+        ]
+        self.cart = Cart.objects.create(user = self.user)
+        CartItem.objects.create(cart = self.cart, media_id = self.courses[0].pk, price = 10)
+        Bookmark.objects.create(user = self.user, content_type = 'course', media_id = self.courses[1].pk)
+
+    def test_anonymous_without_queries(self):
+        with self.assertNumQueries(0):
+            commerce = Commerce(AnonymousUser())
+            self.assertEqual(commerce.cart_count, 0)
+            self.assertEqual(commerce.bookmarked_course_ids, set())
+
+    def test_summary(self):
+        commerce = Commerce(self.user)
+        self.assertEqual(commerce.total_price, 10)
+        self.assertEqual(commerce.cart_course_ids, {self.courses[0].pk})
+        self.assertEqual(commerce.bookmarked_course_ids, {self.courses[1].pk})
+        self.assertTrue(commerce.in_cart('course', self.courses[0].pk))
+        self.assertTrue(commerce.is_bookmarked('course', self.courses[1].pk))
+        self.assertEqual(commerce.cart_items[0]['name'], 'course 0')
+
+    def test_cached_across_requests(self):
+        Commerce(self.user).summary
+        with self.assertNumQueries(0):
+            self.assertEqual(Commerce(self.user).cart_count, 1)
+
+    def test_invalidated_on_bookmark(self):
+        Commerce(self.user).summary
+        Bookmark.objects.create(user = self.user, content_type = 'course', media_id = self.courses[2].pk)
+        self.assertEqual(Commerce(self.user).bookmarked_course_ids, {self.courses[1].pk, self.courses[2].pk})
+        Bookmark.objects.filter(media_id = self.courses[1].pk).delete()
+        self.assertEqual(Commerce(self.user).bookmarked_course_ids, {self.courses[2].pk})
+
+    def test_invalidated_on_cart_change(self):
+        Commerce(self.user).summary
+        CartItem.objects.create(cart = self.cart, media_id = self.courses[1].pk, price = 10)
+        self.assertEqual(Commerce(self.user).total_price, 20)
+        self.cart.items.first().delete()
+        self.assertEqual(Commerce(self.user).cart_count, 1)
+        self.cart.status = 'pending'
+        self.cart.save()
+        self.assertEqual(Commerce(self.user).cart_count, 0)
+
+    def test_invalidated_on_course_change(self):
+        Commerce(self.user).summary
+        self.courses[0].name = 'renamed'
+        self.courses[0].save()
+        self.assertEqual(Commerce(self.user).cart_items[0]['name'], 'renamed')
+
+    def test_views_use_request_commerce(self):
+        self.login()
+        res = self.client.get(reverse('academy:course-details', args=[self.courses[0].pk]))
+        self.assertContains(res, 'حذف از سبد خرید')
+        self.assertEqual(res.context['commerce'].cart_course_ids, {self.courses[0].pk})
+
+        res = self.client.get(reverse('academy:courseslist'))
+        self.assertContains(res, 'ذخیره شده')
@@ -0,0 +1,149 @@
+from datetime import timedelta
+from io import StringIO
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+from academy.models import Course
+from academy.tests.tests_views import BaseTestCase
+from cart.legacy import LEGACY_TABLE, backfill_cart_items
+from cart.models import Cart, CartItem, Order
+from cart.storage import SessionCartStorage
+from cart.utils import get_cart
+from user.models import User
+
+
+class TestAnonymousCart(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.courses = [
+            Course.objects.create(name = f'course {i}', description = 'd', teacher = self.user, thumbnail = 'c.png', time = '01:00:00', price = 10, is_active = True)
+            for i in range(2)
+        ]
+
+    def add(self, course):
+        return self.client.post(reverse('cart:cart-add', args=['course', course.pk]))
+
+    def test_add_without_database_writes(self):
+        with self.assertNumQueries(1):
+            self.add(self.courses[0])
+        self.assertIn(settings.CART_SESSION_ID, self.client.cookies)
+        self.assertFalse(Cart.objects.exists())
+
+        res = self.client.get(self.courses[0].get_absolute_url())
+        self.assertEqual(res.context['commerce'].cart_course_ids, {self.courses[0].pk})
+        self.assertEqual(res.context['commerce'].total_price, 10)
+
+    def test_add_twice_and_remove(self):
+        self.add(self.courses[0])
+        self.add(self.courses[0])
+        self.add(self.courses[1])
+        self.client.post(reverse('cart:cart-remove', args=['course', self.courses[0].pk]))
+        res = self.client.get(reverse('academy:courseslist'))
+        self.assertEqual(res.context['commerce'].cart_course_ids, {self.courses[1].pk})
+
+        res = self.client.post(reverse('cart:cart-remove', args=['course', self.courses[0].pk]))
+        self.assertEqual(res.status_code, 404)
+
+    def test_tampered_cookie_ignored(self):
+        self.client.cookies[settings.CART_SESSION_ID] = 'tampered'
+        res = self.client.get(reverse('academy:courseslist'))
+        self.assertEqual(res.context['commerce'].cart_count, 0)
+
+    def test_merged_on_login(self):
+        self.add(self.courses[0])
+        self.add(self.courses[1])
+        self.login()
+        cart, total_price, cart_courses = get_cart(self.user)
+        self.assertEqual(total_price, 20)
+        self.assertEqual({item.media_id for item in cart_courses}, {course.pk for course in self.courses})
+        self.assertEqual(self.client.cookies[settings.CART_SESSION_ID].value, '')
+
+    def test_session_storage(self):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        request.session = SessionStore()
+        SessionCartStorage(request).add('course', self.courses[0].pk, 10)
+        storage = SessionCartStorage(request)
+        self.assertEqual([(item.media_id, item.price) for item in storage.items()], [(self.courses[0].pk, 10)])
+        self.assertTrue(storage.remove('course', self.courses[0].pk))
+        self.assertNotIn(settings.CART_SESSION_ID, request.session)
+
+
+class TestDatabaseCart(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.course = Course.objects.create(name = 'course', description = 'd', teacher = self.user, thumbnail = 'c.png', time = '01:00:00', price = 10, is_active = True)
+        self.other = User.objects.create(username='user2', email='user2@gmail.com', phone_number='09123456788')
+        CartItem.objects.create(cart = Cart.objects.create(user = self.other), media_id = self.course.pk, price = 10)
+        self.login()
+
+    def test_add_is_idempotent(self):
+        url = reverse('cart:cart-add', args=['course', self.course.pk])
+        self.client.post(url)
+        self.course.price = 20
+        self.course.save()
+        self.client.post(url)
+        cart, total_price, cart_courses = get_cart(self.user)
+        self.assertEqual(cart.items.count(), 1)
+        self.assertEqual(total_price, 20)
+
+    def test_remove_only_own_item(self):
+        url = reverse('cart:cart-remove', args=['course', self.course.pk])
+        self.assertEqual(self.client.post(url).status_code, 404)
+        self.assertEqual(CartItem.objects.filter(cart__user = self.other).count(), 1)
+
+        self.client.post(reverse('cart:cart-add', args=['course', self.course.pk]))
+        self.client.post(url)
+        self.assertFalse(CartItem.objects.filter(cart__user = self.user).exists())
+        self.assertEqual(CartItem.objects.filter(cart__user = self.other).count(), 1)
+
+
+class TestCompactCarts(BaseTestCase):
+    def test_compact(self):
+        old = timezone.now() - timedelta(days=40)
+        CartItem.objects.bulk_create([CartItem(media_id = i, price = 0) for i in range(5)])
+        abandoned = Cart.objects.create(user = self.user)
+        CartItem.objects.create(cart = abandoned, media_id = 1, price = 0)
+        ordered = Cart.objects.create(user = self.user, status = 'pending')
+        Order.objects.create(user = self.user, cart = ordered)
+        Cart.objects.filter(pk__in = [abandoned.pk, ordered.pk]).update(updated_at = old)
+        recent = User.objects.create(username='user2', email='user2@gmail.com', phone_number='09123456788')
+        Cart.objects.create(user = recent)
+
+        out = StringIO()
+        call_command('compact_carts', batch_size = 2, stdout = out)
+        self.assertIn('0 orphaned items and 1 abandoned carts', out.getvalue())
+        self.assertEqual(CartItem.objects.filter(cart__isnull = True).count(), 5)
+
+        call_command('compact_carts', batch_size = 2, delete_orphans = True, stdout = out)
+        self.assertIn('5 orphaned items and 0 abandoned carts', out.getvalue())
+        self.assertEqual(CartItem.objects.count(), 0)
+        self.assertEqual(set(Cart.objects.values_list('user', 'status')), {(self.user.pk, 'pending'), (recent.pk, 'created')})
+
+
+class TestLegacyCartItems(BaseTestCase):
+    def test_backfill(self):
+        paid = Cart.objects.create(user = self.user, status = 'paid')
+        other = Cart.objects.create(user = self.user, status = 'pending')
+        shared, single = CartItem.objects.bulk_create([CartItem(media_id = 1, price = 10), CartItem(media_id = 2, price = 20)])
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE TABLE {LEGACY_TABLE} (id integer PRIMARY KEY, cart_id integer, cartitem_id integer)')
+            cursor.executemany(
+                f'INSERT INTO {LEGACY_TABLE} (cart_id, cartitem_id) VALUES (%s, %s)',
+                [(paid.pk, shared.pk), (paid.pk, single.pk), (other.pk, shared.pk)],
+            )
+        # not while the old table may still hold the carts of these items
+        with self.assertRaises(CommandError):
+            call_command('compact_carts', delete_orphans = True, stdout = StringIO())
+
+        self.assertEqual(backfill_cart_items(connection), 3)
+        self.assertEqual(sorted(paid.items.values_list('media_id', 'price')), [(1, 10), (2, 20)])
+        self.assertEqual(list(other.items.values_list('media_id', 'price')), [(1, 10)])
+        self.assertFalse(CartItem.objects.filter(cart__isnull = True).exists())
+        # running it again changes nothing
+        self.assertEqual(backfill_cart_items(connection), 0)
@@ -0,0 +1,57 @@
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from academy.models import Bookmark, Course
+from cart.models import Cart, CartItem
+from cart.utils import get_cart, get_or_create_cart
+from user.models import Profile, User
+
+
+class TestGetCart(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='user1', email='user1@gmail.com', phone_number='09123456789')
+        Profile.objects.create(user = self.user)
+        self.courses = [
+            Course.objects.create(name = f'course {i}', description = 'd', teacher = self.user, thumbnail = 'c.png', time = '01:00:00', price = 10)
+            for i in range(10)
+        ]
+        cart = Cart.objects.create(user = self.user)
+        CartItem.objects.bulk_create([CartItem(cart = cart, media_id = course.pk, price = course.price) for course in self.courses])
+
+    def test_media_resolved_in_one_query(self):
+        with self.assertNumQueries(3):
+            cart, total_price, cart_courses = get_cart(self.user)
+            for item in cart_courses:
+                item.get_object().get_absolute_url()
+                item.get_object().teacher.get_photo()
+        self.assertEqual(total_price, 100)
+        self.assertEqual([item.get_object() for item in cart_courses], self.courses)
+
+    def test_missing_media_is_none(self):
+        self.courses[0].delete()
+        cart, total_price, cart_courses = get_cart(self.user)
+        self.assertIsNone(cart_courses[0].get_object())
+
+    def test_read_does_not_create_cart(self):
+        user = User.objects.create(username='user2', email='user2@gmail.com', phone_number='09123456788')
+        with self.assertNumQueries(1):
+            cart, total_price, cart_courses = get_cart(user)
+        self.assertIsNone(cart)
+        self.assertEqual(total_price, 0)
+        self.assertEqual(list(cart_courses), [])
+        self.assertFalse(Cart.objects.filter(user = user).exists())
+
+    def test_one_open_cart_per_user(self):
+        cart = get_or_create_cart(self.user)
+        self.assertEqual(get_or_create_cart(self.user), cart)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Cart.objects.create(user = self.user)
+        cart.status = 'pending'
+        cart.save()
+        self.assertNotEqual(get_or_create_cart(self.user), cart)
+
+    def test_bookmark_get_object_memoized(self):
+        bookmark = Bookmark.objects.create(content_type = 'course', media_id = self.courses[0].pk, user = self.user)
+        bookmark = Bookmark.objects.get(pk = bookmark.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(bookmark.get_object(), self.courses[0])
+            bookmark.get_object()
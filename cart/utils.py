@@ -1,10 +1,21 @@
+from django.db.models import Sum
 from user.models import User
-from .models import Cart
+from .models import Cart, CartItem
 
-def get_cart(user: User):
+
+def get_open_cart(user: User):
+    """Read only lookup of the open cart with its total, None when the user has none yet."""
+    return Cart.objects.filter(user = user, status = 'created').annotate(total_price = Sum('items__price')).first()
+
+
+def get_or_create_cart(user: User):
+    """Open cart for writes, created on the first add. One open cart per user is enforced by a constraint."""
     cart, created = Cart.objects.get_or_create(user = user, status = 'created')
-    cart_courses = cart.items.all()
-    total_price = 0
-    for course in cart_courses:
-        total_price += course.price
-    return cart, total_price, cart_courses
\ No newline at end of file
+    return cart
+
+
+def get_cart(user: User):
+    cart = get_open_cart(user)
+    if cart is None:
+        return None, 0, CartItem.objects.none()
+    return cart, cart.total_price or 0, cart.items.all().prefetch_media()
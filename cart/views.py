@@ -1,6 +1,8 @@
+import logging
 from django.conf import settings
 from django.urls import reverse
 from academy.models import Course
+from myacademy.metrics import CART_ITEMS_ADDED, ORDERS
 from .models import Cart, CartItem, Order
 from django.views import View
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -8,10 +10,14 @@ from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
 from django.db.models import F, Sum
 from django.db import transaction
+from .storage import get_cart_storage
 from .utils import get_cart
 
 
-class AddCourseToCartView(LoginRequiredMixin, View):
+logger = logging.getLogger(__name__)
+
+
+class AddCourseToCartView(View):
     http_method_names = ['post']
 
     def post(self, request, content_type, course_id, *args, **kwargs):
@@ -22,15 +28,13 @@ class AddCourseToCartView(LoginRequiredMixin, View):
             raise Http404()
         
         course = get_object_or_404(content_types[content_type], id = course_id)
-        cart_item = CartItem.objects.create(content_type = content_type, media_id = course_id, price = course.get_final_price())
-        cart, created = Cart.objects.get_or_create(user = request.user, status = 'created')
-        if cart_item not in cart.items.all():
-            cart.items.add(cart_item)
+        get_cart_storage(request).add(content_type, course.pk, course.get_final_price())
+        CART_ITEMS_ADDED.inc(content_type = content_type)
 
         return redirect(request.GET.get('next', course.get_absolute_url()))
 
 
-class RevmoveCourseFromCartView(LoginRequiredMixin, View):
+class RevmoveCourseFromCartView(View):
     http_method_names = ['post']
 
     def post(self, request, content_type, course_id, *args, **kwargs):
@@ -40,40 +44,36 @@ class RevmoveCourseFromCartView(LoginRequiredMixin, View):
         if content_type not in content_types.keys():
             raise Http404()
 
-        cart_item = get_object_or_404(CartItem, content_type = content_type, media_id = course_id)
-        cart, created = Cart.objects.get_or_create(user = request.user, status = 'created')
-        if cart_item in cart.items.all():
-            cart.items.remove(cart_item)
-            cart_item.delete()
+        course = get_object_or_404(content_types[content_type], id = course_id)
+        if not get_cart_storage(request).remove(content_type, course.pk):
+            raise Http404()
 
-        return redirect(request.GET.get('next', cart_item.get_object().get_absolute_url()))
+        return redirect(request.GET.get('next', course.get_absolute_url()))
 
 
 class CheckoutView(LoginRequiredMixin, View):
     template_name = 'cart/checkout.html'
 
-    def dispatch(self, request, *args, **kwargs):
-        cart, self.total_price, cart_courses = get_cart(request.user)
-
-        self.context = {
+    def get_context_data(self):
+        cart, total_price, cart_courses = get_cart(self.request.user)
+        return {
             'cart_courses': cart_courses,
-            'total_price': self.total_price,
+            'total_price': total_price,
         }
-        return super().dispatch(request, *args, **kwargs)
 
     def get(self, request, *args, **kwargs):
-        return render(request, self.template_name, self.context)
+        return render(request, self.template_name, self.get_context_data())
 
     def post(self, request, *args, **kwargs):
-        
-
-        return render(request, self.template_name, self.context)
+        return render(request, self.template_name, self.get_context_data())
 
 
 class PaymentView(LoginRequiredMixin, View):
     def post(self, request, *args, **kwargs):
         # order, created = Order.objects.get_or_create(user = request.user, status = 'created')
         cart, total_price, cart_courses = get_cart(request.user)
+        if cart is None:
+            return redirect('academy:home')
 
         try:
             with transaction.atomic():
@@ -90,6 +90,8 @@ class PaymentView(LoginRequiredMixin, View):
 
                 cart.status = 'pending'
                 cart.save()
+            if created:
+                ORDERS.inc(status = 'created')
 
             user = request.user
             if settings.BYPASS_SHOPPING or user.balance >= total_price:
@@ -100,12 +102,13 @@ class PaymentView(LoginRequiredMixin, View):
                     if not settings.BYPASS_SHOPPING:
                         user.balance -= total_price
                         user.save()
+                ORDERS.inc(status = 'paid')
                 # TODO: redirect to bought products url
                 return redirect('academy:home')
             else:
                 return redirect('academy:home') # redirect to paymend url
-        except Exception as ex:
-            print('ERROR: In Checkout view in POST method in save order.')
-            print(ex)
+        except Exception:
+            logger.exception('Saving the order of user %s failed.', request.user.pk)
+            ORDERS.inc(status = 'failed')
             return redirect('academy:home') # redirect to paymend url
 
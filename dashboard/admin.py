@@ -1,3 +1,10 @@
 from django.contrib import admin
+from .models import ChunkedUpload
 
-# Register your models here.
+
+@admin.register(ChunkedUpload)
+class ChunkedUploadRegister(admin.ModelAdmin):
+    list_display = ['filename', 'user', 'target', 'target_id', 'offset', 'size', 'status', 'updated_at']
+    list_filter = ['status', 'target']
+    list_select_related = ['user']
+    readonly_fields = ['offset', 'checksum']
@@ -1,6 +1,9 @@
 from django import forms
+from django.conf import settings
+from django.core.validators import RegexValidator
 from academy.models import Course, Seasion
 from user.models import Profile, User
+from .models import ChunkedUpload
 
 
 class UserProfileForm(forms.ModelForm):
@@ -73,3 +76,17 @@ class PasswordChangeForm(forms.Form):
         self.user.set_password(self.cleaned_data['new_password1'])
         self.user.save()
         return self.user
+
+
+class ChunkedUploadForm(forms.ModelForm):
+    checksum = forms.CharField(required=False, validators=[RegexValidator(r'^[0-9a-fA-F]{64}$', 'sha256 باید 64 کاراکتر هگز باشد.')])
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ['target', 'target_id', 'filename', 'size', 'checksum']
+
+    def clean_size(self):
+        size = self.cleaned_data['size']
+        if size <= 0 or size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise forms.ValidationError('حجم فایل مجاز نیست.')
+        return size
@@ -0,0 +1,42 @@
+import glob
+import os
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from dashboard.models import ChunkedUpload
+from dashboard.uploads import part_path
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked uploads untouched for --hours with their part files, and part files without an upload'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        abandoned = ChunkedUpload.objects.filter(updated_at__lt = cutoff)
+        files = 0
+        for upload in abandoned.filter(status = ChunkedUpload.Statuses.uploading).iterator():
+            if os.path.exists(part_path(upload)):
+                files += 1
+                if not options['dry_run']:
+                    os.remove(part_path(upload))
+        uploads = abandoned.count()
+        if not options['dry_run']:
+            abandoned.delete()
+
+        # left by a crash between creating the part file and the row, or by a deleted row
+        known = {str(pk) for pk in ChunkedUpload.objects.values_list('pk', flat=True)}
+        for path in glob.glob(os.path.join(settings.CHUNKED_UPLOAD_DIR, '*.part')):
+            upload_id = os.path.basename(path)[:-len('.part')]
+            if upload_id not in known and os.path.getmtime(path) < time.time() - options['hours'] * 3600:
+                files += 1
+                if not options['dry_run']:
+                    os.remove(path)
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {uploads} uploads and {files} part files.'))
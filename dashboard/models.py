@@ -1,3 +1,41 @@
+import uuid
 from django.db import models
+from django.utils.translation import gettext_lazy as _
+from user.models import User
 
-# Create your models here.
+
+class ChunkedUpload(models.Model):
+    """
+    A file sent in chunks. The received bytes are kept in a part file under CHUNKED_UPLOAD_DIR,
+    `offset` is how many of them are committed, so an upload resumes after a restart.
+    """
+    class Targets(models.TextChoices):
+        lesson = 'lesson', 'فایل درس'
+        trailer = 'trailer', 'ویدیو معرفی دوره'
+
+    class Statuses(models.TextChoices):
+        uploading = 'uploading', 'در حال آپلود'
+        complete = 'complete', 'کامل شده'
+        failed = 'failed', 'ناموفق'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_('کاربر'))
+    target = models.CharField(_('مقصد'), choices=Targets.choices, max_length=7)
+    target_id = models.IntegerField(_('ایدی مقصد'))
+    filename = models.CharField(_('نام فایل'), max_length=255)
+    size = models.BigIntegerField(_('حجم'))
+    checksum = models.CharField(_('sha256'), max_length=64, blank=True, help_text='sha256 of the whole file, checked when finalized')
+    offset = models.BigIntegerField(_('حجم دریافت شده'), default=0)
+    status = models.CharField(_('وضعیت'), choices=Statuses.choices, default=Statuses.uploading, max_length=9)
+    created_at = models.DateTimeField(_('زمان ساخت'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('آخرین تغییر'), auto_now=True)
+
+    class Meta:
+        verbose_name = 'آپلود تکه ای'
+        verbose_name_plural = 'آپلود های تکه ای'
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='chunked_upload_cleanup'),
+        ]
+
+    def __str__(self):
+        return f'{self.filename} : {self.offset}/{self.size}'
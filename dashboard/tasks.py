@@ -0,0 +1,16 @@
+import logging
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from taskqueue.queue import task
+
+
+logger = logging.getLogger(__name__)
+
+
+@task(every=timedelta(hours=1))
+def cleanup_uploads():
+    """Delete abandoned chunked uploads with the cleanup_uploads command, its report goes to the log."""
+    output = StringIO()
+    call_command('cleanup_uploads', stdout=output)
+    logger.info(output.getvalue().strip())
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from academy.models import Course, Lesson
+from academy.tests.tests_views import BaseTestCase
+from dashboard.models import ChunkedUpload
+from dashboard.uploads import part_path
+from user.models import User
+
+
+class TestChunkedUpload(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = tempfile.mkdtemp()
+        self.override = override_settings(
+            MEDIA_ROOT = os.path.join(self.root, 'media'), CHUNKED_UPLOAD_DIR = os.path.join(self.root, 'uploads'), CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 1024,
+        )
+        self.override.enable()
+        self.course = Course.objects.create(name = 'c', description = 'd', teacher = self.user, thumbnail = 'c.png', time = '01:00:00')
+        self.lesson = Lesson.objects.create(title = 'l', description = 'd', file = 'old.mp4', teacher = self.user)
+        self.content = os.urandom(2500)
+        self.login()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.root)
+
+    def start(self, target='lesson', target_id=None, checksum=None):
+        return self.client.post(reverse('dashboard:upload-start'), {
+            'target': target,
+            'target_id': target_id or self.lesson.pk,
+            'filename': 'video.mp4',
+            'size': len(self.content),
+            'checksum': checksum or hashlib.sha256(self.content).hexdigest(),
+        })
+
+    def put(self, upload_id, offset, data, checksum=None):
+        headers = {'HTTP_UPLOAD_OFFSET': str(offset)}
+        if checksum:
+            headers['HTTP_UPLOAD_CHECKSUM'] = checksum
+        return self.client.put(reverse('dashboard:upload', args=[upload_id]), data, content_type = 'application/octet-stream', **headers)
+
+    def finalize(self, upload_id):
+        return self.client.post(reverse('dashboard:upload-finalize', args=[upload_id]))
+
+    def test_upload_lesson(self):
+        res = self.start()
+        self.assertEqual(res.status_code, 201)
+        upload_id = res.json()['id']
+        for offset in range(0, len(self.content), 1000):
+            chunk = self.content[offset:offset + 1000]
+            res = self.put(upload_id, offset, chunk, hashlib.sha256(chunk).hexdigest())
+            self.assertEqual(res.json()['offset'], offset + len(chunk))
+        self.assertEqual(self.finalize(upload_id).json()['status'], 'complete')
+        # repeating finalize is harmless
+        self.assertEqual(self.finalize(upload_id).status_code, 200)
+
+        self.lesson.refresh_from_db()
+        self.assertTrue(self.lesson.file.name.startswith('courses/lessons/files/video'))
+        with self.lesson.file.open('rb') as file:
+            self.assertEqual(file.read(), self.content)
+        self.assertFalse(os.path.exists(part_path(ChunkedUpload.objects.get())))
+
+    def test_resume(self):
+        upload_id = self.start('trailer', self.course.pk).json()['id']
+        self.put(upload_id, 0, self.content[:1000])
+        # a retried or stale chunk gets the offset to continue from
+        res = self.put(upload_id, 0, self.content[:1000])
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual(res.json()['offset'], 1000)
+        # bytes of an interrupted request are dropped
+        with open(part_path(ChunkedUpload.objects.get()), 'ab') as part:
+            part.write(b'garbage')
+        self.assertEqual(self.client.get(reverse('dashboard:upload', args=[upload_id])).json()['offset'], 1000)
+
+        self.assertEqual(self.put(upload_id, 1000, self.content[1000:2000], 'bad').status_code, 400)
+        self.assertEqual(self.finalize(upload_id).status_code, 409)
+        self.put(upload_id, 1000, self.content[1000:2000])
+        self.put(upload_id, 2000, self.content[2000:])
+        self.assertEqual(self.finalize(upload_id).status_code, 200)
+        self.course.refresh_from_db()
+        with self.course.trailer.open('rb') as file:
+            self.assertEqual(file.read(), self.content)
+
+    def test_rejected(self):
+        self.assertEqual(self.put(self.start().json()['id'], 0, b'x' * 1025).status_code, 413)
+        other = User.objects.create(username='user2', email='user2@gmail.com', phone_number='09123456788')
+        lesson = Lesson.objects.create(title = 'l', description = 'd', file = 'old.mp4', teacher = other)
+        self.assertEqual(self.start(target_id = lesson.pk).status_code, 404)
+
+        upload_id = self.start(checksum = '0' * 64).json()['id']
+        for offset in range(0, len(self.content), 1000):
+            self.put(upload_id, offset, self.content[offset:offset + 1000])
+        res = self.finalize(upload_id)
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.json()['status'], 'failed')
+        self.lesson.refresh_from_db()
+        self.assertEqual(self.lesson.file.name, 'old.mp4')
+
+    def test_cleanup(self):
+        abandoned = self.start().json()['id']
+        active = self.start().json()['id']
+        ChunkedUpload.objects.filter(pk = abandoned).update(updated_at = timezone.now() - timedelta(days=2))
+        stray = os.path.join(self.root, 'uploads', 'stray.part')
+        open(stray, 'wb').close()
+        os.utime(stray, (0, 0))
+
+        out = StringIO()
+        call_command('cleanup_uploads', stdout = out)
+        self.assertIn('Deleted 1 uploads and 2 part files.', out.getvalue())
+        self.assertEqual([str(pk) for pk in ChunkedUpload.objects.values_list('pk', flat=True)], [active])
+        self.assertEqual(os.listdir(os.path.join(self.root, 'uploads')), [f'{active}.part'])
@@ -0,0 +1,159 @@
+"""
+Chunked, resumable uploads of lesson files and course trailers.
+
+init creates a ChunkedUpload and an empty part file, every chunk is streamed from
+the request to the part file at the expected offset, finalize moves the part file
+into the storage of the target field. Clients send the sha256 of each chunk, of the
+whole file or both; browsers can not hash a file of several gigabytes at once.
+"""
+import fcntl
+import hashlib
+import os
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from academy.models import Course, Lesson
+from .models import ChunkedUpload
+
+
+READ_SIZE = 64 * 1024
+
+# target -> (model, file field)
+TARGETS = {
+    ChunkedUpload.Targets.lesson: (Lesson, 'file'),
+    ChunkedUpload.Targets.trailer: (Course, 'trailer'),
+}
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, upload=None):
+        super().__init__(message)
+        self.status = status
+        self.upload = upload
+
+
+class PartFile(File):
+    """FileSystemStorage moves files with a temporary path instead of copying them."""
+    def temporary_file_path(self):
+        return self.name
+
+
+def part_path(upload):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{upload.pk}.part')
+
+
+def get_target(user, target, target_id):
+    """The lesson or course the user may upload to, None when it is not theirs."""
+    model, field_name = TARGETS[target]
+    return model.objects.filter(pk = target_id, teacher = user).first(), field_name
+
+
+@contextmanager
+def locked_part(upload):
+    """
+    The part file, locked so two requests of the same upload never interleave,
+    with the upload refreshed after the lock is taken.
+    """
+    try:
+        part = open(part_path(upload), 'r+b')
+    except FileNotFoundError:
+        raise UploadError('Upload expired.', status=410, upload=upload)
+    with part:
+        try:
+            fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError('Another request of this upload is running.', status=409, upload=upload)
+        upload.refresh_from_db()
+        yield part
+
+
+def start_upload(user, target, target_id, filename, size, checksum=''):
+    instance, field_name = get_target(user, target, target_id)
+    if instance is None:
+        raise UploadError('Target not found.', status=404)
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    upload = ChunkedUpload.objects.create(
+        user = user, target = target, target_id = target_id, filename = os.path.basename(filename), size = size, checksum = (checksum or '').lower(),
+    )
+    open(part_path(upload), 'wb').close()
+    return upload
+
+
+def write_chunk(upload, offset, stream, length, checksum=None):
+    """
+    Append `length` bytes of `stream` at `offset`, which must be the committed offset,
+    and check them against `checksum`, a sha256 hex digest, when it is given.
+    """
+    if length <= 0 or length > settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+        raise UploadError('Invalid chunk size.', status=413 if length > 0 else 400, upload=upload)
+    with locked_part(upload) as part:
+        if upload.status != ChunkedUpload.Statuses.uploading:
+            raise UploadError('Upload is not in progress.', status=409, upload=upload)
+        if offset != upload.offset:
+            raise UploadError('Offset does not match.', status=409, upload=upload)
+        if offset + length > upload.size:
+            raise UploadError('Chunk is past the end of the file.', status=400, upload=upload)
+
+        # bytes past the committed offset were left by an interrupted request
+        part.truncate(offset)
+        part.seek(offset)
+        digest = hashlib.sha256()
+        remaining = length
+        while remaining:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                part.truncate(offset)
+                raise UploadError('Chunk is shorter than its Content-Length.', status=400, upload=upload)
+            part.write(data)
+            digest.update(data)
+            remaining -= len(data)
+        if checksum and digest.hexdigest() != checksum.lower():
+            part.truncate(offset)
+            raise UploadError('Chunk checksum does not match.', status=400, upload=upload)
+        part.flush()
+        os.fsync(part.fileno())
+        upload.offset = offset + length
+        upload.save(update_fields=['offset', 'updated_at'])
+    return upload
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def finalize_upload(upload):
+    """Verify the whole file and attach it to the lesson or course, a repeated call is a no-op."""
+    if upload.status == ChunkedUpload.Statuses.complete:
+        return upload
+    with locked_part(upload) as part:
+        if upload.status != ChunkedUpload.Statuses.uploading:
+            raise UploadError('Upload is not in progress.', status=409, upload=upload)
+        if upload.offset != upload.size:
+            raise UploadError('Upload is not complete.', status=409, upload=upload)
+        instance, field_name = get_target(upload.user, upload.target, upload.target_id)
+        if instance is None:
+            raise UploadError('Target not found.', status=404, upload=upload)
+
+        path = part_path(upload)
+        if upload.checksum and file_checksum(path) != upload.checksum:
+            upload.status = ChunkedUpload.Statuses.failed
+            upload.save(update_fields=['status', 'updated_at'])
+            os.remove(path)
+            raise UploadError('Checksum does not match.', status=400, upload=upload)
+
+        field = instance._meta.get_field(field_name)
+        name = field.storage.save(field.generate_filename(instance, upload.filename), PartFile(part, path))
+        if os.path.exists(path):
+            # storages that copy instead of moving
+            os.remove(path)
+        with transaction.atomic():
+            setattr(instance, field.attname, name)
+            instance.save(update_fields=[field.attname])
+            upload.status = ChunkedUpload.Statuses.complete
+            upload.save(update_fields=['status', 'updated_at'])
+    return upload
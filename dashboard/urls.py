@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import (ProfileView, ChangePasswordView, CourseAddView, CourseUpdateView, CourseDeleteView, MyCourseView, MyCourseNotPublishedView,
-                    MyBookmarkListView)
+                    MyBookmarkListView, ChunkedUploadStartView, ChunkedUploadView, ChunkedUploadFinalizeView)
 
 app_name = 'dashboard'
 urlpatterns = [
@@ -12,5 +12,8 @@ urlpatterns = [
     path('my-course/', MyCourseView.as_view(), name='my-courses'),
     path('my-course/pending/', MyCourseNotPublishedView.as_view(), name='my-courses-not-published'),
     path('my-bookmarks/', MyBookmarkListView.as_view(), name='my-bookmark-list'),
+    path('uploads/', ChunkedUploadStartView.as_view(), name='upload-start'),
+    path('uploads/<uuid:pk>/', ChunkedUploadView.as_view(), name='upload'),
+    path('uploads/<uuid:pk>/finalize/', ChunkedUploadFinalizeView.as_view(), name='upload-finalize'),
 
 ]
@@ -1,15 +1,19 @@
-from django.views.generic import UpdateView, FormView, CreateView, DeleteView, ListView
+from django.views.generic import UpdateView, FormView, CreateView, DeleteView, ListView, View
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy, reverse
 from django.shortcuts import redirect
 from django.contrib import messages
-from .forms import UserProfileForm, PasswordChangeForm
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from .forms import ChunkedUploadForm, UserProfileForm, PasswordChangeForm
+from .models import ChunkedUpload
+from .uploads import UploadError, finalize_upload, start_upload, write_chunk
 from academy.forms import CourseForm, SeasionFormSet
+from academy.pagination import CursorPaginationMixin
 from user.models import Profile
-from academy.models import Bookmark, Course, Seasion
-from cart.models import Cart
-from cart.utils import get_cart
-from django.db.models import Count
+from academy.media_jobs import job_states
+from academy.models import Bookmark, Course, Lesson, Seasion
+from myacademy.replicas import ReadReplicaMixin
 
 
 class ProfileView(LoginRequiredMixin, UpdateView):
@@ -21,10 +25,6 @@ class ProfileView(LoginRequiredMixin, UpdateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['current_page'] = 'profile'
-
-        cart, total_price, cart_courses = get_cart(self.request.user)
-        context['cart_courses'] = cart_courses
-        context['total_price'] = total_price
         return context
 
     def get_object(self):
@@ -49,10 +49,6 @@ class ChangePasswordView(LoginRequiredMixin, FormView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['current_page'] = 'profile'
-
-        cart, total_price, cart_courses = get_cart(self.request.user)
-        context['cart_courses'] = cart_courses
-        context['total_price'] = total_price
         return context
 
     def get_form_kwargs(self):
@@ -83,10 +79,6 @@ class CourseAddView(CreateView):
         context = super().get_context_data(**kwargs)
         context['current_page'] = 'course-add'
         context['seasion_formset'] = SeasionFormSet(self.request.POST) if self.request.method == 'POST' else SeasionFormSet()
-        
-        cart, total_price, cart_courses = get_cart(self.request.user)
-        context['cart_courses'] = cart_courses
-        context['total_price'] = total_price
         return context
 
     def form_valid(self, form):
@@ -124,10 +116,7 @@ class CourseUpdateView(UpdateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['current_page'] = 'course-update'
-
-        cart, total_price, cart_courses = get_cart(self.request.user)
-        context['cart_courses'] = cart_courses
-        context['total_price'] = total_price
+        context['lessons'] = job_states(list(Lesson.objects.filter(seasion__course = self.object).distinct()))
         return context
 
     def get_success_url(self):
@@ -157,7 +146,7 @@ class CourseDeleteView(DeleteView):
         return Course.objects.filter(teacher = self.request.user)
 
 
-class MyCourseView(ListView):
+class MyCourseView(ReadReplicaMixin, CursorPaginationMixin, ListView):
     template_name = 'dashboard/my-courses.html'
     paginate_by = 9
 
@@ -169,7 +158,7 @@ class MyCourseView(ListView):
         return super().dispatch(request, *args, **kwargs)
 
     def get_queryset(self):
-        return Course.objects.filter(teacher = self.request.user, is_active = True).prefetch_related('seasions', 'related_course').annotate(lessons_count = Count('seasions__lessons')).order_by('name')
+        return Course.objects.filter(teacher = self.request.user, is_active = True).prefetch_related('category')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -178,15 +167,10 @@ class MyCourseView(ListView):
         context['active_tab'] = 'published'
         context['active_courses'] = Course.objects.filter(teacher = self.request.user, is_active = True).count()
         context['inactive_courses'] = Course.objects.filter(teacher = self.request.user, is_active = False).count()
-        context['all_bookmarks'] = [course.media_id for course in Bookmark.objects.filter(user = self.request.user)]
-
-        cart, total_price, cart_courses = get_cart(self.request.user)
-        context['cart_courses'] = cart_courses
-        context['total_price'] = total_price
         return context
 
 
-class MyCourseNotPublishedView(ListView):
+class MyCourseNotPublishedView(ReadReplicaMixin, CursorPaginationMixin, ListView):
     template_name = 'dashboard/my-courses.html'
     paginate_by = 9
 
@@ -198,7 +182,7 @@ class MyCourseNotPublishedView(ListView):
         return super().dispatch(request, *args, **kwargs)
 
     def get_queryset(self):
-        return Course.objects.filter(teacher = self.request.user, is_active = False).prefetch_related('seasions', 'related_course').annotate(lessons_count = Count('seasions__lessons')).order_by('name')
+        return Course.objects.filter(teacher = self.request.user, is_active = False).prefetch_related('category')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -207,25 +191,70 @@ class MyCourseNotPublishedView(ListView):
         context['active_tab'] = 'not-published'
         context['active_courses'] = Course.objects.filter(teacher = self.request.user, is_active = True).count()
         context['inactive_courses'] = Course.objects.filter(teacher = self.request.user, is_active = False).count()
-
-        cart, total_price, cart_courses = get_cart(self.request.user)
-        context['cart_courses'] = cart_courses
-        context['total_price'] = total_price
         return context
 
 
-class MyBookmarkListView(LoginRequiredMixin, ListView):
+class MyBookmarkListView(LoginRequiredMixin, ReadReplicaMixin, CursorPaginationMixin, ListView):
     template_name = 'dashboard/my-bookmark.html'
     paginate_by = 9
+    cursor_ordering = ('id',)
 
     def get_queryset(self):
-        return Bookmark.objects.filter(user = self.request.user)
+        return Bookmark.objects.filter(user = self.request.user).prefetch_media()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['current_page'] = 'my_bookmarked_courses'
-
-        cart, total_price, cart_courses = get_cart(self.request.user)
-        context['cart_courses'] = cart_courses
-        context['total_price'] = total_price
         return context
+
+
+def upload_state(upload):
+    return {'id': str(upload.pk), 'offset': upload.offset, 'size': upload.size, 'status': upload.status}
+
+
+class ChunkedUploadMixin:
+    """JSON api of chunked uploads, for mentors uploading to their own lessons and courses."""
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated or not (request.user.is_mentor or request.user.is_superuser):
+            return JsonResponse({'error': 'Forbidden.'}, status=403)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except UploadError as ex:
+            data = upload_state(ex.upload) if ex.upload is not None else {}
+            return JsonResponse({**data, 'error': str(ex)}, status=ex.status)
+
+    def get_upload(self, pk):
+        return get_object_or_404(ChunkedUpload, pk = pk, user = self.request.user)
+
+
+class ChunkedUploadStartView(ChunkedUploadMixin, View):
+    def post(self, request, *args, **kwargs):
+        form = ChunkedUploadForm(request.POST)
+        if not form.is_valid():
+            return JsonResponse({'error': form.errors}, status=400)
+        upload = start_upload(request.user, **form.cleaned_data)
+        return JsonResponse(upload_state(upload), status=201)
+
+
+class ChunkedUploadView(ChunkedUploadMixin, View):
+    """
+    GET tells a resuming client the committed offset, PUT appends the body at Upload-Offset,
+    checked against the sha256 hex digest in Upload-Checksum when it is sent.
+    """
+    def get(self, request, pk, *args, **kwargs):
+        return JsonResponse(upload_state(self.get_upload(pk)))
+
+    def put(self, request, pk, *args, **kwargs):
+        upload = self.get_upload(pk)
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers['Content-Length'])
+        except (KeyError, ValueError):
+            raise UploadError('Upload-Offset and Content-Length headers are required.', upload=upload)
+        # request.read() streams the body, it is never loaded into memory as a whole
+        return JsonResponse(upload_state(write_chunk(upload, offset, request, length, request.headers.get('Upload-Checksum'))))
+
+
+class ChunkedUploadFinalizeView(ChunkedUploadMixin, View):
+    def post(self, request, pk, *args, **kwargs):
+        return JsonResponse(upload_state(finalize_upload(self.get_upload(pk))))
@@ -0,0 +1,208 @@
+"""
+Serving of MEDIA_ROOT with byte ranges and conditional GET, so videos can seek.
+
+With MEDIA_SERVE_OFFLOAD set the view only checks the request and hands the file to
+the web server with X-Accel-Redirect (nginx) or X-Sendfile (apache, lighttpd).
+Files under MEDIA_SIGNED_PATHS need a URL from sign_media_url(), checked without the database.
+HLS playlists and thumbnails tracks there are rewritten so every file they list has a signed URL.
+"""
+import hashlib
+import hmac
+import mimetypes
+import os
+import posixpath
+import re
+import time
+from functools import lru_cache
+from stat import S_ISREG
+from urllib.parse import quote, urlencode
+from django.conf import settings
+from django.core.exceptions import PermissionDenied, SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """Read only `length` bytes of `file` from `start`."""
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(start, end) of a single byte range, None to serve everything, False when unsatisfiable."""
+    match = RANGE.match(header.strip())
+    if match is None:
+        # several ranges or other units, a full response is allowed
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # suffix range, the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def range_applies(request, etag, mtime):
+    """If-Range only allows the range while the file is the one the client has."""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and date >= int(mtime)
+
+
+@lru_cache
+def signing_key(secret_key):
+    return hashlib.sha256(f'myacademy.media{secret_key}'.encode()).digest()
+
+
+def media_signature(path, expires):
+    message = f'{path}:{expires}'.encode()
+    return hmac.new(signing_key(settings.SECRET_KEY), message, hashlib.sha256).hexdigest()[:32]
+
+
+def url_expiry(now=None):
+    """
+    Expiry shared by every URL signed in the same MEDIA_URL_TTL window, so pages keep
+    the same URLs for a while and browsers can cache the files. Valid for TTL to 2 TTL.
+    """
+    ttl = settings.MEDIA_URL_TTL
+    return (int(now or time.time()) // ttl + 2) * ttl
+
+
+def sign_media_url(path, expires=None):
+    """URL of a file under MEDIA_ROOT that serve_media accepts until `expires`."""
+    expires = expires or url_expiry()
+    query = urlencode({'expires': expires, 'signature': media_signature(path, expires)})
+    return f'{settings.MEDIA_URL}{quote(path)}?{query}'
+
+
+def needs_signature(path):
+    return any(path.startswith(prefix) for prefix in settings.MEDIA_SIGNED_PATHS)
+
+
+def check_signature(request, path):
+    try:
+        expires = int(request.GET.get('expires', ''))
+    except ValueError:
+        raise PermissionDenied
+    signature = request.GET.get('signature', '')
+    if expires < time.time() or not hmac.compare_digest(signature, media_signature(path, expires)):
+        raise PermissionDenied
+
+
+def sign_playlist(request, path, fullpath):
+    """An HLS playlist with its relative URIs signed until the expiry of the request."""
+    expires = int(request.GET['expires'])
+    directory = posixpath.dirname(path)
+    with open(fullpath, encoding='utf-8') as file:
+        lines = [
+            sign_media_url(posixpath.normpath(posixpath.join(directory, line)), expires) if line and not line.startswith('#') and '://' not in line else line
+            for line in file.read().splitlines()
+        ]
+    return HttpResponse('\n'.join(lines) + '\n', content_type='application/vnd.apple.mpegurl', headers={'Cache-Control': 'private'})
+
+
+def sign_thumbnails(request, path, fullpath):
+    """A WebVTT thumbnails track with the sprite sheets of its cues signed, like sign_playlist."""
+    expires = int(request.GET['expires'])
+    directory = posixpath.dirname(path)
+    lines = []
+    with open(fullpath, encoding='utf-8') as file:
+        for line in file.read().splitlines():
+            if line and line != 'WEBVTT' and '-->' not in line and '://' not in line:
+                name, _, fragment = line.partition('#')
+                line = sign_media_url(posixpath.normpath(posixpath.join(directory, name)), expires) + (f'#{fragment}' if fragment else '')
+            lines.append(line)
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/vtt; charset=utf-8', headers={'Cache-Control': 'private'})
+
+
+def file_path(path):
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404()
+    return path, fullpath
+
+
+@require_safe
+def serve_media(request, path):
+    path, fullpath = file_path(path)
+    if needs_signature(path):
+        check_signature(request, path)
+    try:
+        stat = os.stat(fullpath)
+    except OSError:
+        raise Http404()
+    if not S_ISREG(stat.st_mode):
+        raise Http404()
+    if needs_signature(path) and path.endswith('.m3u8'):
+        return sign_playlist(request, path, fullpath)
+    if needs_signature(path) and path.endswith('.vtt'):
+        return sign_thumbnails(request, path, fullpath)
+
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    conditional = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if conditional is not None:
+        return conditional
+
+    # no Content-Encoding, browsers would decompress downloads of archives
+    content_type = mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+    headers = {'ETag': etag, 'Last-Modified': http_date(stat.st_mtime), 'Accept-Ranges': 'bytes'}
+    if needs_signature(path):
+        # shared caches must not hand paid files to others
+        headers['Cache-Control'] = 'private'
+
+    offload = settings.MEDIA_SERVE_OFFLOAD
+    if offload:
+        # the web server answers ranges and sends the bytes, the worker is free right away
+        response = HttpResponse(content_type=content_type, headers=headers)
+        if offload == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_REDIRECT_PREFIX + path)
+        else:
+            response['X-Sendfile'] = fullpath
+        return response
+
+    start, end = 0, stat.st_size - 1
+    status = 200
+    if 'Range' in request.headers and range_applies(request, etag, stat.st_mtime):
+        byte_range = parse_range(request.headers['Range'], stat.st_size)
+        if byte_range is False:
+            return HttpResponse(status=416, headers={'Content-Range': f'bytes */{stat.st_size}'})
+        if byte_range is not None:
+            start, end = byte_range
+            status = 206
+            headers['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    headers['Content-Length'] = end - start + 1
+
+    if request.method == 'HEAD':
+        return HttpResponse(status=status, content_type=content_type, headers=headers)
+    response = FileResponse(FileRange(open(fullpath, 'rb'), start, end - start + 1), status=status, content_type=content_type, headers=headers)
+    response.block_size = settings.MEDIA_SERVE_CHUNK_SIZE
+    return response
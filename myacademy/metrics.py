@@ -0,0 +1,306 @@
+"""
+In-process metrics, exposed in the Prometheus text format at /metrics.
+
+Every thread counts into its own dict, so recording a value never takes a lock.
+With METRICS_MULTIPROCESS_DIR set every worker process also writes its totals
+to a file there, and /metrics adds up the files of all workers.
+"""
+import atexit
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db import connections
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from .replicas import primary_reads
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+MISSING = object()
+
+
+def merge_values(target, values):
+    for key, value in values.items():
+        if isinstance(value, list):
+            current = target.get(key)
+            if current is None:
+                target[key] = list(value)
+            else:
+                for index, count in enumerate(value):
+                    current[index] += count
+        else:
+            target[key] = target.get(key, 0) + value
+
+
+class Registry:
+    """
+    Values are keyed by (metric name, label values). Counters hold a number, histograms
+    a list of per bucket counts followed by the sum of the observed values.
+    """
+    def __init__(self):
+        self.metrics = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = {}
+        self._last_maintenance = time.monotonic()
+        self._pid = None
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'Metric {metric.name} is already registered.')
+        self.metrics[metric.name] = metric
+
+    def shard(self):
+        """The dict of the current thread, only that thread writes to it."""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), values))
+            return values
+
+    def local_values(self):
+        """Totals of this process."""
+        with self._lock:
+            shards = []
+            for thread, values in self._shards:
+                if thread.is_alive():
+                    shards.append((thread, values))
+                else:
+                    # runserver starts a thread per request, keep one dict for all finished threads
+                    merge_values(self._retired, values)
+            self._shards = shards
+            totals = {}
+            merge_values(totals, self._retired)
+            for thread, values in shards:
+                # dict.copy() does not let the owning thread in, so a resize can not break the loop
+                merge_values(totals, values.copy())
+        return totals
+
+    def path(self, pid=None):
+        return os.path.join(settings.METRICS_MULTIPROCESS_DIR, f'metrics-{pid or os.getpid()}.json')
+
+    def flush(self):
+        """Write the totals of this process to its file in METRICS_MULTIPROCESS_DIR."""
+        path = self.path()
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            if os.path.exists(path):
+                # left by a finished process with the same pid, its totals still count
+                os.replace(path, self.path(f'{self._pid}-{time.time_ns()}'))
+            atexit.register(self.flush_at_exit)
+        rows = [[name, list(labels), value] for (name, labels), value in self.local_values().items()]
+        fd, temp_path = tempfile.mkstemp(dir=settings.METRICS_MULTIPROCESS_DIR, prefix='.metrics-')
+        with os.fdopen(fd, 'w') as file:
+            json.dump(rows, file)
+        os.replace(temp_path, path)
+
+    def flush_at_exit(self):
+        if settings.METRICS_MULTIPROCESS_DIR and os.path.isdir(settings.METRICS_MULTIPROCESS_DIR):
+            self.flush()
+
+    def maintain(self):
+        """Called after every request, flushes at most once per METRICS_FLUSH_INTERVAL."""
+        now = time.monotonic()
+        if now - self._last_maintenance < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self._last_maintenance = now
+        if settings.METRICS_MULTIPROCESS_DIR:
+            self.flush()
+        else:
+            self.local_values()
+
+    def collect(self):
+        """Totals of this process, plus the files of the other processes in multiprocess mode."""
+        values = self.local_values()
+        if settings.METRICS_MULTIPROCESS_DIR:
+            own = self.path()
+            for path in glob.glob(os.path.join(settings.METRICS_MULTIPROCESS_DIR, 'metrics-*.json')):
+                if path == own:
+                    continue
+                try:
+                    with open(path) as file:
+                        rows = json.load(file)
+                except (OSError, ValueError):
+                    continue
+                merge_values(values, {(name, tuple(labels)): value for name, labels, value in rows})
+        return values
+
+    def expose(self):
+        samples = {}
+        for (name, labels), value in self.collect().items():
+            samples.setdefault(name, []).append((labels, value))
+        lines = []
+        for metric in self.metrics.values():
+            lines += metric.expose(sorted(samples.get(metric.name, [])))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def escape(value):
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry
+        registry.register(self)
+
+    def key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects the labels {", ".join(self.labelnames)}.')
+        return (self.name, tuple(str(labels[name]) for name in self.labelnames))
+
+    def expose(self, samples):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        values = self.registry.shard()
+        key = self.key(labels)
+        values[key] = values.get(key, 0) + amount
+
+    def expose(self, samples):
+        lines = super().expose(samples)
+        if not samples and not self.labelnames:
+            samples = [((), 0)]
+        for labels, value in samples:
+            lines.append(f'{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}')
+        return lines
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        values = self.registry.shard()
+        key = self.key(labels)
+        counts = values.get(key)
+        if counts is None:
+            # one slot per bucket, one for +Inf and the sum
+            counts = values[key] = [0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def expose(self, samples):
+        lines = super().expose(samples)
+        for labels, counts in samples:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else format_value(bound)
+                lines.append(f'{self.name}_bucket{format_labels(self.labelnames, labels, [("le", le)])} {format_value(cumulative)}')
+            lines.append(f'{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(counts[-1])}')
+            lines.append(f'{self.name}_count{format_labels(self.labelnames, labels)} {format_value(cumulative)}')
+        return lines
+
+
+HTTP_REQUESTS = Counter('myacademy_http_requests_total', 'Requests by view, method and status.', ['view', 'method', 'status'])
+HTTP_REQUEST_DURATION = Histogram('myacademy_http_request_duration_seconds', 'Request latency by view.', ['view'])
+DB_QUERIES = Histogram(
+    'myacademy_db_queries_per_request', 'Database queries of a request by view.', ['view'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100),
+)
+CACHE_REQUESTS = Counter('myacademy_cache_requests_total', 'Cache lookups by namespace and result.', ['namespace', 'result'])
+CART_ITEMS_ADDED = Counter('myacademy_cart_items_added_total', 'Items added to carts.', ['content_type'])
+ORDERS = Counter('myacademy_orders_total', 'Orders by the status they reached.', ['status'])
+OTP_SENT = Counter('myacademy_otp_sent_total', 'One time codes sent by type.', ['code_type'])
+OTP_RATE_LIMITED = Counter('myacademy_otp_rate_limited_total', 'One time code requests rejected by a rate limit.', ['action', 'scope'])
+SMS_MESSAGES = Counter('myacademy_sms_messages_total', 'Text messages by the status a delivery left them in.', ['status'])
+SMS_PROVIDER_DURATION = Histogram('myacademy_sms_provider_duration_seconds', 'SMS backend call time, a call per batch.', ['backend'])
+TASKS = Counter('myacademy_tasks_total', 'Background tasks run, by outcome.', ['task', 'status'])
+TASK_DURATION = Histogram('myacademy_task_duration_seconds', 'Background task run time.', ['task'])
+
+
+def cache_get_or_set(namespace, key, default, timeout=None):
+    """
+    cache.get_or_set() that counts hits and misses of the namespace. `default` reads
+    from the primary, the value is shared by every request.
+    """
+    value = cache.get(key, MISSING)
+    if value is not MISSING:
+        CACHE_REQUESTS.inc(namespace=namespace, result='hit')
+        return value
+    CACHE_REQUESTS.inc(namespace=namespace, result='miss')
+    with primary_reads():
+        value = default()
+    cache.add(key, value, timeout)
+    return value
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryCounter()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(queries))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        # url names, not paths, keep the number of label values bounded
+        view = request.resolver_match.view_name if request.resolver_match else 'unmatched'
+        method = request.method if request.method in METHODS else 'other'
+        HTTP_REQUESTS.inc(view=view, method=method, status=response.status_code)
+        HTTP_REQUEST_DURATION.observe(duration, view=view)
+        DB_QUERIES.observe(queries.count, view=view)
+        REGISTRY.maintain()
+        return response
+
+
+def metrics_view(request):
+    """Staff users, or scrapers sending `Authorization: Bearer <METRICS_TOKEN>`."""
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    if not request.user.is_staff and not (token and constant_time_compare(authorization, f'Bearer {token}')):
+        raise PermissionDenied
+    return HttpResponse(REGISTRY.expose(), content_type=CONTENT_TYPE)
@@ -0,0 +1,151 @@
+"""
+Per request SQL and template profiling, reported as Server-Timing headers and sampled log lines.
+"""
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template
+
+
+logger = logging.getLogger('myacademy.profiling')
+
+_profile = ContextVar('profile', default=None)
+_render = Template.render
+IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+
+
+def fingerprint(sql):
+    """SQL without the length of IN lists, so the same query with other ids matches."""
+    return IN_LIST.sub('(%s, ...)', sql)
+
+
+class Profile:
+    """Queries and template time of a block, also counted in the `parent` block it is nested in."""
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.queries = Counter()
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def chain(self):
+        profile = self
+        while profile is not None:
+            yield profile
+            profile = profile.parent
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    @property
+    def duplicates(self):
+        """Queries repeated with the same fingerprint, the signature of N+1 lookups."""
+        return {sql: count for sql, count in self.queries.items() if count > 1}
+
+    @property
+    def duplicate_count(self):
+        return sum(self.duplicates.values()) - len(self.duplicates)
+
+    def execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            # installed by the outermost block, the query belongs to the innermost one
+            for profile in (_profile.get() or self).chain():
+                profile.sql_time += duration
+                profile.queries[fingerprint(sql)] += 1
+
+
+def timed_render(self, *args, **kwargs):
+    profile = _profile.get()
+    if profile is None:
+        return _render(self, *args, **kwargs)
+    # nested renders (includes, form widgets) are part of the outer one
+    profile.template_depth += 1
+    start = time.perf_counter()
+    try:
+        return _render(self, *args, **kwargs)
+    finally:
+        profile.template_depth -= 1
+        if profile.template_depth == 0:
+            duration = time.perf_counter() - start
+            for outer in profile.chain():
+                outer.template_time += duration
+
+
+# installed once, renders outside of profile_block() only pay for the ContextVar lookup
+Template.render = timed_render
+
+
+@contextmanager
+def profile_block():
+    """
+    Collect queries of every connection and template render time of the block.
+    Inside another block, like a request profiled by ServerTimingMiddleware while a
+    benchmark profiles it too, both count what the inner block does.
+    """
+    parent = _profile.get()
+    profile = Profile(parent)
+    token = _profile.set(profile)
+    try:
+        with ExitStack() as stack:
+            if parent is None:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(profile.execute))
+            yield profile
+    finally:
+        _profile.reset(token)
+
+
+class ServerTimingMiddleware:
+    """
+    Opt-in profiling. SERVER_TIMING adds Server-Timing headers to every response,
+    PROFILING_SAMPLE_RATE logs a share of requests to the myacademy.profiling logger.
+    Requests that are neither only pay for one random() call.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        headers = settings.SERVER_TIMING
+        sampled = settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE
+        if not headers and not sampled:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with profile_block() as profile:
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        if headers:
+            response['Server-Timing'] = ', '.join([
+                f'sql;dur={profile.sql_time * 1000:.1f};desc="{profile.query_count} queries"',
+                f'dup;desc="{profile.duplicate_count} duplicate queries"',
+                f'tpl;dur={profile.template_time * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ])
+        if sampled:
+            worst = max(profile.duplicates.items(), key=lambda item: item[1], default=(None, 0))
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'queries': profile.query_count,
+                'duplicate_queries': profile.duplicate_count,
+                'worst_duplicate': worst[0],
+                'worst_duplicate_count': worst[1],
+                'sql_ms': round(profile.sql_time * 1000, 2),
+                'template_ms': round(profile.template_time * 1000, 2),
+                'total_ms': round(total * 1000, 2),
+            }, ensure_ascii=False))
+        return response
@@ -0,0 +1,147 @@
+"""
+Read replicas: the REPLICA_DATABASES aliases hold copies of the default database.
+
+Only views marked with @read_replica or ReadReplicaMixin read from a replica, and only
+for GET and HEAD requests. Everything else, and every write, uses the primary. Once a
+request writes, the rest of it reads from the primary too, so it sees its own writes.
+ReplicaMiddleware then pins the browser to the primary for REPLICA_PIN_SECONDS, longer
+than replicas lag, so the next pages show the write as well.
+
+What is cached for everyone is read with primary_reads(): a lagging replica read
+right after a write would be kept under the new cache key until it expires.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.template.response import SimpleTemplateResponse
+
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+class Routing:
+    """Database routing of one request."""
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        # alias reads go to, while a read only view runs
+        self.replica = None
+
+
+_routing = ContextVar('replica_routing', default=None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None:
+            return None
+        if routing.replica is None or routing.pinned or routing.wrote:
+            return DEFAULT_DB_ALIAS
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # objects read from a replica are the rows of the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db in settings.REPLICA_DATABASES else None
+
+
+@contextmanager
+def replica_reads():
+    """Read from a replica inside the block, unless the request is pinned to the primary."""
+    routing = _routing.get()
+    token = None
+    if routing is None:
+        # outside ReplicaMiddleware
+        routing = Routing()
+        token = _routing.set(routing)
+    previous = routing.replica
+    if settings.REPLICA_DATABASES:
+        # one replica for the whole request, replicas lag differently
+        routing.replica = previous or random.choice(settings.REPLICA_DATABASES)
+    try:
+        yield routing
+    finally:
+        routing.replica = previous
+        if token is not None:
+            _routing.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary inside the block, even in a read only view."""
+    routing = _routing.get()
+    if routing is None:
+        yield
+        return
+    previous = routing.replica
+    routing.replica = None
+    try:
+        yield
+    finally:
+        routing.replica = previous
+
+
+def read_replica(view):
+    """Let a read only view read from a replica for GET and HEAD requests."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return view(request, *args, **kwargs)
+        with replica_reads():
+            response = view(request, *args, **kwargs)
+            # templates query too, render them while reads go to the replica
+            if isinstance(response, SimpleTemplateResponse):
+                response.render()
+            return response
+    return wrapper
+
+
+class ReadReplicaMixin:
+    """Class based view version of @read_replica."""
+    def dispatch(self, request, *args, **kwargs):
+        return read_replica(super().dispatch)(request, *args, **kwargs)
+
+
+class ReplicaMiddleware:
+    """Tracks the writes of every request and pins browsers that wrote to the primary."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routing = Routing(pinned = settings.REPLICA_PIN_COOKIE in request.COOKIES)
+        token = _routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if routing.wrote and settings.REPLICA_DATABASES:
+            response.set_cookie(settings.REPLICA_PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax')
+        return response
+
+
+def sync_replicas(aliases=None):
+    """
+    Copy the primary into SQLite replicas with the backup API. Replicas of a local
+    setup and of tests are kept in sync with it, in production the database does it.
+    """
+    source = connections[DEFAULT_DB_ALIAS]
+    source.ensure_connection()
+    for alias in aliases or settings.REPLICA_DATABASES:
+        target = connections[alias]
+        target.ensure_connection()
+        source.connection.backup(target.connection)
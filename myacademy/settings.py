@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+from myacademy.sqlite import database_settings
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -24,15 +25,20 @@ INSTALLED_APPS = [
     'academy',
     'dashboard',
     'cart',
+    'taskqueue',
     'django_recaptcha',
 ]
 
 MIDDLEWARE = [
+    'myacademy.profiling.ServerTimingMiddleware',
+    'myacademy.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'myacademy.replicas.ReplicaMiddleware',
+    'cart.middleware.CommerceMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -50,6 +56,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'cart.context_processors.commerce',
             ],
         },
     },
@@ -58,11 +65,43 @@ TEMPLATES = [
 WSGI_APPLICATION = 'myacademy.wsgi.application'
 
 
+# DATABASE_PROFILE=production tunes SQLite for several worker processes, see myacademy.sqlite
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'development')
 DATABASES = {
+    'default': database_settings(
+        os.environ.get('DATABASE_PATH', BASE_DIR / 'db.sqlite3'),
+        DATABASE_PROFILE,
+        int(os.environ['DATABASE_CONN_MAX_AGE']) if 'DATABASE_CONN_MAX_AGE' in os.environ else None,
+    ),
+}
+# Read replicas, copies of the primary kept in sync outside django, as DATABASE_REPLICAS=path,path.
+# Read only views read from them, see myacademy.replicas; sync_replicas copies SQLite files locally.
+# Run tests without it, academy.tests.tests_replicas sets up a replica of its own
+REPLICA_DATABASES = []
+for index, path in enumerate(filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{index}'] = {**database_settings(path, DATABASE_PROFILE), 'TEST': {'MIRROR': 'default'}}
+    REPLICA_DATABASES.append(f'replica{index}')
+DATABASE_ROUTERS = ['myacademy.replicas.ReplicaRouter']
+# seconds a browser reads from the primary after it wrote, longer than replicas lag
+REPLICA_PIN_SECONDS = 10
+REPLICA_PIN_COOKIE = 'pin_primary'
+
+
+# Use a cache shared between processes (memcached, redis, ...) when running several workers
+# so that signal driven invalidation reaches all of them.
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # shared by every process whatever 'default' is: a Redis server at SHARED_CACHE_URL,
+    # or a table of the default database, created by migrate
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['SHARED_CACHE_URL'],
+    } if os.environ.get('SHARED_CACHE_URL') else {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'shared_cache',
+    },
 }
 
 
@@ -115,7 +154,115 @@ STATICFILES_DIRS = [
 ]
 MEDIA_URL = 'media/'
 MEDIA_ROOT = 'media'
+# Media is served by myacademy.media.serve_media with Range and conditional GET support.
+# In production let the web server send the bytes: 'x-accel-redirect' for nginx with an
+# internal location at MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT, or 'x-sendfile'
+MEDIA_SERVE_OFFLOAD = os.environ.get('MEDIA_SERVE_OFFLOAD')
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+MEDIA_SERVE_CHUNK_SIZE = 256 * 1024
+# Files under these paths are only served with a URL signed by myacademy.media.sign_media_url,
+# valid for MEDIA_URL_TTL to twice that many seconds
+MEDIA_SIGNED_PATHS = ['courses/lessons/']
+MEDIA_URL_TTL = 60 * 60 * 3
+# Chunked uploads of lesson files and trailers keep their received bytes here until finalized,
+# remove abandoned ones with the cleanup_uploads command
+CHUNKED_UPLOAD_DIR = BASE_DIR / 'uploads'
+CHUNKED_UPLOAD_MAX_SIZE = 8 * 1024 ** 3
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 16 * 1024 ** 2
+# Purchased course ids of each user, invalidated by signals on orders and courses
+ENTITLEMENT_CACHE_TIMEOUT = 60 * 60 * 24
 CART_SESSION_ID = 'xdjango-cart-xdjango'
+# Carts of anonymous users stay out of the database until login,
+# use cart.storage.SessionCartStorage with a cache backed SESSION_ENGINE
+CART_ANONYMOUS_STORAGE = 'cart.storage.SignedCookieCartStorage'
+CART_COOKIE_AGE = 60 * 60 * 24 * 14
+# Course search, use 'academy.search.SimpleSearchBackend' on databases without FTS5
+SEARCH_BACKEND = 'academy.search.SQLiteFTSBackend'
+SEARCH_MAX_RESULTS = 500
+# Anonymous parts of the home page are cached and invalidated by signals
+HOME_CACHE_TIMEOUT = 60 * 60
+# Per user cart and bookmark summary, invalidated by signals on every change
+COMMERCE_CACHE_TIMEOUT = 60 * 60
+# Server-Timing headers with SQL and template timings on every response
+SERVER_TIMING = DEBUG
+# Share of requests logged to the myacademy.profiling logger, 0 disables it
+PROFILING_SAMPLE_RATE = 0.0
+# Metrics at /metrics, for staff users or with "Authorization: Bearer <METRICS_TOKEN>".
+# Every gunicorn worker writes its totals to METRICS_MULTIPROCESS_DIR, at most once per interval
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+METRICS_MULTIPROCESS_DIR = os.environ.get('METRICS_MULTIPROCESS_DIR')
+METRICS_FLUSH_INTERVAL = 5
+# WebP variants of uploaded images, rendered by a background task after the upload is committed
+IMAGE_VARIANTS_BACKGROUND = True
+IMAGE_VARIANT_QUALITY = 80
+# Lesson files are probed, segmented to HLS and get preview sprites by the process_media_jobs
+# command. academy.video.FFmpegProcessor needs ffmpeg and ffprobe on PATH, StubProcessor writes
+# placeholder outputs. Renditions are (height, video kbps), sources are never scaled up
+MEDIA_PROCESSOR = 'academy.video.FFmpegProcessor'
+MEDIA_PROCESSOR_OPTIONS = {
+    'renditions': [(360, 800), (720, 2800), (1080, 5000)],
+    'segment_seconds': 6,
+    'sprite_interval': 10,
+    'sprite_width': 160,
+    'sprite_columns': 10,
+    'sprite_rows': 10,
+    'timeout': 60 * 60 * 2,
+}
+# The lesson player streams the HLS ladder, with hls.js in browsers that do not play HLS
+# themselves. Point it at a copy under STATIC_URL to not depend on the CDN
+HLS_JS_URL = 'https://cdn.jsdelivr.net/npm/hls.js@1.5.20/dist/hls.min.js'
+MEDIA_JOB_WORKERS = 2
+# running jobs of each kind, encoding uses every core on its own
+MEDIA_JOB_CONCURRENCY = {'probe': 2, 'hls': 1, 'sprites': 1}
+MEDIA_JOB_MAX_ATTEMPTS = 3
+# seconds before the first retry, doubled on every later one
+MEDIA_JOB_RETRY_DELAY = 60
+# running jobs older than this belong to a runner that died and run again
+MEDIA_JOB_TIMEOUT = 60 * 60 * 6
+# One time codes: user.otp.CacheOTPStore, or user.otp.DatabaseOTPStore. Codes and rate
+# limits live in OTP_CACHE_ALIAS, every worker process must see the same one
+OTP_STORE = 'user.otp.CacheOTPStore'
+OTP_CACHE_ALIAS = 'shared'
+# seconds a code is valid, by purpose
+OTP_TTL = {'register': 60 * 4, 'forgot-password': 60 * 5}
+OTP_MAX_ATTEMPTS = 5
+# Proxies in front of django that append the address they got a request from to
+# X-Forwarded-For, 1 behind nginx. Rate limits count the client address they saw
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+# (requests, seconds) in a sliding window, per phone number and per IP
+OTP_RATE_LIMITS = {
+    'send-phone': (3, 60 * 60),
+    'send-ip': (10, 60 * 60),
+    'verify-phone': (10, 60 * 15),
+    'verify-ip': (30, 60 * 15),
+}
+# Text messages, sent by the deliver_sms task through SMS_BACKEND: user.sms.ConsoleBackend,
+# FileBackend writing to SMS_FILE_PATH, LocMemBackend for tests, or HTTPBackend calling
+# SMS_HTTP_URL, which the sms_stub_server command serves locally
+SMS_BACKEND = os.environ.get('SMS_BACKEND', 'user.sms.ConsoleBackend')
+SMS_FILE_PATH = BASE_DIR / 'sms'
+SMS_HTTP_URL = os.environ.get('SMS_HTTP_URL', 'http://127.0.0.1:8025/send')
+SMS_HTTP_TOKEN = os.environ.get('SMS_HTTP_TOKEN', '')
+SMS_HTTP_TIMEOUT = 10
+# messages per provider call
+SMS_HTTP_BATCH_SIZE = 50
+# seconds messages wait for others to share their provider call
+SMS_BATCH_DELAY = 1
+# messages sent by one delivery task
+SMS_DELIVERY_LIMIT = 500
+SMS_MAX_ATTEMPTS = 4
+# seconds before the first retry, doubled on every later one
+SMS_RETRY_DELAY = 30
+# Background tasks run by the run_workers command, TASKS_EAGER runs them after the commit
+# of the request instead, for development without workers
+TASKS_EAGER = False
+TASK_WORKERS = 2
+TASK_POLL_INTERVAL = 1
+# running tasks older than this belong to a worker that died and run again
+TASK_TIMEOUT = 60 * 30
+TASK_MAX_RETRY_DELAY = 60 * 60
+# finished tasks are deleted after this many seconds
+TASK_RESULT_TTL = 60 * 60 * 24 * 7
 # FIXME: Change this option to False on production
 BYPASS_SHOPPING = True
 # Default primary key field type
@@ -0,0 +1,63 @@
+"""
+SQLite configuration profiles, chosen by DATABASE_PROFILE in the environment.
+
+'development' is Django's default, fine for one runserver process. 'production' is
+for several gunicorn and task workers on one database file: WAL lets readers run
+next to the writer, writers wait for the lock instead of failing with "database is
+locked", and connections are kept between requests. No Django imports, settings use
+this module.
+"""
+PROFILES = {
+    'development': {
+        'pragmas': {},
+        'timeout': 5,
+        'conn_max_age': 0,
+        'transaction_mode': None,
+    },
+    'production': {
+        'pragmas': {
+            # readers do not block the writer nor the writer them, kept in the file
+            'journal_mode': 'WAL',
+            # fsync at checkpoints only, a power loss can lose the last commits but not corrupt
+            'synchronous': 'NORMAL',
+            'mmap_size': 256 * 1024 * 1024,
+            # negative is in KiB, 64MB per connection
+            'cache_size': -64 * 1024,
+            'temp_store': 'MEMORY',
+        },
+        # seconds a connection waits for the write lock, the busy timeout
+        'timeout': 20,
+        'conn_max_age': 600,
+        # atomic() blocks take the write lock at BEGIN. A deferred transaction that reads
+        # and then writes fails at once when another connection wrote meanwhile, without
+        # waiting for the busy timeout; outside atomic() blocks queries autocommit
+        'transaction_mode': 'IMMEDIATE',
+    },
+}
+
+
+def init_command(pragmas):
+    """The statements run on every new connection."""
+    return ';'.join(f'PRAGMA {name} = {value}' for name, value in pragmas.items())
+
+
+def database_settings(path, profile='development', conn_max_age=None):
+    """A DATABASES entry for the SQLite file at `path`."""
+    try:
+        config = PROFILES[profile]
+    except KeyError:
+        raise ValueError(f'Unknown database profile {profile!r}, use one of {", ".join(PROFILES)}.')
+    options = {'timeout': config['timeout']}
+    if config['pragmas']:
+        options['init_command'] = init_command(config['pragmas'])
+    if config['transaction_mode']:
+        options['transaction_mode'] = config['transaction_mode']
+    conn_max_age = config['conn_max_age'] if conn_max_age is None else conn_max_age
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'CONN_MAX_AGE': conn_max_age,
+        # reused connections are checked before a request uses them
+        'CONN_HEALTH_CHECKS': bool(conn_max_age),
+        'OPTIONS': options,
+    }
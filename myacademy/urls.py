@@ -14,9 +14,11 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import include, path
+import re
+from django.urls import include, path, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+from .media import serve_media
+from .metrics import metrics_view
 
 
 urlpatterns = [
@@ -25,6 +27,9 @@ urlpatterns = [
     path('', include('user.urls')),
     path('dashboard/', include('dashboard.urls')),
     path('cart/', include('cart.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+urlpatterns += [
+    re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media, name='media'),
+]
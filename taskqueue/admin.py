@@ -0,0 +1,16 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import Task
+
+
+@admin.register(Task)
+class TaskRegister(admin.ModelAdmin):
+    list_display = ['name', 'status', 'attempts', 'run_after', 'worker', 'finished_at']
+    list_filter = ['status', 'name']
+    search_fields = ['name', 'key']
+    readonly_fields = ['attempts', 'error', 'worker', 'started_at', 'finished_at']
+    actions = ['retry']
+
+    @admin.action(description='اجرای دوباره')
+    def retry(self, request, queryset):
+        queryset.exclude(status = Task.Statuses.running).update(status = Task.Statuses.queued, attempts = 0, run_after = timezone.now())
@@ -0,0 +1,51 @@
+import multiprocessing
+import signal
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from taskqueue.queue import Worker
+from taskqueue.worker import worker_main
+
+
+class Command(BaseCommand):
+    help = 'Run background tasks in worker processes, restarting the ones that exit'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='worker processes, 0 runs tasks in this process (default: TASK_WORKERS)')
+        parser.add_argument('--poll', type=float, default=None, help='seconds between looks at an empty queue (default: TASK_POLL_INTERVAL)')
+        parser.add_argument('--once', action='store_true', help='with --workers 0, exit when no task is due')
+        parser.add_argument('--no-scheduler', action='store_true', help='do not queue periodic tasks from this box')
+
+    def handle(self, *args, **options):
+        workers = settings.TASK_WORKERS if options['workers'] is None else options['workers']
+        poll = settings.TASK_POLL_INTERVAL if options['poll'] is None else options['poll']
+        scheduler = not options['no_scheduler']
+        if not workers:
+            processed = Worker(scheduler=scheduler, poll=poll).run(once=options['once'])
+            self.stdout.write(self.style.SUCCESS(f'Ran {processed} tasks.'))
+            return
+
+        # workers are spawned, they set up Django and connect on their own
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        processes = [None] * workers
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda *args: stopping.append(True))
+        signal.signal(signal.SIGINT, lambda *args: stopping.append(True))
+        while not stopping:
+            for index, process in enumerate(processes):
+                if process is None or not process.is_alive():
+                    if process is not None:
+                        self.stderr.write(f'Worker {index} exited with {process.exitcode}, restarting.')
+                    # the first worker queues periodic tasks
+                    processes[index] = context.Process(target=worker_main, args=(scheduler and index == 0, poll), name=f'task-worker-{index}')
+                    processes[index].start()
+            time.sleep(1)
+
+        # workers finish their current task
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS('Workers stopped.'))
@@ -0,0 +1,40 @@
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class Task(models.Model):
+    """
+    A call of a function registered with @task, run by the run_workers command.
+    `key` makes enqueueing idempotent, periodic tasks use one key per period.
+    """
+    class Statuses(models.TextChoices):
+        queued = 'queued', 'در صف'
+        running = 'running', 'در حال اجرا'
+        done = 'done', 'انجام شده'
+        failed = 'failed', 'ناموفق'
+
+    name = models.CharField(_('تابع'), max_length=200)
+    args = models.JSONField(_('آرگومان ها'), default=list, blank=True)
+    kwargs = models.JSONField(_('آرگومان های نام دار'), default=dict, blank=True)
+    key = models.CharField(_('کلید یکتا'), max_length=255, blank=True, null=True, unique=True)
+    status = models.CharField(_('وضعیت'), choices=Statuses.choices, default=Statuses.queued, max_length=7)
+    attempts = models.PositiveSmallIntegerField(_('تلاش ها'), default=0)
+    max_attempts = models.PositiveSmallIntegerField(_('حداکثر تلاش'), default=3)
+    error = models.TextField(_('خطا'), blank=True)
+    worker = models.CharField(_('پردازنده'), max_length=100, blank=True)
+    run_after = models.DateTimeField(_('اجرا بعد از'), default=timezone.now)
+    started_at = models.DateTimeField(_('زمان شروع'), blank=True, null=True)
+    finished_at = models.DateTimeField(_('زمان پایان'), blank=True, null=True)
+    created_at = models.DateTimeField(_('زمان ساخت'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'کار پس زمینه'
+        verbose_name_plural = 'کار های پس زمینه'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='task_queue'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} : {self.status}'
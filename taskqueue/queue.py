@@ -0,0 +1,207 @@
+"""
+Background tasks stored in the database, no broker needed.
+
+Functions decorated with @task run in the workers of the run_workers command:
+
+    @task(max_attempts=5)
+    def send_mail(user_id): ...
+
+    send_mail.delay(user.pk)
+
+The task row is written in the transaction of the caller, so workers only see it once
+that commits. Arguments go through JSON. Workers claim tasks with SELECT ... FOR UPDATE
+SKIP LOCKED where the database has it, with a conditional update on SQLite, which locks
+the whole database for every write anyway. Failed tasks are retried with a growing delay.
+@task(every=...) tasks run once per period, the key of the period keeps several
+schedulers from queueing them twice.
+"""
+import logging
+import os
+import random
+import socket
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from myacademy.metrics import REGISTRY, TASK_DURATION, TASKS
+from .models import Task
+
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+class TaskFunction:
+    def __init__(self, func, name, max_attempts, retry_delay, every):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.every = every
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """Run the function in a worker with these arguments."""
+        return self.enqueue(args, kwargs)
+
+    def enqueue(self, args=(), kwargs=None, run_after=None, key=None):
+        """
+        Queue a call, not before `run_after`. With a `key` only the first call of
+        that key is queued and None is returned.
+        """
+        if settings.TASKS_EAGER:
+            transaction.on_commit(lambda: self.func(*args, **(kwargs or {})))
+            return None
+        task = Task(
+            name = self.name, args = list(args), kwargs = kwargs or {}, key = key,
+            max_attempts = self.max_attempts, run_after = run_after or timezone.now(),
+        )
+        if key is None:
+            task.save()
+            return task
+        Task.objects.bulk_create([task], ignore_conflicts=True)
+        return None
+
+
+def task(func=None, *, name=None, max_attempts=3, retry_delay=30, every=None):
+    """
+    Register `func` as a task. Failures are retried after `retry_delay` seconds, doubled
+    every attempt. Functions without arguments can run `every` timedelta.
+    """
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__qualname__}'
+        if task_name in registry:
+            raise ValueError(f'Task {task_name} is already registered.')
+        registry[task_name] = TaskFunction(func, task_name, max_attempts, retry_delay, every)
+        return registry[task_name]
+    return decorator(func) if func else decorator
+
+
+def due_tasks(now):
+    # running tasks older than TASK_TIMEOUT belong to a worker that died
+    stale = now - timedelta(seconds=settings.TASK_TIMEOUT)
+    return Task.objects.filter(
+        Q(status = Task.Statuses.queued, run_after__lte = now) | Q(status = Task.Statuses.running, started_at__lt = stale),
+    ).order_by('run_after', 'pk')
+
+
+def claim_task(worker):
+    """Take the next due task for `worker`, None when there is none."""
+    now = timezone.now()
+    claimed = {'status': Task.Statuses.running, 'started_at': now, 'finished_at': None, 'worker': worker}
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            task = due_tasks(now).select_for_update(skip_locked=True).first()
+            if task is None:
+                return None
+            Task.objects.filter(pk = task.pk).update(attempts = task.attempts + 1, **claimed)
+            task.refresh_from_db()
+            return task
+
+    for pk, status, attempts in due_tasks(now).values_list('pk', 'status', 'attempts')[:20]:
+        # another worker took it if nothing is updated
+        if Task.objects.filter(pk = pk, status = status, attempts = attempts).update(attempts = attempts + 1, **claimed):
+            return Task.objects.get(pk = pk)
+    return None
+
+
+def retry_delay(function, attempts):
+    delay = (function.retry_delay if function else 30) * 2 ** (attempts - 1)
+    # jitter, so tasks failing together do not all come back together
+    return min(delay, settings.TASK_MAX_RETRY_DELAY) * random.uniform(1, 1.25)
+
+
+def run_task(task):
+    """Call the function of a claimed task and store the outcome, True when it succeeded."""
+    function = registry.get(task.name)
+    start = time.perf_counter()
+    try:
+        if function is None:
+            raise LookupError(f'Task {task.name} is not registered.')
+        if task.attempts > task.max_attempts:
+            raise TimeoutError('The worker running the task stopped.')
+        function(*task.args, **task.kwargs)
+    except Exception as ex:
+        now = timezone.now()
+        if function is not None and task.attempts < task.max_attempts:
+            changes = {'status': Task.Statuses.queued, 'run_after': now + timedelta(seconds=retry_delay(function, task.attempts))}
+            logger.warning('Task %s (%s) failed, retrying: %r', task.name, task.pk, ex)
+        else:
+            changes = {'status': Task.Statuses.failed, 'finished_at': now}
+            logger.exception('Task %s (%s) failed', task.name, task.pk)
+        Task.objects.filter(pk = task.pk).update(error = repr(ex)[:2000], **changes)
+        TASKS.inc(task = task.name, status = 'failed' if changes['status'] == Task.Statuses.failed else 'retried')
+        return False
+    finally:
+        TASK_DURATION.observe(time.perf_counter() - start, task = task.name)
+    Task.objects.filter(pk = task.pk).update(status = Task.Statuses.done, error = '', finished_at = timezone.now())
+    TASKS.inc(task = task.name, status = 'done')
+    return True
+
+
+def enqueue_periodic(now=None, last_periods=None):
+    """Queue the @task(every=...) tasks of the current period, returns the periods queued."""
+    now = now or timezone.now()
+    last_periods = {} if last_periods is None else last_periods
+    for function in registry.values():
+        if not function.every:
+            continue
+        seconds = function.every.total_seconds()
+        period = int(now.timestamp() // seconds)
+        if last_periods.get(function.name) == period:
+            continue
+        start = datetime.fromtimestamp(period * seconds, dt_timezone.utc)
+        function.enqueue(run_after = start, key = f'{function.name}@{period}')
+        last_periods[function.name] = period
+    return last_periods
+
+
+def release_connections():
+    """Close broken and expired connections between tasks, as between requests."""
+    # tests run workers in the transaction of the test case
+    if not connection.in_atomic_block:
+        close_old_connections()
+
+
+class Worker:
+    """Runs tasks one at a time. One worker per box is the `scheduler` of periodic tasks."""
+    def __init__(self, name=None, scheduler=False, poll=None):
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.scheduler = scheduler
+        self.poll = settings.TASK_POLL_INTERVAL if poll is None else poll
+        self.periods = {}
+        self.stopping = False
+
+    def stop(self, *args):
+        """Finish the current task and return, usable as a signal handler."""
+        self.stopping = True
+
+    def run(self, once=False):
+        """Run tasks until stopped, or until none is due with `once`. Returns how many ran."""
+        processed = 0
+        while not self.stopping:
+            release_connections()
+            try:
+                if self.scheduler:
+                    enqueue_periodic(last_periods=self.periods)
+                task = claim_task(self.name)
+            except OperationalError as ex:
+                # database is locked, by other workers writing
+                logger.warning('Claiming a task failed: %s', ex)
+                task = None
+            REGISTRY.maintain()
+            if task is None:
+                if once:
+                    break
+                time.sleep(self.poll)
+                continue
+            run_task(task)
+            processed += 1
+        release_connections()
+        return processed
@@ -0,0 +1,12 @@
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .models import Task
+from .queue import task
+
+
+@task(every=timedelta(days=1))
+def purge_tasks():
+    """Delete tasks done more than TASK_RESULT_TTL ago."""
+    cutoff = timezone.now() - timedelta(seconds=settings.TASK_RESULT_TTL)
+    Task.objects.filter(status = Task.Statuses.done, finished_at__lt = cutoff).delete()
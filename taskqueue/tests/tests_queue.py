@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from taskqueue.models import Task
+from taskqueue.queue import Worker, claim_task, enqueue_periodic, registry, run_task, task
+
+
+calls = []
+
+
+@task
+def record(value, twice=False):
+    calls.append(value * 2 if twice else value)
+
+
+@task(max_attempts=2, retry_delay=10)
+def broken():
+    raise ValueError('broken')
+
+
+@task(every=timedelta(minutes=10))
+def every_ten_minutes():
+    calls.append('periodic')
+
+
+class TestTaskQueue(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_delay_and_run(self):
+        created = record.delay(2, twice=True)
+        self.assertEqual((created.name, created.args, created.kwargs), ('taskqueue.tests.tests_queue.record', [2], {'twice': True}))
+        self.assertEqual(calls, [])
+
+        self.assertEqual(Worker(poll=0).run(once=True), 1)
+        self.assertEqual(calls, [4])
+        created.refresh_from_db()
+        self.assertEqual((created.status, created.attempts), ('done', 1))
+        self.assertIsNotNone(created.finished_at)
+
+    def test_claim_once(self):
+        record.delay(1)
+        claimed = claim_task('worker-1')
+        self.assertEqual((claimed.status, claimed.worker, claimed.attempts), ('running', 'worker-1', 1))
+        self.assertIsNone(claim_task('worker-2'))
+
+    def test_run_after(self):
+        record.enqueue((1,), run_after=timezone.now() + timedelta(minutes=5))
+        self.assertIsNone(claim_task('worker'))
+
+    def test_retry_with_backoff(self):
+        created = broken.delay()
+        with self.assertLogs('taskqueue.queue', 'WARNING'):
+            self.assertFalse(run_task(claim_task('worker')))
+        created.refresh_from_db()
+        self.assertEqual((created.status, created.attempts, created.error), ('queued', 1, "ValueError('broken')"))
+        self.assertGreaterEqual(created.run_after, timezone.now() + timedelta(seconds=9))
+
+        Task.objects.update(run_after = timezone.now())
+        with self.assertLogs('taskqueue.queue', 'ERROR'):
+            run_task(claim_task('worker'))
+        created.refresh_from_db()
+        self.assertEqual((created.status, created.attempts), ('failed', 2))
+
+    def test_stale_task_runs_again(self):
+        created = record.delay(3)
+        Task.objects.update(status = Task.Statuses.running, attempts = 1, started_at = timezone.now() - timedelta(days=1))
+        Worker(poll=0).run(once=True)
+        created.refresh_from_db()
+        self.assertEqual((created.status, created.attempts, calls), ('done', 2, [3]))
+
+    def test_unknown_task_fails(self):
+        Task.objects.create(name = 'missing.task')
+        with self.assertLogs('taskqueue.queue', 'ERROR'):
+            Worker(poll=0).run(once=True)
+        self.assertEqual(Task.objects.get().status, 'failed')
+
+    def test_key_queues_once(self):
+        self.assertIsNone(record.enqueue((1,), key='only-once'))
+        record.enqueue((2,), key='only-once')
+        self.assertEqual(list(Task.objects.values_list('args', flat=True)), [[1]])
+
+    def test_periodic(self):
+        now = datetime(2026, 1, 1, 12, 15, tzinfo=dt_timezone.utc)
+        periods = enqueue_periodic(now)
+        enqueue_periodic(now + timedelta(minutes=2))
+        # a second scheduler does not queue the same period again
+        enqueue_periodic(now + timedelta(minutes=3), {})
+        tasks = Task.objects.filter(name = every_ten_minutes.name)
+        self.assertEqual(tasks.count(), 1)
+        self.assertEqual(tasks.get().run_after, datetime(2026, 1, 1, 12, 10, tzinfo=dt_timezone.utc))
+
+        enqueue_periodic(now + timedelta(minutes=10), periods)
+        self.assertEqual(tasks.count(), 2)
+        self.assertIn('taskqueue.tasks.purge_tasks', registry)
+
+    @override_settings(TASKS_EAGER = True)
+    def test_eager(self):
+        with self.captureOnCommitCallbacks(execute = True):
+            self.assertIsNone(record.delay(5))
+        self.assertEqual(calls, [5])
+        self.assertFalse(Task.objects.exists())
+
+    def test_command(self):
+        record.delay(7)
+        out = StringIO()
+        call_command('run_workers', workers=0, once=True, no_scheduler=True, stdout=out)
+        self.assertIn('Ran 1 tasks.', out.getvalue())
+        self.assertEqual(calls, [7])
@@ -0,0 +1,13 @@
+"""Entry point of the processes of run_workers, imported before Django is set up."""
+import signal
+
+
+def worker_main(scheduler, poll):
+    import django
+    django.setup()
+    from .queue import Worker
+
+    worker = Worker(scheduler=scheduler, poll=poll)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
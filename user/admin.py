@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import OTPCode, User, Profile
+from django.utils import timezone
+from .models import OTPCode, SMSMessage, User, Profile
 from django.contrib.auth.admin import UserAdmin
 
 
@@ -48,3 +49,20 @@ class ProfileRegister(admin.ModelAdmin):
 class OTPCodeRegister(admin.ModelAdmin):
     list_display = [field.name for field in OTPCode._meta.fields]
     list_filter = ['code_type']
+
+
+@admin.register(SMSMessage)
+class SMSMessageRegister(admin.ModelAdmin):
+    list_display = ['phone_number', 'status', 'attempts', 'reference', 'send_after', 'sent_at']
+    list_filter = ['status']
+    search_fields = ['phone_number', 'reference']
+    actions = ['resend']
+
+    @admin.action(description='ارسال دوباره')
+    def resend(self, request, queryset):
+        from .tasks import deliver_sms
+
+        queryset.exclude(status = SMSMessage.Statuses.sent).exclude(sensitive = True, text = '').update(
+            status = SMSMessage.Statuses.queued, attempts = 0, send_after = timezone.now(),
+        )
+        deliver_sms.delay()
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.core.management import call_command
+from django.db.models.signals import post_migrate
+
+
+def create_cache_tables(using, **kwargs):
+    # the table of the 'shared' DatabaseCache, one time codes need it
+    call_command('createcachetable', database=using, verbosity=0)
 
 
 class UserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user'
+
+    def ready(self):
+        post_migrate.connect(create_cache_tables, sender=self)
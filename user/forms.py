@@ -1,11 +1,9 @@
 from django import forms
-from .models import Profile, User, OTPCode
+from .models import Profile, User
 from django_recaptcha.fields import ReCaptchaField
 from django_recaptcha.widgets import ReCaptchaV2Checkbox
 from django.core.exceptions import ValidationError
-from django.utils import timezone
-from datetime import timedelta
-from random import randint
+from .otp import OTPError, send_code
 
 
 class RecaptchaFrom(forms.Form):
@@ -36,11 +34,12 @@ class RegisterForm(forms.ModelForm):
         Profile.objects.create(user=user)
         return user
 
-    def send_otp_code_to_number(self):
-        code = randint(12121, 98989)
-        otp = OTPCode.objects.create(phone_number = self.cleaned_data['phone_number'], expire_time = timedelta(minutes=4) + timezone.now(), code = code, code_type = 'register')
-        # add send code statement here
-        return True if otp else False
+    def send_otp_code_to_number(self, ip=None):
+        try:
+            send_code(self.cleaned_data['phone_number'], 'register', ip)
+        except OTPError:
+            return False
+        return True
 
 
 class LoginForm(forms.Form):
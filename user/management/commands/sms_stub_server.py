@@ -0,0 +1,70 @@
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class StubProviderHandler(BaseHTTPRequestHandler):
+    """The API user.sms.HTTPBackend calls, with the latency and failures of a real provider."""
+    latency = 0
+    failure_rate = 0
+    token = ''
+    stdout = None
+
+    def do_POST(self):
+        if self.token and self.headers.get('Authorization') != f'Bearer {self.token}':
+            return self.answer(401, {'error': 'bad token'})
+        try:
+            messages = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))['messages']
+        except (ValueError, KeyError):
+            return self.answer(400, {'error': 'bad request'})
+        time.sleep(self.latency)
+        results = []
+        for message in messages:
+            if random.random() < self.failure_rate:
+                results.append({'id': None, 'status': 'rejected', 'error': 'provider failure'})
+                continue
+            results.append({'id': uuid.uuid4().hex, 'status': 'accepted', 'error': ''})
+            if self.stdout:
+                self.stdout.write(f'{message["to"]}: {message["text"]}')
+        self.answer(200, {'results': results})
+
+    def answer(self, status, body):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def stub_server(port, latency=0, failure_rate=0, token='', stdout=None, host='127.0.0.1'):
+    handler = type('Handler', (StubProviderHandler,), {
+        'latency': latency, 'failure_rate': failure_rate, 'token': token, 'stdout': stdout,
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+class Command(BaseCommand):
+    help = 'Serve a local SMS provider for user.sms.HTTPBackend, printing the messages it gets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8025)
+        parser.add_argument('--latency', type=float, default=0.2, help='seconds every request takes')
+        parser.add_argument('--failure-rate', type=float, default=0, help='share of messages rejected, 0 to 1')
+
+    def handle(self, *args, **options):
+        server = stub_server(options['port'], options['latency'], options['failure_rate'], settings.SMS_HTTP_TOKEN, self.stdout)
+        self.stdout.write(f'SMS provider stub listening on http://127.0.0.1:{options["port"]}/send')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -1,6 +1,8 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser, PermissionsMixin
 from django.utils.translation import gettext_lazy as _
+from academy.images import VariantImageField
 from .validators import validate_phone_number, validate_username
 from .managers import UserManager
 
@@ -26,7 +28,8 @@ class User(AbstractUser, PermissionsMixin):
 class Profile(models.Model):
     from academy.models import Course
     user = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name=_('کاربر'))
-    picture = models.ImageField(_('تصویر'), upload_to='users/profile', blank=True)
+    picture = VariantImageField(_('تصویر'), upload_to='users/profile', blank=True, variant_widths=(50, 100, 225, 450), variants_field='picture_variants')
+    picture_variants = models.JSONField(default=dict, blank=True, editable=False)
     aboute = models.TextField(_('درباره'), blank=True)
 
     class Meta:
@@ -39,7 +42,7 @@ class Profile(models.Model):
 
 class OTPCode(models.Model):
     code = models.IntegerField(_('کد'))
-    phone_number = models.CharField(_('شماره تلفن'), max_length=11, validators=[validate_phone_number], unique=True)
+    phone_number = models.CharField(_('شماره تلفن'), max_length=11, validators=[validate_phone_number])
     expire_time = models.DateTimeField(_('زمان ارسال کد'))
     code_types = (('register', 'ثبت نام'),('forgot-password', 'فراموشی رمز عبور'))
     code_type = models.CharField(_('نوع کد تایید'), choices=code_types, max_length=15)
@@ -47,6 +50,50 @@ class OTPCode(models.Model):
     class Meta:
         verbose_name = 'کد تایید '
         verbose_name_plural = 'کد های تایید '
+        constraints = [
+            # a pending register code and a pending password reset code are separate
+            models.UniqueConstraint(fields=['phone_number', 'code_type'], name='otp_code_phone_type'),
+        ]
+        indexes = [
+            # lookups go through the unique constraint, purge_otp_codes through this
+            models.Index(fields=['expire_time'], name='otp_code_expiry'),
+        ]
 
     def __str__(self):
         return '{}:{}:{}'.format(self.phone_number, self.code, self.expire_time)
+
+
+class SMSMessage(models.Model):
+    """
+    A text message, delivered by user.sms in the background. `batch` marks the messages a
+    delivery task took, the text of `sensitive` messages is dropped once they are delivered.
+    """
+    class Statuses(models.TextChoices):
+        queued = 'queued', 'در صف'
+        sending = 'sending', 'در حال ارسال'
+        sent = 'sent', 'ارسال شده'
+        failed = 'failed', 'ناموفق'
+
+    phone_number = models.CharField(_('شماره تلفن'), max_length=11)
+    text = models.TextField(_('متن'), blank=True)
+    sensitive = models.BooleanField(_('محرمانه'), default=False)
+    status = models.CharField(_('وضعیت'), choices=Statuses.choices, default=Statuses.queued, max_length=7)
+    attempts = models.PositiveSmallIntegerField(_('تلاش ها'), default=0)
+    batch = models.UUIDField(_('دسته ارسال'), blank=True, null=True, editable=False)
+    reference = models.CharField(_('شناسه ارسال'), max_length=100, blank=True)
+    error = models.TextField(_('خطا'), blank=True)
+    send_after = models.DateTimeField(_('ارسال بعد از'), default=timezone.now)
+    sent_at = models.DateTimeField(_('زمان ارسال'), blank=True, null=True)
+    created_at = models.DateTimeField(_('زمان ساخت'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('آخرین تغییر'), auto_now=True)
+
+    class Meta:
+        verbose_name = 'پیامک'
+        verbose_name_plural = 'پیامک ها'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'send_after'], name='sms_delivery_queue'),
+        ]
+
+    def __str__(self):
+        return f'{self.phone_number} : {self.status}'
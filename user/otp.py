@@ -0,0 +1,204 @@
+"""
+One time codes sent by SMS, to activate accounts and reset passwords.
+
+Codes are kept with a TTL in OTP_STORE: OTP_CACHE_ALIAS, a cache every worker process
+shares, or OTPCode rows. Sending and verifying are limited per phone number and per IP
+with sliding windows in that cache, so bursts of guesses are rejected before the store
+is touched. A code accepts OTP_MAX_ATTEMPTS wrong guesses, then it is dropped.
+"""
+import hashlib
+import hmac
+import secrets
+import time
+from datetime import timedelta
+from functools import lru_cache
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from myacademy.metrics import OTP_RATE_LIMITED, OTP_SENT
+from .models import OTPCode
+from .sms import queue_sms
+
+
+class OTPError(Exception):
+    pass
+
+
+class RateLimited(OTPError):
+    pass
+
+
+class CodePending(OTPError):
+    """A code sent before is still valid."""
+
+
+def otp_cache():
+    return caches[settings.OTP_CACHE_ALIAS]
+
+
+class SlidingWindow:
+    """
+    At most `limit` hits per `window` seconds for every identifier. The count of the
+    previous fixed window is weighted by how much of it the sliding window still covers,
+    two cache keys per identifier instead of a timestamp per hit.
+    """
+    def __init__(self, name, limit, window):
+        self.name = name
+        self.limit = limit
+        self.window = window
+
+    def keys(self, identifier, now):
+        current = int(now // self.window)
+        return f'ratelimit:{self.name}:{identifier}:{current}', f'ratelimit:{self.name}:{identifier}:{current - 1}'
+
+    def hit(self, identifier, now=None):
+        """Count a hit, False without counting it when the limit is reached."""
+        now = now or time.time()
+        cache = otp_cache()
+        current, previous = self.keys(identifier, now)
+        counts = cache.get_many([current, previous])
+        earlier = counts.get(previous, 0) * (1 - now % self.window / self.window)
+        if earlier + counts.get(current, 0) + 1 > self.limit:
+            return False
+        cache.add(current, 0, self.window * 2)
+        try:
+            count = cache.incr(current)
+        except ValueError:
+            # evicted since add
+            count = 1
+            cache.set(current, count, self.window * 2)
+        if earlier + count > self.limit:
+            # concurrent hits got in first
+            cache.decr(current)
+            return False
+        return True
+
+
+def client_ip(request):
+    """
+    The address rate limits count. Behind TRUSTED_PROXY_COUNT proxies appending to
+    X-Forwarded-For it is the one the farthest trusted proxy saw, the entries before it
+    are sent by the client and can be anything.
+    """
+    count = settings.TRUSTED_PROXY_COUNT
+    if count:
+        addresses = [address.strip() for address in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if address.strip()]
+        if len(addresses) >= count:
+            return addresses[-count]
+    return request.META.get('REMOTE_ADDR')
+
+
+@lru_cache
+def rate_limits(limits):
+    return {name: SlidingWindow(f'otp-{name}', limit, window) for name, (limit, window) in limits}
+
+
+def check_rate_limits(action, phone_number, ip):
+    """Raise RateLimited when `action` ('send' or 'verify') is over a limit of the phone number or the IP."""
+    limits = rate_limits(tuple(sorted(settings.OTP_RATE_LIMITS.items())))
+    for scope, identifier in (('ip', ip), ('phone', phone_number)):
+        if identifier and not limits[f'{action}-{scope}'].hit(identifier):
+            OTP_RATE_LIMITED.inc(action = action, scope = scope)
+            raise RateLimited(f'Too many {action} requests for this {scope}.')
+
+
+@lru_cache
+def digest_key(secret_key):
+    return hashlib.sha256(f'user.otp{secret_key}'.encode()).digest()
+
+
+def code_digest(phone_number, purpose, code):
+    """Codes are stored hashed, a dump of the cache does not leak them."""
+    message = f'{purpose}:{phone_number}:{code}'.encode()
+    return hmac.new(digest_key(settings.SECRET_KEY), message, hashlib.sha256).hexdigest()
+
+
+class CacheOTPStore:
+    def key(self, phone_number, purpose):
+        return f'otp:{purpose}:{phone_number}'
+
+    def add(self, phone_number, purpose, code, ttl):
+        """Store a code unless one is pending, False when one is."""
+        return otp_cache().add(self.key(phone_number, purpose), code_digest(phone_number, purpose, code), ttl)
+
+    def matches(self, phone_number, purpose, code):
+        """None without a pending code, otherwise whether `code` is it."""
+        digest = otp_cache().get(self.key(phone_number, purpose))
+        if digest is None:
+            return None
+        return hmac.compare_digest(digest, code_digest(phone_number, purpose, code))
+
+    def delete(self, phone_number, purpose):
+        otp_cache().delete(self.key(phone_number, purpose))
+
+
+class DatabaseOTPStore:
+    """OTPCode rows, one per phone number and purpose. Expired rows are deleted by user.tasks.purge_otp_codes."""
+    def add(self, phone_number, purpose, code, ttl):
+        now = timezone.now()
+        OTPCode.objects.filter(phone_number = phone_number, code_type = purpose, expire_time__lt = now).delete()
+        _, created = OTPCode.objects.get_or_create(
+            phone_number = phone_number, code_type = purpose, defaults = {'code': code, 'expire_time': now + timedelta(seconds=ttl)},
+        )
+        return created
+
+    def matches(self, phone_number, purpose, code):
+        otp = OTPCode.objects.filter(phone_number = phone_number, code_type = purpose, expire_time__gte = timezone.now()).first()
+        if otp is None:
+            return None
+        return hmac.compare_digest(str(otp.code), str(code))
+
+    def delete(self, phone_number, purpose):
+        OTPCode.objects.filter(phone_number = phone_number, code_type = purpose).delete()
+
+
+def get_store():
+    return import_string(settings.OTP_STORE)()
+
+
+OTP_MESSAGES = {
+    'register': 'کد فعال سازی حساب شما: {code}',
+    'forgot-password': 'کد بازیابی رمز عبور شما: {code}',
+}
+
+
+def attempts_key(phone_number, purpose):
+    return f'otp-attempts:{purpose}:{phone_number}'
+
+
+def send_code(phone_number, purpose, ip=None):
+    """
+    Send a new code to `phone_number`, delivered in the background by user.sms.
+    Raises RateLimited, or CodePending while the last code is valid.
+    """
+    check_rate_limits('send', phone_number, ip)
+    code = secrets.randbelow(90000) + 10000
+    ttl = settings.OTP_TTL[purpose]
+    if not get_store().add(phone_number, purpose, code, ttl):
+        raise CodePending('A code was sent already.')
+    otp_cache().set(attempts_key(phone_number, purpose), 0, ttl)
+    queue_sms(phone_number, OTP_MESSAGES[purpose].format(code = code), sensitive = True)
+    OTP_SENT.inc(code_type = purpose)
+    return code
+
+
+def verify_code(phone_number, purpose, code, ip=None):
+    """Whether `code` is the pending code, which is then used up. Raises RateLimited."""
+    check_rate_limits('verify', phone_number, ip)
+    store = get_store()
+    matches = store.matches(phone_number, purpose, str(code))
+    if matches is None:
+        return False
+    cache = otp_cache()
+    if matches:
+        store.delete(phone_number, purpose)
+        cache.delete(attempts_key(phone_number, purpose))
+        return True
+    try:
+        attempts = cache.incr(attempts_key(phone_number, purpose))
+    except ValueError:
+        attempts = settings.OTP_MAX_ATTEMPTS
+    if attempts >= settings.OTP_MAX_ATTEMPTS:
+        store.delete(phone_number, purpose)
+    return False
@@ -0,0 +1,198 @@
+"""
+Text messages, sent in the background through SMS_BACKEND.
+
+queue_sms() only writes an SMSMessage in the transaction of the request and queues a
+delivery task, so responses never wait for the provider. The task takes the due messages
+and hands them to the backend `batch_size` at a time, failed messages are retried with a
+growing delay until SMS_MAX_ATTEMPTS. A sweep every minute sends what no task took,
+like messages left sending by a worker that died. Backends follow Django's email backends:
+
+    class Backend(BaseSMSBackend):
+        batch_size = 100
+        def send_messages(self, messages): return [Delivery(...) for message in messages]
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import namedtuple
+from datetime import timedelta
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from myacademy.metrics import SMS_MESSAGES, SMS_PROVIDER_DURATION
+from .models import SMSMessage
+
+
+logger = logging.getLogger(__name__)
+
+# outcome of one message, `reference` is the id the provider gave it
+Delivery = namedtuple('Delivery', ['sent', 'reference', 'error'], defaults=['', ''])
+
+# messages of LocMemBackend, for tests
+outbox = []
+
+
+class SMSError(Exception):
+    pass
+
+
+class BaseSMSBackend:
+    batch_size = 1
+
+    def send_messages(self, messages):
+        """Send SMSMessages, at most `batch_size`, and return a Delivery for each."""
+        raise NotImplementedError
+
+
+class ConsoleBackend(BaseSMSBackend):
+    batch_size = 100
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def send_messages(self, messages):
+        with self._lock:
+            for message in messages:
+                self.stream.write(f'SMS to {message.phone_number}:\n{message.text}\n{"-" * 40}\n')
+            self.stream.flush()
+        return [Delivery(True, f'console-{message.pk}') for message in messages]
+
+
+class FileBackend(ConsoleBackend):
+    """Appends messages to a file per day in SMS_FILE_PATH."""
+    def __init__(self):
+        os.makedirs(settings.SMS_FILE_PATH, exist_ok=True)
+        super().__init__()
+
+    def send_messages(self, messages):
+        path = os.path.join(settings.SMS_FILE_PATH, f'{timezone.now():%Y%m%d}.log')
+        with open(path, 'a', encoding='utf-8') as self.stream:
+            return super().send_messages(messages)
+
+
+class LocMemBackend(BaseSMSBackend):
+    batch_size = 100
+
+    def send_messages(self, messages):
+        outbox.extend({'phone_number': message.phone_number, 'text': message.text} for message in messages)
+        return [Delivery(True, f'locmem-{message.pk}') for message in messages]
+
+
+class HTTPBackend(BaseSMSBackend):
+    """
+    A JSON API taking batches, like the sms_stub_server command:
+    POST SMS_HTTP_URL {"messages": [{"to", "text"}]} -> {"results": [{"id", "status", "error"}]}
+    with "accepted" or "rejected" statuses in the order of the messages.
+    """
+    @property
+    def batch_size(self):
+        return settings.SMS_HTTP_BATCH_SIZE
+
+    def send_messages(self, messages):
+        body = json.dumps({'messages': [{'to': message.phone_number, 'text': message.text} for message in messages]}).encode()
+        request = Request(settings.SMS_HTTP_URL, body, method='POST', headers={
+            'Content-Type': 'application/json', 'Authorization': f'Bearer {settings.SMS_HTTP_TOKEN}',
+        })
+        try:
+            with urlopen(request, timeout=settings.SMS_HTTP_TIMEOUT) as response:
+                results = json.load(response)['results']
+        except (URLError, OSError, ValueError, KeyError) as ex:
+            raise SMSError(f'Provider request failed: {ex}')
+        if len(results) != len(messages):
+            raise SMSError('Provider answered for a different number of messages.')
+        return [
+            Delivery(result.get('status') == 'accepted', str(result.get('id') or ''), result.get('error') or '')
+            for result in results
+        ]
+
+
+def get_backend():
+    return import_string(settings.SMS_BACKEND)()
+
+
+def queue_sms(phone_number, text, sensitive=False):
+    """Save a message and queue its delivery, within the transaction of the caller."""
+    from .tasks import deliver_sms
+
+    message = SMSMessage.objects.create(phone_number = phone_number, text = text, sensitive = sensitive)
+    # messages queued within the same second share a task, and so a provider call
+    second = int(time.time())
+    deliver_sms.enqueue(run_after = timezone.now() + timedelta(seconds=settings.SMS_BATCH_DELAY), key = f'sms:{second}')
+    return message
+
+
+def claim_messages(limit):
+    """Mark up to `limit` due messages as sending and return them."""
+    now = timezone.now()
+    # messages left sending by a worker that died are sent again
+    stale = now - timedelta(seconds=settings.TASK_TIMEOUT)
+    due = SMSMessage.objects.filter(
+        Q(status = SMSMessage.Statuses.queued, send_after__lte = now) | Q(status = SMSMessage.Statuses.sending, updated_at__lt = stale),
+    )
+    ids = list(due.order_by('send_after', 'pk').values_list('pk', flat=True)[:limit])
+    batch = uuid.uuid4()
+    # the rows another worker took meanwhile are no longer due
+    due.filter(pk__in = ids).update(status = SMSMessage.Statuses.sending, batch = batch, updated_at = now)
+    return list(SMSMessage.objects.filter(batch = batch).order_by('pk'))
+
+
+def record(messages, deliveries):
+    """Store the outcome of sent messages, the failed ones are retried later."""
+    now = timezone.now()
+    retry_at = None
+    for message, delivery in zip(messages, deliveries):
+        message.attempts += 1
+        # bulk_update does not set auto_now fields
+        message.updated_at = now
+        message.error = delivery.error[:2000] if not delivery.sent else ''
+        if delivery.sent:
+            message.status, message.reference, message.sent_at = SMSMessage.Statuses.sent, delivery.reference[:100], now
+        elif message.attempts < settings.SMS_MAX_ATTEMPTS:
+            message.status = SMSMessage.Statuses.queued
+            message.send_after = now + timedelta(seconds=settings.SMS_RETRY_DELAY * 2 ** (message.attempts - 1))
+            retry_at = min(retry_at or message.send_after, message.send_after)
+        else:
+            message.status = SMSMessage.Statuses.failed
+        if message.sensitive and message.status != SMSMessage.Statuses.queued:
+            message.text = ''
+        SMS_MESSAGES.inc(status = 'retried' if message.status == SMSMessage.Statuses.queued else message.status)
+    SMSMessage.objects.bulk_update(messages, ['status', 'attempts', 'reference', 'error', 'send_after', 'sent_at', 'text', 'updated_at'])
+    return retry_at
+
+
+def deliver_queued(limit=None):
+    """Send the due messages, returns how many were sent."""
+    from .tasks import deliver_sms
+
+    limit = limit or settings.SMS_DELIVERY_LIMIT
+    messages = claim_messages(limit)
+    backend = get_backend()
+    sent = 0
+    retry_at = None
+    for start in range(0, len(messages), backend.batch_size):
+        batch = messages[start:start + backend.batch_size]
+        begin = time.perf_counter()
+        try:
+            deliveries = backend.send_messages(batch)
+        except SMSError as ex:
+            logger.warning('Sending %s messages failed: %s', len(batch), ex)
+            deliveries = [Delivery(False, error=str(ex))] * len(batch)
+        SMS_PROVIDER_DURATION.observe(time.perf_counter() - begin, backend = type(backend).__name__)
+        batch_retry = record(batch, deliveries)
+        retry_at = min(filter(None, [retry_at, batch_retry]), default=None)
+        sent += sum(delivery.sent for delivery in deliveries)
+    if retry_at:
+        # keys of their own, a retry must not take the key of a second messages are queued in
+        deliver_sms.enqueue(run_after = retry_at, key = f'sms-retry:{int(retry_at.timestamp())}')
+    if len(messages) == limit:
+        # more may be waiting
+        deliver_sms.delay()
+    return sent
@@ -0,0 +1,23 @@
+from datetime import timedelta
+from django.utils import timezone
+from taskqueue.queue import task
+from .models import OTPCode
+from . import sms
+
+
+@task(max_attempts=3, retry_delay=5)
+def deliver_sms():
+    """Send the queued text messages, user.sms retries the failed ones itself."""
+    sms.deliver_queued()
+
+
+@task(every=timedelta(minutes=1))
+def sweep_sms():
+    """Send due and stale messages, so none waits on a single keyed deliver_sms task."""
+    sms.deliver_queued()
+
+
+@task(every=timedelta(hours=1))
+def purge_otp_codes():
+    """Delete expired codes of user.otp.DatabaseOTPStore."""
+    OTPCode.objects.filter(expire_time__lt = timezone.now()).delete()
@@ -0,0 +1,146 @@
+from unittest.mock import patch
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django_recaptcha.client import RecaptchaResponse
+from user.models import OTPCode, User
+from user.otp import CodePending, RateLimited, SlidingWindow, client_ip, code_digest, get_store, otp_cache, send_code, verify_code
+
+
+class TestSlidingWindow(TestCase):
+    def setUp(self):
+        cache.clear()
+        otp_cache().clear()
+
+    def test_limit(self):
+        window = SlidingWindow('test', 3, 60)
+        self.assertEqual([window.hit('a', 120 + i) for i in range(4)], [True, True, True, False])
+        self.assertTrue(window.hit('b', 125))
+
+    def test_previous_window_counts(self):
+        window = SlidingWindow('test', 4, 60)
+        for i in range(4):
+            window.hit('a', 110 + i)
+        # 5 seconds into the next window 55/60 of the previous hits still count
+        self.assertFalse(window.hit('a', 125))
+        self.assertTrue(window.hit('a', 165))
+
+
+class TestOTP(TestCase):
+    phone_number = '09123456789'
+
+    def setUp(self):
+        cache.clear()
+        otp_cache().clear()
+
+    def test_send_and_verify(self):
+        code = send_code(self.phone_number, 'register', '1.1.1.1')
+        self.assertFalse(verify_code(self.phone_number, 'forgot-password', code))
+        self.assertTrue(verify_code(self.phone_number, 'register', str(code)))
+        # used up
+        self.assertFalse(verify_code(self.phone_number, 'register', code))
+        self.assertFalse(OTPCode.objects.exists())
+
+    def test_cache_shared_between_processes(self):
+        self.assertNotIsInstance(otp_cache(), LocMemCache)
+        code = send_code(self.phone_number, 'register')
+        # a connection of its own, like the one of another worker process
+        other = caches.create_connection(settings.OTP_CACHE_ALIAS)
+        self.assertEqual(other.get(f'otp:register:{self.phone_number}'), code_digest(self.phone_number, 'register', code))
+
+    def test_pending_code(self):
+        send_code(self.phone_number, 'register')
+        with self.assertRaises(CodePending):
+            send_code(self.phone_number, 'register')
+
+    @override_settings(OTP_MAX_ATTEMPTS = 3)
+    def test_attempts(self):
+        code = send_code(self.phone_number, 'register')
+        for guess in range(3):
+            self.assertFalse(verify_code(self.phone_number, 'register', 1000 + guess))
+        self.assertFalse(verify_code(self.phone_number, 'register', code))
+
+    def test_send_rate_limit(self):
+        for i in range(3):
+            send_code(self.phone_number, 'register', f'10.0.0.{i}')
+            get_store().delete(self.phone_number, 'register')
+        with self.assertRaises(RateLimited):
+            send_code(self.phone_number, 'register', '10.0.0.9')
+
+    # a cache outside the database, like Redis
+    @override_settings(OTP_CACHE_ALIAS = 'default', OTP_RATE_LIMITS = {
+        'send-phone': (3, 3600), 'send-ip': (10, 3600), 'verify-phone': (100, 900), 'verify-ip': (5, 900),
+    })
+    def test_verify_burst_rejected_from_cache(self):
+        send_code(self.phone_number, 'register', '2.2.2.2')
+        for guess in range(5):
+            verify_code(self.phone_number, 'register', 1000 + guess, '2.2.2.2')
+        with self.assertNumQueries(0), self.assertRaises(RateLimited):
+            verify_code('09120000000', 'register', 12345, '2.2.2.2')
+
+    @override_settings(OTP_STORE = 'user.otp.DatabaseOTPStore')
+    def test_database_store(self):
+        code = send_code(self.phone_number, 'forgot-password')
+        self.assertEqual(OTPCode.objects.get().code, code)
+        with self.assertRaises(CodePending):
+            send_code(self.phone_number, 'forgot-password')
+        self.assertFalse(verify_code(self.phone_number, 'forgot-password', code + 1))
+        self.assertTrue(verify_code(self.phone_number, 'forgot-password', code))
+        self.assertFalse(OTPCode.objects.exists())
+
+    @override_settings(OTP_STORE = 'user.otp.DatabaseOTPStore')
+    def test_database_store_purposes(self):
+        register = send_code(self.phone_number, 'register')
+        reset = send_code(self.phone_number, 'forgot-password')
+        self.assertEqual(OTPCode.objects.count(), 2)
+        self.assertTrue(verify_code(self.phone_number, 'register', register))
+        self.assertTrue(verify_code(self.phone_number, 'forgot-password', reset))
+
+    def test_client_ip(self):
+        request = RequestFactory().get('/', REMOTE_ADDR = '10.0.0.1', HTTP_X_FORWARDED_FOR = '6.6.6.6, 1.1.1.1')
+        self.assertEqual(client_ip(request), '10.0.0.1')
+        with override_settings(TRUSTED_PROXY_COUNT = 1):
+            self.assertEqual(client_ip(request), '1.1.1.1')
+            self.assertEqual(client_ip(RequestFactory().get('/', REMOTE_ADDR = '10.0.0.1')), '10.0.0.1')
+        with override_settings(TRUSTED_PROXY_COUNT = 2):
+            self.assertEqual(client_ip(request), '6.6.6.6')
+
+
+class TestOTPViews(TestCase):
+    def setUp(self):
+        cache.clear()
+        otp_cache().clear()
+        User.objects.create(username = 'user1', email = 'user1@gmail.com', phone_number = '09123456789')
+        session = self.client.session
+        session['phone_number'] = '09123456789'
+        session.save()
+
+    @override_settings(OTP_RATE_LIMITS = {
+        'send-phone': (3, 3600), 'send-ip': (10, 3600), 'verify-phone': (2, 900), 'verify-ip': (30, 900),
+    })
+    @patch('django_recaptcha.fields.client.submit')
+    def test_too_many_requests(self, mocked_value):
+        mocked_value.return_value = RecaptchaResponse(is_valid=True)
+        data = {'g-recaptcha-response': 'RESPONSE', 'code': '11111'}
+        for i in range(2):
+            self.assertEqual(self.client.post(reverse('user:active-account'), data).context['msg'], 'code failed')
+        res = self.client.post(reverse('user:active-account'), data)
+        self.assertEqual(res.context['msg'], 'too many requests')
+        self.assertContains(res, 'درخواست های زیادی ارسال شده')
+
+    @override_settings(TRUSTED_PROXY_COUNT = 1, OTP_RATE_LIMITS = {
+        'send-phone': (3, 3600), 'send-ip': (10, 3600), 'verify-phone': (100, 900), 'verify-ip': (2, 900),
+    })
+    @patch('django_recaptcha.fields.client.submit')
+    def test_ip_limit_behind_proxy(self, mocked_value):
+        mocked_value.return_value = RecaptchaResponse(is_valid=True)
+        data = {'g-recaptcha-response': 'RESPONSE', 'code': '11111'}
+        for i in range(2):
+            self.client.post(reverse('user:active-account'), data, HTTP_X_FORWARDED_FOR = '1.1.1.1')
+        res = self.client.post(reverse('user:active-account'), data, HTTP_X_FORWARDED_FOR = '1.1.1.1')
+        self.assertEqual(res.context['msg'], 'too many requests')
+        # the proxy's REMOTE_ADDR is the same, the client is not
+        res = self.client.post(reverse('user:active-account'), data, HTTP_X_FORWARDED_FOR = '2.2.2.2')
+        self.assertEqual(res.context['msg'], 'code failed')
@@ -0,0 +1,127 @@
+import threading
+from datetime import timedelta
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from taskqueue.models import Task
+from taskqueue.queue import Worker
+from user import sms
+from user.management.commands.sms_stub_server import stub_server
+from user.models import SMSMessage
+from user.tasks import sweep_sms
+
+
+class SmallBatchBackend(sms.LocMemBackend):
+    batch_size = 2
+    calls = []
+
+    def send_messages(self, messages):
+        self.calls.append(len(messages))
+        return super().send_messages(messages)
+
+
+class FailingBackend(sms.BaseSMSBackend):
+    batch_size = 10
+
+    def send_messages(self, messages):
+        raise sms.SMSError('provider down')
+
+
+@override_settings(SMS_BACKEND = 'user.sms.LocMemBackend')
+class TestSMS(TestCase):
+    def setUp(self):
+        sms.outbox.clear()
+
+    def test_queue_shares_task(self):
+        for i in range(3):
+            sms.queue_sms(f'0912345678{i}', 'hello')
+        self.assertEqual(SMSMessage.objects.filter(status = 'queued').count(), 3)
+        self.assertLessEqual(Task.objects.filter(name = 'user.tasks.deliver_sms').count(), 2)
+        self.assertEqual(sms.outbox, [])
+
+    def test_deliver_in_batches(self):
+        for i in range(5):
+            sms.queue_sms(f'0912345678{i}', f'text {i}', sensitive = i == 0)
+        SmallBatchBackend.calls.clear()
+        with self.settings(SMS_BACKEND = 'user.tests.tests_sms.SmallBatchBackend'):
+            self.assertEqual(sms.deliver_queued(), 5)
+        self.assertEqual(SmallBatchBackend.calls, [2, 2, 1])
+        self.assertEqual([message['text'] for message in sms.outbox], [f'text {i}' for i in range(5)])
+        self.assertFalse(SMSMessage.objects.exclude(status = 'sent').exists())
+        first = SMSMessage.objects.first()
+        self.assertEqual((first.text, first.attempts, first.reference), ('', 1, f'locmem-{first.pk}'))
+        self.assertIsNotNone(first.sent_at)
+
+    def test_not_due(self):
+        sms.queue_sms('09123456789', 'later')
+        SMSMessage.objects.update(send_after = timezone.now() + timedelta(minutes=1))
+        self.assertEqual(sms.deliver_queued(), 0)
+        self.assertEqual(SMSMessage.objects.get().status, 'queued')
+
+    @override_settings(SMS_BACKEND = 'user.tests.tests_sms.FailingBackend', SMS_MAX_ATTEMPTS = 2)
+    def test_retry_then_fail(self):
+        sms.queue_sms('09123456789', 'secret', sensitive = True)
+        with self.assertLogs('user.sms', 'WARNING'):
+            self.assertEqual(sms.deliver_queued(), 0)
+        message = SMSMessage.objects.get()
+        self.assertEqual((message.status, message.attempts, message.error, message.text), ('queued', 1, 'provider down', 'secret'))
+        self.assertGreater(message.send_after, timezone.now())
+        # a task comes back for the retry
+        retry = Task.objects.get(name = 'user.tasks.deliver_sms', key__startswith = 'sms-retry:')
+        self.assertEqual(retry.run_after, message.send_after)
+
+        SMSMessage.objects.update(send_after = timezone.now())
+        with self.assertLogs('user.sms', 'WARNING'):
+            sms.deliver_queued()
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts, message.text), ('failed', 2, ''))
+
+    def test_stale_sending_sent_again(self):
+        sms.queue_sms('09123456789', 'hello')
+        SMSMessage.objects.update(status = 'sending', updated_at = timezone.now() - timedelta(days=1))
+        self.assertEqual(sms.deliver_queued(), 1)
+
+    def test_worker_delivers(self):
+        sms.queue_sms('09123456789', 'hello')
+        Task.objects.update(run_after = timezone.now())
+        Worker(poll=0).run(once=True)
+        self.assertEqual(sms.outbox, [{'phone_number': '09123456789', 'text': 'hello'}])
+
+    def test_sweep_delivers_without_task(self):
+        sms.queue_sms('09123456789', 'hello')
+        # the keyed task ran before the message was committed
+        Task.objects.all().delete()
+        # the periodic task alone, the others would run on real files
+        sweep_sms.delay()
+        Worker(poll=0).run(once=True)
+        self.assertEqual(sms.outbox, [{'phone_number': '09123456789', 'text': 'hello'}])
+
+
+class TestHTTPBackend(TestCase):
+    def start(self, **options):
+        server = stub_server(0, token = 'secret', **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f'http://127.0.0.1:{server.server_address[1]}/send'
+        return self.settings(SMS_BACKEND = 'user.sms.HTTPBackend', SMS_HTTP_URL = url, SMS_HTTP_TOKEN = 'secret', SMS_HTTP_BATCH_SIZE = 3)
+
+    def test_send(self):
+        for i in range(4):
+            sms.queue_sms(f'0912345678{i}', 'hello')
+        with self.start():
+            self.assertEqual(sms.deliver_queued(), 4)
+        references = SMSMessage.objects.values_list('reference', flat=True)
+        self.assertEqual(len(set(references)), 4)
+
+    def test_rejected(self):
+        sms.queue_sms('09123456789', 'hello')
+        with self.start(failure_rate = 1):
+            self.assertEqual(sms.deliver_queued(), 0)
+        message = SMSMessage.objects.get()
+        self.assertEqual((message.status, message.error), ('queued', 'provider failure'))
+
+    def test_bad_token(self):
+        sms.queue_sms('09123456789', 'hello')
+        with self.start(), self.settings(SMS_HTTP_TOKEN = 'wrong'), self.assertLogs('user.sms', 'WARNING'):
+            self.assertEqual(sms.deliver_queued(), 0)
+        self.assertIn('401', SMSMessage.objects.get().error)
@@ -1,11 +1,12 @@
 from academy.tests.tests_views import BaseTestCase
 from django.urls import reverse
-from user.models import OTPCode
+from user.otp import get_store
+from taskqueue.models import Task
+from user.models import SMSMessage
 from unittest.mock import patch
 from django_recaptcha.client import RecaptchaResponse
 from freezegun import freeze_time
 from datetime import datetime, timedelta
-from django.utils import timezone
 
 
 class TestLoginView(BaseTestCase):
@@ -72,6 +73,10 @@ class TestRegisterView(BaseTestCase):
         res = self.client.post(self.url, self.register_data)
         res2 = self.client.get(self.url)
         self.assertEqual(res.wsgi_request.session.get('phone_number', None), self.register_data['phone_number'])
+        # the code is sent by a background task
+        message = SMSMessage.objects.get()
+        self.assertEqual((message.phone_number, message.status), (self.register_data['phone_number'], 'queued'))
+        self.assertTrue(Task.objects.filter(name = 'user.tasks.deliver_sms').exists())
         # self.assertEqual(res.status_code, 302)
 
     @patch("django_recaptcha.fields.client.submit")
@@ -156,8 +161,8 @@ class TestActiveRegisterdAccountView(BaseTestCase):
         self.assertEqual(res.status_code, 302)
         self.assertRedirects(res, reverse('user:active-account'))
 
-        code = OTPCode.objects.get(id = 1)
-        res = self.client.post(self.url, data={'g-recaptcha-response': 'RESPONSE', 'code': code.code})
+        code = SMSMessage.objects.get().text.split()[-1]
+        res = self.client.post(self.url, data={'g-recaptcha-response': 'RESPONSE', 'code': code})
         self.assertTrue(res.wsgi_request.user.is_authenticated)
 
 
@@ -262,14 +267,10 @@ class ConfirmTestForgotPasswordView(BaseTestCase):
     def setUp(self):
         super().setUp()
 
-        self.otp_code = OTPCode.objects.create(
-            phone_number = self.user.phone_number,
-            expire_time=timezone.now() + timedelta(minutes=4),
-            code = 22266,
-            code_type = 'forgot-password')
+        get_store().add(self.user.phone_number, 'forgot-password', 22266, 60 * 4)
         self.data = {
             'g-recaptcha-response': 'RESPONSE',
-            'code': self.otp_code.code,
+            'code': 22266,
             'password1': 'new_pass',
             'password2': 'new_pass',
         }
@@ -1,12 +1,10 @@
-from datetime import timedelta
-from random import randint
 from django.conf import settings
 from django.shortcuts import redirect, render
 from django.views import View
 from .forms import ChangePasswordForgotPasswordFrom, LoginForm, RecaptchaFrom, RegisterForm
-from .models import OTPCode, User
+from .models import User
+from .otp import CodePending, RateLimited, client_ip, send_code, verify_code
 from django.contrib.auth import login, authenticate, logout
-from django.utils import timezone
 from django.db.models import Q
 
 
@@ -33,7 +31,7 @@ class RegisterView(View):
                 register_form.save()
                 request.session['phone_number'] = register_form.cleaned_data['phone_number']
                 request.session.modified = True
-                res = register_form.send_otp_code_to_number()
+                res = register_form.send_otp_code_to_number(client_ip(request))
                 if not res:
                     self.context['msg'] = 'otp connection failed'
                 return redirect('user:active-account')
@@ -113,12 +111,15 @@ class ActivateRegisterdAccountView(View):
         if recaptcha_form.is_valid():
             code = request.POST.get('code', None)
             if code and code.isnumeric():
-                otp = OTPCode.objects.filter(code = code, phone_number = self.phone_number, expire_time__gte = timezone.now())
-                if otp.exists():
-                    user = User.objects.get(phone_number = otp.first().phone_number)
+                try:
+                    verified = verify_code(self.phone_number, 'register', code, client_ip(request))
+                except RateLimited:
+                    self.context['msg'] = 'too many requests'
+                    return render(request, self.template_name, self.context)
+                if verified:
+                    user = User.objects.get(phone_number = self.phone_number)
                     user.is_active = True
                     user.save()
-                    otp.delete()
                     request.session.pop('phone_number')
                     request.session.modified = True
                     if settings.LOGIN_AFTER_SIGNUP:
@@ -160,28 +161,15 @@ class ForgotPasswordView(View):
                 except:
                     context['msg'] =  'user not found'
                 else:
-                    last_otp = OTPCode.objects.filter(phone_number = user.phone_number, code_type='forgot-password')
-                    send_code = False
-                    if last_otp.exists():
-                        if last_otp.first().expire_time < timezone.now() :
-                            last_otp.delete()
-                            send_code = True
-                        else:
-                            context['msg'] = 'please wait'
+                    try:
+                        send_code(user.phone_number, 'forgot-password', client_ip(request))
+                    except CodePending:
+                        context['msg'] = 'please wait'
+                    except RateLimited:
+                        context['msg'] = 'too many requests'
                     else:
-                        send_code = True
-
-                    if send_code:
-                        code = randint(12121, 98989)
-                        OTPCode.objects.create(code = code, expire_time = timedelta(minutes=5) + timezone.now(), phone_number = user.phone_number, code_type = 'forgot-password')
-                        
                         request.session['phone_number'] = user.phone_number
                         request.session.modified = True
-                        # try:
-                        #     pass
-                        #     #send code
-                        # except:
-                        #     context['msg'] = 'otp failed' # for error when try for send code to Phone number
                         return redirect('user:confirm-forgot-password')
             else:
                 context['msg'] = 'token failed'
@@ -216,19 +204,21 @@ class ConfirmForgotPasswordView(View):
             change_password_form = ChangePasswordForgotPasswordFrom(request.POST)
             if change_password_form.is_valid():
                 code = change_password_form.cleaned_data['code']
-                otp = OTPCode.objects.filter(Q(code_type = 'forgot-password'), phone_number = self.phone_number)
-                otp_with_code  = otp.filter(code = code, expire_time__gte = timezone.now())
-                if otp_with_code.exists():
-                    user = User.objects.get(phone_number = otp_with_code.first().phone_number)
+                try:
+                    verified = verify_code(self.phone_number, 'forgot-password', code, client_ip(request))
+                except RateLimited:
+                    verified = False
+                    self.context['msg'] = 'too many requests'
+                if verified:
+                    user = User.objects.get(phone_number = self.phone_number)
                     user.set_password(change_password_form.cleaned_data['password1'])
                     user.save()
-                    otp.delete()
                     request.session.pop('phone_number')
                     request.session.modified = True
                     # TODO: Redirect to user panel
                     # TODO: if on settings set can auto login after change password and redirect to user panel
                     return redirect(request.GET.get('next', 'user:login'))
-                else:
+                elif 'msg' not in self.context:
                     self.context['msg'] = 'invalid code'
             self.context['change_password_form'] = change_password_form
         else: